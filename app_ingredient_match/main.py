@@ -3,20 +3,35 @@
 """Script containing the API server.
 Test match: curl -X POST http://127.0.0.1:8000/match_ingredients/ -H 'Content-Type: application/json' -d '{"ingredients":["apple"]}'
 Test properties: curl -X POST http://127.0.0.1:8000/get_properties/ -H 'Content-Type: application/json' -d '{"ingredient_ids":[1]}'
+Test readiness: curl http://127.0.0.1:8000/ready/
+Reload taxonomy and stopwords: curl -X POST http://127.0.0.1:8000/admin/reload/ -H 'X-Admin-Token: {ADMIN_TOKEN}'
 """
 
 # Import modules
-# import time
+import time
+import asyncio
+import secrets
+import threading
 from typing import List, Union
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, conint
 import src.ingredient_match as ingredient_match
+import src.db_pool as db_pool
+from src.bounded_executor import BoundedExecutor, QueueFullError
+from src.micro_batcher import MicroBatcher
 
 # Create internal response models
+class DictCandidate(BaseModel):
+    id: int
+    score: float
+
 class DictIngredients(BaseModel):
     ingredient: str
     id: int
     score: float
+    candidates: Union[List[DictCandidate], None]
+    margin: Union[float, None]
 
 class DictProperties(BaseModel):
     id: int
@@ -59,6 +74,7 @@ class DictProperties(BaseModel):
 # Create body objects
 class BodyIngredientsIn(BaseModel):
     ingredients: List[str]
+    top_k: Union[conint(ge = 1, le = ingredient_match.MAX_TOP_K), None] = None
 
 class BodyIngredientsOut(BaseModel):
     response: List[DictIngredients]
@@ -73,25 +89,135 @@ class BodyPropertiesOut(BaseModel):
 # Create application object
 app = FastAPI()
 
+# Encoding runs in dedicated threads, so it does not block the event loop nor compete with other requests
+INFERENCE_EXECUTOR = BoundedExecutor(ingredient_match.INFERENCE_WORKERS, ingredient_match.INFERENCE_MAX_QUEUE)
+
+# Concurrent requests are encoded and scored as a single batch
+if ingredient_match.MICRO_BATCH_MAX_WAIT_MS > 0:
+    MATCH_BATCHER = MicroBatcher(ingredient_match.match_cleaned_ingredients, INFERENCE_EXECUTOR.run,
+                                ingredient_match.MICRO_BATCH_MAX_WAIT_MS, ingredient_match.MICRO_BATCH_MAX_SIZE)
+else:
+    MATCH_BATCHER = None
+
+# Running reload, shared by concurrent calls to /admin/reload/
+RELOAD_FUTURE = None
+
+def initialise_state():
+
+    # Retry until the database is reachable, the server keeps answering /ready/ meanwhile
+    while not ingredient_match.STATE.initialise():
+        time.sleep(ingredient_match.STARTUP_RETRY_INTERVAL)
+
+def check_admin_token(token: Union[str, None]):
+
+    # Admin endpoints are not exposed without a configured token
+    if not ingredient_match.ADMIN_TOKEN:
+        raise HTTPException(status_code = 404, detail = 'Not Found')
+
+    if token is None or not secrets.compare_digest(token.encode(), ingredient_match.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code = 401, detail = 'Invalid admin token.')
+
+def check_ready():
+
+    if not ingredient_match.STATE.ready:
+        raise HTTPException(status_code = 503, detail = 'Service is starting, please retry later.', headers = {'Retry-After': '5'})
+
+@app.on_event('startup')
+async def startup():
+
+    # Load the model and data in the background, so the server accepts connections immediately
+    threading.Thread(target = initialise_state, daemon = True).start()
+
+@app.on_event('shutdown')
+async def shutdown():
+
+    # Finish running batches before stopping the executor they run on
+    if MATCH_BATCHER is not None:
+        await MATCH_BATCHER.close()
+
+    INFERENCE_EXECUTOR.shutdown()
+    db_pool.close_pools()
+    await db_pool.close_async_pools()
+
 @app.get('/dummy/', status_code = 200)
 def dummy():
 
     return {'hello': 'world'}
 
-@app.post('/match_ingredients/', response_model = BodyIngredientsOut, status_code = 200)
-def match_ingredients(ingredients: BodyIngredientsIn):
+@app.get('/ready/', status_code = 200)
+def ready():
+
+    if not ingredient_match.STATE.ready:
+        return JSONResponse(status_code = 503, content = {'ready': False, 'error': ingredient_match.STATE.error})
+
+    return {'ready': True};
+
+@app.get('/cache_stats/', status_code = 200)
+def cache_stats():
+
+    return ingredient_match.STATE.embedding_cache.stats();
+
+@app.get('/executor_stats/', status_code = 200)
+async def executor_stats():
+
+    return {'executor': INFERENCE_EXECUTOR.stats(),
+            'batcher': MATCH_BATCHER.stats() if MATCH_BATCHER is not None else None};
+
+@app.post('/admin/reload/', status_code = 200)
+async def reload_data(x_admin_token: Union[str, None] = Header(None)):
+
+    global RELOAD_FUTURE
+
+    check_admin_token(x_admin_token)
+    check_ready()
+
+    # Build the new data in a thread, requests keep using the current data until it is swapped.
+    # Calls arriving during a reload get its result instead of queueing another one
+    if RELOAD_FUTURE is None or RELOAD_FUTURE.done():
+        loop = asyncio.get_running_loop()
+        RELOAD_FUTURE = loop.run_in_executor(None, ingredient_match.STATE.reload)
+
+    try:
+        source_versions = await asyncio.shield(RELOAD_FUTURE)
+
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f'Reload failed, keeping the current data. Exception: {e}')
+
+    data = ingredient_match.STATE.get_data()
+
+    return {'stopwords_table_version': source_versions[0],
+            'taxonomy_table_version': source_versions[1],
+            'taxonomy_rows': len(data.array_taxonomy_ids)};
+
+@app.post('/match_ingredients/', response_model = BodyIngredientsOut, response_model_exclude_none = True, status_code = 200)
+async def match_ingredients(ingredients: BodyIngredientsIn):
 
     # print('\nEndpoint called.')
     # TIME_ABS = time.time()
     # TIME = time.time()
 
+    check_ready()
+
     # Extract list
     list_ingredients = ingredients.dict()['ingredients']
+    top_k = ingredients.dict()['top_k']
     # print(f'Time to list_ingredients: {time.time() - TIME:.2f} s\n')
     # TIME = time.time()
 
-    # Execute functions
-    response = ingredient_match.execute_matched_ingredients(list_ingredients)
+    # Execute functions, rejecting the request if too many are waiting
+    ingredients_clean, list_inverse = ingredient_match.prepare_ingredients(list_ingredients)
+    list_items = [(i, top_k) for i in ingredients_clean]
+
+    try:
+        if MATCH_BATCHER is not None:
+            list_results = await MATCH_BATCHER.submit(list_items)
+        else:
+            list_results = await INFERENCE_EXECUTOR.run(ingredient_match.match_cleaned_ingredients, list_items)
+
+    except QueueFullError:
+        raise HTTPException(status_code = 503, detail = 'Server busy, please retry later.', headers = {'Retry-After': '1'})
+
+    response = ingredient_match.assemble_response_match_ingredients(list_ingredients, list_results, list_inverse, top_k)
     # print(f'\nTime to execute_matched_ingredients: {time.time() - TIME:.2f} s')
     
     # print(f'\nTotal execution time: {time.time() - TIME_ABS:.2f} s')
@@ -99,13 +225,19 @@ def match_ingredients(ingredients: BodyIngredientsIn):
     return {'response': response};
 
 @app.post('/get_properties/', response_model = BodyPropertiesOut, status_code = 200)
-def get_properties(ingredient_ids: BodyPropertiesIn):
+async def get_properties(ingredient_ids: BodyPropertiesIn):
+
+    check_ready()
 
     # Extract list
     list_ingredient_ids = ingredient_ids.dict()['ingredient_ids']
 
-    # Execute functions
-    response = ingredient_match.execute_fill_properties(list_ingredient_ids)
+    # Execute functions, answering 503 when no database connection becomes free in time
+    try:
+        response = await ingredient_match.execute_fill_properties_async(list_ingredient_ids)
+
+    except TimeoutError:
+        raise HTTPException(status_code = 503, detail = 'Database busy, please retry later.', headers = {'Retry-After': '1'})
 
     return {'response': response};
 
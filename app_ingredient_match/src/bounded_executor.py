@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Thread pool for blocking work (model inference) awaited from async endpoints. The number of
+pending calls is bounded, so bursts are rejected instead of queueing without limit."""
+
+# Import modules
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Define classes
+class QueueFullError(Exception):
+    """Raised when the executor already has the maximum number of pending calls."""
+
+class BoundedExecutor:
+    """
+    Runs functions in a dedicated thread pool, with at most max_workers running and max_queue waiting.
+    Must be used from a single event loop.
+
+    Parameters
+    ----------
+    max_workers (int): number of threads
+    max_queue (int): number of calls allowed to wait for a free thread
+    thread_name_prefix (str) OPTIONAL: prefix of the thread names. Default 'inference'
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, thread_name_prefix: str = 'inference'):
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+
+        self._executor = ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = thread_name_prefix)
+
+    async def run(self, function, *args):
+        """
+        Runs a function in the pool and waits for its result.
+
+        Parameters
+        ----------
+        function (callable): blocking function
+        *args: arguments of the function
+
+        Returns
+        ----------
+        result: value returned by the function
+
+        Exception
+        ----------
+        QueueFullError if max_workers + max_queue calls are already pending
+        """
+
+        # The counter is only changed from the event loop, so it needs no lock
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f'{self.pending} calls pending')
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(function, *args)
+        self.pending += 1
+
+        # Released when the job ends rather than when the caller stops waiting, as a cancelled caller
+        # (e.g. client disconnect) leaves a running job behind. Registered first, so it runs before the caller resumes
+        future.add_done_callback(lambda f: self._release(loop))
+
+        return await asyncio.wrap_future(future);
+
+    def _release(self, loop):
+
+        # Called from the worker thread, the counter is changed in the event loop
+        try:
+            loop.call_soon_threadsafe(self._decrement)
+
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def _decrement(self):
+
+        self.pending -= 1
+
+    def stats(self):
+        """
+        Returns the counters of the executor.
+
+        Returns
+        ----------
+        dict_stats (dict): pending and rejected calls, and limits
+        """
+
+        return {'pending': self.pending,
+                'rejected': self.rejected,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue};
+
+    def shutdown(self):
+
+        self._executor.shutdown(wait = False)
@@ -5,13 +5,41 @@
 # Import libraries
 import os
 
-from sentence_transformers import SentenceTransformer
-SENTENCE_MODEL = SentenceTransformer('paraphrase-mpnet-base-v2')
+SENTENCE_MODEL_NAME = 'paraphrase-mpnet-base-v2'
+ENCODER_BACKEND = os.environ.get('ENCODER_BACKEND', 'torch') # 'torch' or 'onnx' (exported with python -m src.encoders), loaded with encoders.load_encoder
+ONNX_MODEL_PATH = os.environ.get('ONNX_MODEL_PATH', 'onnx_model/')
+ONNX_QUANTISED = os.environ.get('ONNX_QUANTISED', 'true').lower() == 'true' # Dynamic int8 quantisation
 
 # Define consants
 STOPWORDS_SQL_TABLE = 'pantry__stopwords'
 TAXONOMY_VECTOR_SQL_TABLE = 'pantry__taxonomy_vector'
 PROPERTIES_SQL_TABLE = 'pantry__taxonomy_ref_values'
+DATA_VERSIONS_SQL_TABLE = 'pantry__data_versions'
+
+TAXONOMY_SNAPSHOT_PATH = os.environ.get('TAXONOMY_SNAPSHOT_PATH', 'snapshot/') # Written by app_management/vectorise_taxonomy.py
+VERIFY_SNAPSHOT_CHECKSUM = os.environ.get('VERIFY_SNAPSHOT_CHECKSUM', 'true').lower() == 'true'
+
+ANN_METHOD = os.environ.get('ANN_METHOD', 'exact') # 'hnsw' or 'exact' (brute force)
+ANN_EF_SEARCH = int(os.environ.get('ANN_EF_SEARCH', '64'))
+ANN_MIN_RECALL = float(os.environ.get('ANN_MIN_RECALL', '0.95')) # Below this, the server falls back to exact search
+
+MAX_TOP_K = int(os.environ.get('MAX_TOP_K', '20')) # Upper limit of candidates per ingredient in /match_ingredients/
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', '10000')) # Number of cleaned names cached per worker, 0 disables the cache
+EMBEDDING_CACHE_TTL = float(os.environ.get('EMBEDDING_CACHE_TTL', '86400')) # Seconds
+
+PROPERTY_STORE_ENABLED = os.environ.get('PROPERTY_STORE_ENABLED', 'true').lower() == 'true' # If false, properties are queried per request
+PROPERTY_STORE_CHECK_INTERVAL = float(os.environ.get('PROPERTY_STORE_CHECK_INTERVAL', '30')) # Seconds between checks of the table version
+
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '1')) # Threads encoding ingredients, each one uses all torch threads
+INFERENCE_MAX_QUEUE = int(os.environ.get('INFERENCE_MAX_QUEUE', '16')) # Requests waiting for encoding before answering 503
+
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', '5')) # Time concurrent requests are collected into one batch, 0 disables batching
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', '64')) # Ingredients that trigger a batch before the wait ends
+
+STARTUP_RETRY_INTERVAL = float(os.environ.get('STARTUP_RETRY_INTERVAL', '10')) # Seconds between attempts to load the model and data at startup
+DATA_RELOAD_CHECK_INTERVAL = float(os.environ.get('DATA_RELOAD_CHECK_INTERVAL', '60')) # Seconds between checks of the stopwords and taxonomy versions
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '') # Required in the X-Admin-Token header of /admin/ endpoints, empty disables them
 
 # Define functions
 def get_mysql_params():
@@ -30,10 +58,28 @@ def get_mysql_params():
     DB_USERNAME = os.environ.get('DB_USERNAME', 'servuser')
     DB_PASSWORD = os.environ.get('DB_PASSWORD')
 
+    # Limits of the shared connection pool
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10')) # Seconds waiting for a free connection
+    DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', '3600')) # Seconds before a connection is replaced
+
     dict_out = {'DB_HOST': DB_HOST,
                 'DB_NAME': DB_NAME,
                 'DB_PORT': DB_PORT,
                 'DB_USERNAME': DB_USERNAME,
-                'DB_PASSWORD': DB_PASSWORD}
+                'DB_PASSWORD': DB_PASSWORD,
+                'DB_POOL_SIZE': DB_POOL_SIZE,
+                'DB_POOL_TIMEOUT': DB_POOL_TIMEOUT,
+                'DB_POOL_RECYCLE': DB_POOL_RECYCLE}
     
-    return dict_out;
\ No newline at end of file
+    return dict_out;
+
+#############################################################
+###################### Execute script #######################
+#############################################################
+
+if __name__ == '__main__':
+
+    # Downloads the model from the sentence-transformers library, e.g. when building the image
+    from sentence_transformers import SentenceTransformer
+    SentenceTransformer(SENTENCE_MODEL_NAME)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Bounded pool of MySQL connections shared by the serving path, so requests do not pay a
+connection handshake each time. Connections are health-checked when they have been idle,
+recycled after a maximum lifetime and discarded when a query fails. Async endpoints use an
+aiomysql pool with the same limits."""
+
+# Import modules
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+# Define constants
+DEFAULT_POOL_SIZE = 5
+DEFAULT_POOL_TIMEOUT = 10 # Seconds waiting for a free connection
+DEFAULT_POOL_RECYCLE = 3600 # Seconds before a connection is replaced
+PING_AFTER_IDLE = 30 # Seconds idle before a connection is pinged on checkout
+
+POOLS = {}
+POOLS_LOCK = threading.Lock()
+ASYNC_POOLS = {} # Tasks creating the aiomysql pools, only used from the event loop
+
+# Define classes
+class ConnectionPool:
+    """
+    Thread-safe pool of at most pool_size connections to the same database.
+
+    Parameters
+    ----------
+    db_params (dict): dictionary containing the connection parameters (like host, username, etc.) and, optionally,
+        DB_POOL_SIZE, DB_POOL_TIMEOUT and DB_POOL_RECYCLE
+    connect (callable) OPTIONAL: function returning a new connection. Default pymysql.connect
+    """
+
+    def __init__(self, db_params: dict, connect = pymysql.connect):
+
+        self.db_params = db_params
+        self.pool_size = int(db_params.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE))
+        self.timeout = float(db_params.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT))
+        self.recycle = float(db_params.get('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE))
+
+        self._connect = connect
+        self._idle = deque() # (connection, created_at, last_used)
+        self._n_open = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def _create_connection(self):
+
+        # Autocommit so reused connections do not keep reading from an old snapshot
+        connection = self._connect(host = self.db_params['DB_HOST'],
+                                    port = self.db_params['DB_PORT'],
+                                    database = self.db_params['DB_NAME'],
+                                    user = self.db_params['DB_USERNAME'],
+                                    password = self.db_params['DB_PASSWORD'],
+                                    autocommit = True)
+
+        return connection, time.monotonic();
+
+    def _is_healthy(self, connection, created_at: float, last_used: float):
+
+        now = time.monotonic()
+
+        if now - created_at > self.recycle:
+            return False
+
+        if now - last_used > PING_AFTER_IDLE:
+            try:
+                connection.ping(reconnect = False)
+            except Exception:
+                return False
+
+        return True;
+
+    def _discard(self, connection):
+
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+        with self._condition:
+            self._n_open -= 1
+            self._condition.notify()
+
+    def acquire(self):
+        """
+        Checks out a healthy connection, opening one if the pool is not full.
+
+        Returns
+        ----------
+        connection (pymysql.Connection): open connection
+        created_at (float): monotonic time when the connection was opened
+
+        Exception
+        ----------
+        TimeoutError if no connection becomes free within the pool timeout
+        RuntimeError if the pool is closed
+        """
+
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            with self._condition:
+                while not self._closed and not self._idle and self._n_open >= self.pool_size:
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        raise TimeoutError(f'No database connection available after {self.timeout} s')
+
+                    self._condition.wait(remaining)
+
+                if self._closed:
+                    raise RuntimeError('Connection pool is closed')
+
+                if self._idle:
+                    connection, created_at, last_used = self._idle.pop()
+                else:
+                    connection = None
+                    self._n_open += 1
+
+            # Open a new connection outside the lock
+            if connection is None:
+                try:
+                    return self._create_connection();
+                except Exception:
+                    with self._condition:
+                        self._n_open -= 1
+                        self._condition.notify()
+                    raise
+
+            if self._is_healthy(connection, created_at, last_used):
+                return connection, created_at;
+
+            self._discard(connection)
+
+    def release(self, connection, created_at: float, broken: bool = False):
+        """
+        Returns a connection to the pool, or closes it if it failed.
+
+        Parameters
+        ----------
+        connection (pymysql.Connection): connection obtained from acquire
+        created_at (float): monotonic time when the connection was opened
+        broken (bool) OPTIONAL: if True, the connection is closed instead of reused. Default False
+        """
+
+        with self._condition:
+            if not broken and not self._closed:
+                self._idle.append((connection, created_at, time.monotonic()))
+                self._condition.notify()
+                return
+
+        # Broken connections, and any connection released after the pool was closed
+        self._discard(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and returns it to the pool. The connection is
+        recycled if the block raises.
+        """
+
+        connection, created_at = self.acquire()
+
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, created_at, broken = True)
+            raise
+        else:
+            self.release(connection, created_at)
+
+    def close(self):
+        """
+        Closes all idle connections and rejects new checkouts. Connections in use are closed when released.
+        """
+
+        with self._condition:
+            self._closed = True
+            list_idle = list(self._idle)
+            self._idle.clear()
+            self._n_open -= len(list_idle)
+            self._condition.notify_all()
+
+        for connection, _, _ in list_idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        """
+        Returns the counters of the pool.
+
+        Returns
+        ----------
+        dict_stats (dict): open and idle connections, and pool size
+        """
+
+        with self._condition:
+            return {'open': self._n_open,
+                    'idle': len(self._idle),
+                    'pool_size': self.pool_size};
+
+# Define functions
+def get_pool_key(db_params: dict):
+
+    return db_params['DB_HOST'], db_params['DB_PORT'], db_params['DB_NAME'], db_params['DB_USERNAME'];
+
+def get_pool(db_params: dict):
+    """
+    Returns the shared pool for a database, creating it on first use.
+
+    Parameters
+    ----------
+    db_params (dict): dictionary containing the connection parameters (like host, username, etc.)
+
+    Returns
+    ----------
+    pool (ConnectionPool): pool shared by all callers with the same host, port, database and user
+    """
+
+    key = get_pool_key(db_params)
+
+    with POOLS_LOCK:
+        if key not in POOLS:
+            POOLS[key] = ConnectionPool(db_params)
+
+        return POOLS[key];
+
+def close_pools():
+    """
+    Closes the idle connections of all pools, e.g. on server shutdown.
+    """
+
+    with POOLS_LOCK:
+        for pool in POOLS.values():
+            pool.close()
+
+async def get_async_pool(db_params: dict):
+    """
+    Returns the shared aiomysql pool for a database, creating it on first use.
+
+    Parameters
+    ----------
+    db_params (dict): dictionary containing the connection parameters (like host, username, etc.)
+
+    Returns
+    ----------
+    pool (aiomysql.Pool): pool shared by all coroutines with the same host, port, database and user
+
+    Exception
+    ----------
+    ImportError if aiomysql is not installed
+    """
+
+    if aiomysql is None:
+        raise ImportError('aiomysql is required for async database access')
+
+    key = get_pool_key(db_params)
+
+    # No await between the check and the assignment, so concurrent requests share one creation
+    if key not in ASYNC_POOLS:
+        ASYNC_POOLS[key] = asyncio.ensure_future(aiomysql.create_pool(host = db_params['DB_HOST'],
+                                                                        port = db_params['DB_PORT'],
+                                                                        db = db_params['DB_NAME'], # aiomysql has no 'database' argument
+                                                                        user = db_params['DB_USERNAME'],
+                                                                        password = db_params['DB_PASSWORD'] or '',
+                                                                        minsize = 1,
+                                                                        maxsize = int(db_params.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+                                                                        pool_recycle = int(db_params.get('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE)),
+                                                                        autocommit = True))
+
+    task = ASYNC_POOLS[key]
+
+    try:
+        return await task;
+
+    except Exception:
+        # Retry the creation in the next call
+        if ASYNC_POOLS.get(key) is task:
+            del ASYNC_POOLS[key]
+        raise
+
+async def close_async_pools():
+    """
+    Closes all aiomysql pools, e.g. on server shutdown.
+    """
+
+    for key, task in list(ASYNC_POOLS.items()):
+        del ASYNC_POOLS[key]
+
+        if task.done() and task.exception() is None:
+            pool = task.result()
+            pool.close()
+            await pool.wait_closed()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Bounded in-memory cache for ingredient embeddings and their best match, keyed by the cleaned
+ingredient name. Entries expire after a time-to-live and the whole cache is invalidated when the
+data version (taxonomy and stopwords) changes."""
+
+# Import modules
+import time
+import threading
+from collections import OrderedDict
+
+# Define classes
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache with time-to-live and hit/miss counters.
+
+    Parameters
+    ----------
+    max_size (int) OPTIONAL: maximum number of entries. 0 disables the cache. Default 10000
+    ttl (float) OPTIONAL: seconds an entry is valid for. None means entries do not expire. Default None
+    version (hashable) OPTIONAL: data version of the stored entries. Default None
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = None, version = None):
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+
+        return len(self._entries);
+
+    def get(self, key: str):
+        """
+        Retrieves an entry and marks it as recently used.
+
+        Parameters
+        ----------
+        key (str): cleaned ingredient name
+
+        Returns
+        ----------
+        value: the stored value, or None if the key is missing or expired
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or (self.ttl is not None and time.monotonic() - entry[0] > self.ttl):
+                if entry is not None:
+                    del self._entries[key]
+
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[1];
+
+    def put(self, key: str, value):
+        """
+        Stores an entry, evicting the least recently used ones above max_size.
+
+        Parameters
+        ----------
+        key (str): cleaned ingredient name
+        value: value to store, e.g. embedding, matched id and score
+        """
+
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last = False)
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+
+    def validate(self, version):
+        """
+        Clears the cache if the data version changed since the entries were stored.
+
+        Parameters
+        ----------
+        version (hashable): current data version
+
+        Returns
+        ----------
+        invalidated (bool): True if the cache was cleared
+        """
+
+        with self._lock:
+            if version == self.version:
+                return False
+
+            self._entries.clear()
+            self.version = version
+
+            return True;
+
+    def stats(self):
+        """
+        Returns the counters of the cache.
+
+        Returns
+        ----------
+        dict_stats (dict): hits, misses, hit ratio, current size, max size and ttl
+        """
+
+        with self._lock:
+            n_requests = self.hits + self.misses
+
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_ratio': round(self.hits / n_requests, 4) if n_requests > 0 else None,
+                    'size': len(self._entries),
+                    'max_size': self.max_size,
+                    'ttl': self.ttl};
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Encoder backends for the sentence model. Besides the PyTorch model from sentence_transformers,
+the transformer can be exported to ONNX, quantised to int8 and run with onnxruntime on CPU.
+To export the model, type in the command line: python -m src.encoders {output directory}
+"""
+
+# Import modules
+import os
+import json
+import numpy as np
+
+from src.config_env import SENTENCE_MODEL_NAME
+
+# Define constants
+ONNX_CONFIG_FILENAME = 'encoder_config.json'
+ONNX_FP32_FILENAME = 'model.onnx'
+ONNX_INT8_FILENAME = 'model_int8.onnx'
+ONNX_OPSET = 14
+
+# Define classes
+class OnnxSentenceEncoder:
+    """
+    Sentence encoder running an exported transformer with onnxruntime, followed by mean pooling.
+    Exposes the same encode method as sentence_transformers.SentenceTransformer.
+
+    Parameters
+    ----------
+    path_model (str): directory written by export_onnx_model
+    quantised (bool) OPTIONAL: if True, uses the int8 model. Default True
+    n_threads (int) OPTIONAL: threads used by onnxruntime. Default None (all cores)
+    """
+
+    def __init__(self, path_model: str, quantised: bool = True, n_threads: int = None):
+
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(path_model, ONNX_CONFIG_FILENAME), 'r') as F:
+            self.config = json.load(F)
+
+        self.max_seq_length = self.config['max_seq_length']
+        self.tokenizer = AutoTokenizer.from_pretrained(path_model)
+
+        options = onnxruntime.SessionOptions()
+
+        if n_threads is not None:
+            options.intra_op_num_threads = n_threads
+
+        filename = ONNX_INT8_FILENAME if quantised else ONNX_FP32_FILENAME
+        self.session = onnxruntime.InferenceSession(os.path.join(path_model, filename), options, providers = ['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs):
+        """
+        Vectorises sentences as the mean of the token embeddings.
+
+        Parameters
+        ----------
+        sentences (list or str): text to be processed with N elements
+        batch_size (int) OPTIONAL: sentences per inference call. Default 32
+        normalize_embeddings (bool) OPTIONAL: if True, vectors have unit length. Default False
+        **kwargs: other arguments of SentenceTransformer.encode, ignored
+
+        Returns
+        ----------
+        array_embeddings (numpy.array): array of shape Nx768 (or 768 for a single string)
+        """
+
+        is_single = isinstance(sentences, str)
+        list_sentences = [sentences] if is_single else list(sentences)
+
+        if not list_sentences:
+            return np.empty((0, self.config['dimension']), dtype = np.float32);
+
+        # Sort by length to reduce padding, as sentence_transformers does
+        order = np.argsort([-len(i) for i in list_sentences], kind = 'stable')
+        list_embeddings = []
+
+        for start in range(0, len(list_sentences), batch_size):
+            list_batch = [list_sentences[i] for i in order[start:start + batch_size]]
+
+            tokens = self.tokenizer(list_batch, padding = True, truncation = True, max_length = self.max_seq_length, return_tensors = 'np')
+            dict_inputs = {i: tokens[i].astype(np.int64) for i in self.input_names}
+
+            array_hidden = self.session.run(['last_hidden_state'], dict_inputs)[0]
+
+            # Mean pooling over the tokens that are not padding
+            array_mask = tokens['attention_mask'][..., None].astype(np.float32)
+            array_sum = (array_hidden * array_mask).sum(axis = 1)
+            list_embeddings.append(array_sum / np.clip(array_mask.sum(axis = 1), 1e-9, None))
+
+        # Restore original order
+        array_embeddings = np.empty((len(list_sentences), list_embeddings[0].shape[1]), dtype = np.float32)
+        array_embeddings[order] = np.vstack(list_embeddings)
+
+        if normalize_embeddings:
+            array_embeddings /= np.clip(np.linalg.norm(array_embeddings, axis = 1, keepdims = True), 1e-12, None)
+
+        return array_embeddings[0] if is_single else array_embeddings;
+
+# Define functions
+def export_onnx_model(path_output: str, model_name: str = SENTENCE_MODEL_NAME, quantise: bool = True, opset: int = ONNX_OPSET):
+    """
+    Exports the transformer of a sentence_transformers model to ONNX, with its tokenizer, and quantises the weights to int8.
+
+    Parameters
+    ----------
+    path_output (str): directory to write the model to
+    model_name (str) OPTIONAL: name of the sentence_transformers model. Default SENTENCE_MODEL_NAME
+    quantise (bool) OPTIONAL: if True, also writes a model with dynamic int8 quantisation. Default True
+    opset (int) OPTIONAL: ONNX opset version. Default ONNX_OPSET
+    """
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    model = SentenceTransformer(model_name, device = 'cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    os.makedirs(path_output, exist_ok = True)
+
+    # Dynamic batch and sequence axes
+    tokens = tokenizer(['dummy ingredient'], return_tensors = 'pt')
+    input_names = [i for i in ['input_ids', 'attention_mask', 'token_type_ids'] if i in tokens]
+    dict_axes = {i: {0: 'batch', 1: 'sequence'} for i in input_names + ['last_hidden_state']}
+
+    with torch.no_grad():
+        torch.onnx.export(transformer,
+                          tuple(tokens[i] for i in input_names),
+                          os.path.join(path_output, ONNX_FP32_FILENAME),
+                          input_names = input_names,
+                          output_names = ['last_hidden_state'],
+                          dynamic_axes = dict_axes,
+                          opset_version = opset)
+
+    if quantise:
+        quantize_dynamic(os.path.join(path_output, ONNX_FP32_FILENAME),
+                         os.path.join(path_output, ONNX_INT8_FILENAME),
+                         weight_type = QuantType.QInt8)
+
+    tokenizer.save_pretrained(path_output)
+
+    dict_config = {'model_name': model_name,
+                   'max_seq_length': model.max_seq_length,
+                   'dimension': model.get_sentence_embedding_dimension(),
+                   'quantised': quantise}
+
+    with open(os.path.join(path_output, ONNX_CONFIG_FILENAME), 'w') as F:
+        json.dump(dict_config, F, indent = 2)
+
+def load_encoder(backend: str = 'torch', model_name: str = SENTENCE_MODEL_NAME, path_onnx: str = None, quantised: bool = True):
+    """
+    Loads the sentence model with the selected backend.
+
+    Parameters
+    ----------
+    backend (str) OPTIONAL: 'torch' (sentence_transformers) or 'onnx' (onnxruntime). Default 'torch'
+    model_name (str) OPTIONAL: name of the sentence_transformers model. Default SENTENCE_MODEL_NAME
+    path_onnx (str) OPTIONAL: directory written by export_onnx_model, required for 'onnx'. Default None
+    quantised (bool) OPTIONAL: if True, the ONNX backend uses the int8 model. Default True
+
+    Returns
+    ----------
+    model: object with an encode method like SentenceTransformer.encode
+
+    Exception
+    ----------
+    ValueError if the backend is unknown
+    """
+
+    if backend == 'torch':
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name);
+
+    if backend == 'onnx':
+        return OnnxSentenceEncoder(path_onnx, quantised);
+
+    raise ValueError(f'Unknown encoder backend: {backend}')
+
+#############################################################
+###################### Execute script #######################
+#############################################################
+
+if __name__ == '__main__':
+
+    import sys
+
+    # Output directory as optional argument, the server reads it from ONNX_MODEL_PATH
+    path_output = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('ONNX_MODEL_PATH', 'onnx_model/')
+
+    export_onnx_model(path_output)
+    print(f'ONNX model written to {path_output}')
@@ -4,24 +4,69 @@
 ingredients and the stored taxonomy."""
 
 # Import modules
-import re
+import os
+import json
+import asyncio
 import time
-import pymysql
+import struct
+import pickle
+import zlib
+import hashlib
+import threading
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import namedtuple
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
 
 import src.config_env as config_env
+import src.db_pool as db_pool
+import src.encoders as encoders
+from src.embedding_cache import EmbeddingCache
+from src.property_store import PropertyStore
+from src.taxonomy_buffer import TaxonomyBuffer
+from src.text_normaliser import TextNormaliser, PATTERN_SPECIAL_CHARS, PATTERN_DOUBLE_SPACES
 
 # Define constants
 DB_PARAMS = config_env.get_mysql_params()
-SENTENCE_MODEL = config_env.SENTENCE_MODEL
 
 STOPWORDS_SQL_TABLE = config_env.STOPWORDS_SQL_TABLE
 TAXONOMY_VECTOR_SQL_TABLE = config_env.TAXONOMY_VECTOR_SQL_TABLE
 PROPERTIES_SQL_TABLE = config_env.PROPERTIES_SQL_TABLE
+DATA_VERSIONS_SQL_TABLE = config_env.DATA_VERSIONS_SQL_TABLE
+
+TAXONOMY_SNAPSHOT_PATH = config_env.TAXONOMY_SNAPSHOT_PATH
+VERIFY_SNAPSHOT_CHECKSUM = config_env.VERIFY_SNAPSHOT_CHECKSUM
+SNAPSHOT_FORMAT_VERSION = 1
+
+ANN_METHOD = config_env.ANN_METHOD
+ANN_EF_SEARCH = config_env.ANN_EF_SEARCH
+ANN_MIN_RECALL = config_env.ANN_MIN_RECALL
+ANN_PARAMS = {'M': 16, 'ef_construction': 200} # Used only if the snapshot does not contain an index
+
+MAX_TOP_K = config_env.MAX_TOP_K
+
+EMBEDDING_CACHE_SIZE = config_env.EMBEDDING_CACHE_SIZE
+EMBEDDING_CACHE_TTL = config_env.EMBEDDING_CACHE_TTL
+
+PROPERTY_STORE_ENABLED = config_env.PROPERTY_STORE_ENABLED
+PROPERTY_STORE_CHECK_INTERVAL = config_env.PROPERTY_STORE_CHECK_INTERVAL
+
+INFERENCE_WORKERS = config_env.INFERENCE_WORKERS
+INFERENCE_MAX_QUEUE = config_env.INFERENCE_MAX_QUEUE
+MICRO_BATCH_MAX_WAIT_MS = config_env.MICRO_BATCH_MAX_WAIT_MS
+MICRO_BATCH_MAX_SIZE = config_env.MICRO_BATCH_MAX_SIZE
+
+STARTUP_RETRY_INTERVAL = config_env.STARTUP_RETRY_INTERVAL
+DATA_RELOAD_CHECK_INTERVAL = config_env.DATA_RELOAD_CHECK_INTERVAL
+ADMIN_TOKEN = config_env.ADMIN_TOKEN
 
 SQL_TABLE_FIELDS = ['taxonomy_id', 'property_type', 'property', 'reference_value']
 
+VECTOR_HEADER = struct.Struct('<2sH') # dtype code (2 bytes) and dimension (uint16), written by kafoodle_pantry.serialise_vector
+
 LIST_RESPONSE_KEYS = ['ingredient_ids', 'has_data', 'energy', 'fat', 'saturated', 'carbohydrate', 'fibre',
                     'sugar', 'protein', 'salt', 'gluten_wheat', 'gluten_rye',
                     'gluten_barley', 'gluten_oats', 'gluten', 'crustaceans', 'eggs', 'fish',
@@ -51,35 +96,55 @@ def retrieve_sql_table(tablename: str, db_params: dict = DB_PARAMS):
     ----------
     If there is a problem interacting with the database (could be connection or bad query)
     """
-    # Create connection
-    connectionObject = pymysql.connect(host = db_params['DB_HOST'],
-                                        port = db_params['DB_PORT'],
-                                        db = db_params['DB_NAME'],
-                                        user = db_params['DB_USERNAME'],
-                                        password = db_params['DB_PASSWORD'])
-
-    # Attempt connection
+    # Attempt connection, reusing one from the shared pool
     try:
+        with db_pool.get_pool(db_params).connection() as connectionObject:
 
-        # Create a cursor object
-        cursorObject = connectionObject.cursor() 
-        
-        # SQL query string
-        sqlQuery = f'SELECT * FROM {tablename}'
-        
-        # Execute the query
-        cursorObject.execute(sqlQuery)
-        
-        #Fetch all the rows
-        rows = cursorObject.fetchall()
+            # Create a cursor object
+            cursorObject = connectionObject.cursor() 
+            
+            # SQL query string
+            sqlQuery = f'SELECT * FROM {tablename}'
+            
+            # Execute the query
+            cursorObject.execute(sqlQuery)
+            
+            #Fetch all the rows
+            rows = cursorObject.fetchall()
 
         return rows;
 
     except Exception as e:
         raise Exception("Exeception occured:{}".format(e))
 
-    finally:
-        connectionObject.close();
+def create_query_filtered(tablename: str, set_ids: set, select_fields: list = SQL_TABLE_FIELDS):
+    """
+    Creates the query to retrieve selected fields from a table in the db, choosing ids pased as a parameter.
+
+    Parameters
+    ----------
+    tablename (str): the name of the table. Does not include db_name or schema
+    set_ids (set): unique ingredient ids to retrieve. This avoids calling all the table.
+    select_fields (list) OPTIONAL: list of columns to retrieve. Default stored in SQL_TABLE_FIELDS constant
+
+    Returns
+    ----------
+    sqlQuery (str): query string
+    """
+
+    # Process ids to filter
+    string_ids = str(set_ids).strip('}{')
+
+    # Process fields
+    select_cols = str(select_fields).strip('][')
+    select_cols = select_cols.replace("'", '')
+
+    sqlQuery = f'''SELECT {select_cols}
+                    FROM {tablename}
+                    WHERE taxonomy_id in ({string_ids})
+                        AND property_type <> "score"''' # Get only needed columns, filter out mean score (not needed)
+
+    return sqlQuery;
 
 def retrieve_sql_table_filtered(tablename: str, set_ids: set, select_fields: list = SQL_TABLE_FIELDS, db_params: dict = DB_PARAMS):
     """
@@ -101,127 +166,1047 @@ def retrieve_sql_table_filtered(tablename: str, set_ids: set, select_fields: lis
     If there is a problem interacting with the database (could be connection or bad query)
     """
 
-    # Create connection
-    connectionObject = pymysql.connect(host = db_params['DB_HOST'],
-                                        port = db_params['DB_PORT'],
-                                        db = db_params['DB_NAME'],
-                                        user = db_params['DB_USERNAME'],
-                                        password = db_params['DB_PASSWORD'])
+    # SQL query string
+    sqlQuery = create_query_filtered(tablename, set_ids, select_fields)
 
-    # Process ids to filter
-    string_ids = str(set_ids).strip('}{')
+    # Attempt connection, reusing one from the shared pool
+    try:
+        with db_pool.get_pool(db_params).connection() as connectionObject:
+
+            # Create a cursor object
+            cursorObject = connectionObject.cursor() 
+            
+            # Execute the query
+            cursorObject.execute(sqlQuery)
+            
+            #Fetch all the rows
+            rows = cursorObject.fetchall()
+
+        return rows;
+
+    # Pool exhausted, surfaced to the API as 503
+    except TimeoutError:
+        raise
+
+    except Exception as e:
+        raise Exception("Exeception occured:{}".format(e))
+
+async def retrieve_sql_table_filtered_async(tablename: str, set_ids: set, select_fields: list = SQL_TABLE_FIELDS, db_params: dict = DB_PARAMS):
+    """
+    Async version of retrieve_sql_table_filtered, for the API endpoints. Without aiomysql, the blocking version runs in
+    the default executor.
+
+    Parameters
+    ----------
+    tablename (str): the name of the table. Does not include db_name or schema
+    set_ids (set): unique ingredient ids to retrieve. This avoids calling all the table.
+    select_fields (list) OPTIONAL: list of columns to retrieve. Default stored in SQL_TABLE_FIELDS constant
+    db_params (dict) OPTIONAL: dictionary containing the connectrion parameters (like host, username, etc.). Default stored in config
+
+    Returns
+    ----------
+    rows (tuple): tuple containing all rows from the table, with selected fields.
+
+    Exception
+    ----------
+    If there is a problem interacting with the database (could be connection or bad query)
+    """
+
+    if db_pool.aiomysql is None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, retrieve_sql_table_filtered, tablename, set_ids, select_fields, db_params);
+
+    # SQL query string
+    sqlQuery = create_query_filtered(tablename, set_ids, select_fields)
+
+    # Attempt connection, reusing one from the shared pool. Waiting for a free connection is bounded, like the sync pool
+    timeout = float(db_params.get('DB_POOL_TIMEOUT', db_pool.DEFAULT_POOL_TIMEOUT))
+
+    try:
+        pool = await db_pool.get_async_pool(db_params)
+
+        try:
+            connectionObject = await asyncio.wait_for(pool.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f'No database connection available after {timeout} s')
+
+        try:
+            async with connectionObject.cursor() as cursorObject:
+
+                # Execute the query
+                await cursorObject.execute(sqlQuery)
+
+                #Fetch all the rows
+                rows = await cursorObject.fetchall()
+
+        finally:
+            pool.release(connectionObject)
+
+        return tuple(rows);
+
+    except TimeoutError:
+        raise
+
+    except Exception as e:
+        raise Exception("Exeception occured:{}".format(e))
+
+def retrieve_reference_values(tablename: str, select_fields: list = SQL_TABLE_FIELDS, db_params: dict = DB_PARAMS):
+    """
+    Retrieves selected fields of all properties from a table in the db, excluding the mean score.
+
+    Parameters
+    ----------
+    tablename (str): the name of the table. Does not include db_name or schema
+    select_fields (list) OPTIONAL: list of columns to retrieve. Default stored in SQL_TABLE_FIELDS constant
+    db_params (dict) OPTIONAL: dictionary containing the connectrion parameters (like host, username, etc.). Default stored in config
+
+    Returns
+    ----------
+    rows (tuple): tuple containing all rows from the table, with selected fields.
+
+    Exception
+    ----------
+    If there is a problem interacting with the database (could be connection or bad query)
+    """
 
     # Process fields
-    select_cols = str(select_fields).strip('][')
-    select_cols = select_cols.replace("'", '')
+    select_cols = ', '.join(select_fields)
+
+    # Attempt connection, reusing one from the shared pool
+    try:
+        with db_pool.get_pool(db_params).connection() as connectionObject:
+
+            # Create a cursor object
+            cursorObject = connectionObject.cursor()
+
+            # SQL query string
+            sqlQuery = f'''SELECT {select_cols}
+                            FROM {tablename}
+                            WHERE property_type <> "score"'''
+
+            # Execute the query
+            cursorObject.execute(sqlQuery)
+
+            #Fetch all the rows
+            rows = cursorObject.fetchall()
+
+        return rows;
+
+    except Exception as e:
+        raise Exception("Exeception occured:{}".format(e))
+
+def retrieve_data_version(tablename: str, versions_tablename: str = DATA_VERSIONS_SQL_TABLE, db_params: dict = DB_PARAMS):
+    """
+    Retrieves the version of a table, increased by app_management every time the table is rebuilt.
+
+    Parameters
+    ----------
+    tablename (str): the name of the versioned table
+    versions_tablename (str) OPTIONAL: the name of the table storing the versions. Default stored in config
+    db_params (dict) OPTIONAL: dictionary containing the connectrion parameters (like host, username, etc.). Default stored in config
+
+    Returns
+    ----------
+    version (int): version of the table, or None if it was never versioned
+
+    Exception
+    ----------
+    If there is a problem interacting with the database (could be connection or bad query)
+    """
+
+    # Attempt connection, reusing one from the shared pool
+    try:
+        with db_pool.get_pool(db_params).connection() as connectionObject:
+
+            # Create a cursor object
+            cursorObject = connectionObject.cursor()
+
+            # Execute the query
+            cursorObject.execute(f'SELECT version FROM {versions_tablename} WHERE table_name = %s', (tablename,))
+
+            #Fetch the version
+            row = cursorObject.fetchone()
+
+        return row[0] if row is not None else None;
+
+    except Exception as e:
+        raise Exception("Exeception occured:{}".format(e))
+
+def retrieve_sql_table_delta(tablename: str, min_id: int, db_params: dict = DB_PARAMS):
+    """
+    Retrieves the rows of a table added after a watermark, with the count and checksum of the rows up to it.
+        Comparing both with the loaded rows detects rows deleted or updated below the watermark.
+
+    Parameters
+    ----------
+    tablename (str): the name of the table. Must have an auto-increment id column
+    min_id (int): largest id already loaded (watermark)
+    db_params (dict) OPTIONAL: dictionary containing the connectrion parameters (like host, username, etc.). Default stored in config
+
+    Returns
+    ----------
+    n_rows_below (int): number of rows with id up to the watermark
+    checksum_below (int): sum of CRC32 of the vector_representation of the rows with id up to the watermark
+    rows (tuple): tuple containing all rows with id above the watermark, ordered by id
+
+    Exception
+    ----------
+    If there is a problem interacting with the database (could be connection or bad query)
+    """
+
+    # Attempt connection, reusing one from the shared pool
+    try:
+        with db_pool.get_pool(db_params).connection() as connectionObject:
+
+            # Create a cursor object
+            cursorObject = connectionObject.cursor()
+
+            # Count and checksum rows up to the watermark
+            cursorObject.execute(f'SELECT COUNT(*), COALESCE(SUM(CRC32(vector_representation)), 0) FROM {tablename} WHERE id <= %s', (min_id,))
+            n_rows_below, checksum_below = cursorObject.fetchone()
+
+            # Fetch new rows
+            cursorObject.execute(f'SELECT * FROM {tablename} WHERE id > %s ORDER BY id', (min_id,))
+            rows = cursorObject.fetchall()
+
+        return n_rows_below, int(checksum_below), rows;
+
+    except Exception as e:
+        raise Exception("Exeception occured:{}".format(e))
+
+def parse_stopwords(tuple_from_sql: tuple):
+    """
+    Parses the tuples from the DB query to a list of stopwords
+
+    Parameters
+    ----------
+    tuple_from_sql (tuple): a tuple with the stopwords in the second element
+
+    Returns
+    ----------
+    list_stopwords (list): list with the elements of the tuple
+    """
+
+    # Extract stopwords to list
+    list_stopwords = [i[1] for i in tuple_from_sql]
+
+    return list_stopwords;
+
+def deserialise_vector(value):
+    """
+    Converts a stored vector into a float32 numpy array. Supports the binary format (4-byte header with dtype
+        code and dimension, followed by raw little-endian values) and the legacy comma-separated text.
+
+    Parameters
+    ----------
+    value (bytes or str): vector as stored in the vector_representation column
+
+    Returns
+    ----------
+    vector (numpy.array): 1-D float32 array
+
+    Exception
+    ----------
+    If the binary header does not match the length of the blob
+    """
+
+    # Legacy text format, e.g. '[0.1,0.2]'
+    if isinstance(value, str) or value[:1] == b'[':
+        value = value if isinstance(value, str) else value.decode('ascii')
+        return np.array(value.strip('] [').split(','), dtype = np.float32);
+
+    # Binary format
+    dtype_code, dimension = VECTOR_HEADER.unpack_from(value)
+    dtype = np.dtype('<' + dtype_code.decode('ascii'))
+
+    if len(value) != VECTOR_HEADER.size + dimension * dtype.itemsize:
+        raise ValueError('Vector blob length does not match its header')
+
+    vector = np.frombuffer(value, dtype = dtype, count = dimension, offset = VECTOR_HEADER.size)
+
+    return vector.astype(np.float32);
+
+def compute_vectors_checksum(list_values: list):
+    """
+    Computes the checksum of stored vectors, equal to SUM(CRC32(vector_representation)) in MySQL.
+
+    Parameters
+    ----------
+    list_values (list): vectors as stored in the vector_representation column (bytes or str)
+
+    Returns
+    ----------
+    checksum (int): sum of the CRC32 of the values. NULL values are ignored, as in SUM
+    """
+
+    return sum(zlib.crc32(i.encode('utf-8') if isinstance(i, str) else i) for i in list_values if i is not None);
+
+def parse_taxonomy(tuple_from_sql: tuple):
+    """
+    Parses the tuples from the DB query to a dict containing table id (unique) as the key, and
+        taxonomy_id (non unique - plurals and singulars) and vector form.
+
+    Parameters
+    ----------
+    tuple_from_sql (tuple): a tuple with the ids in the first element, taxonomy_ids in the second, and vectors in the fourth.
+
+    Returns
+    ----------
+    dict_return (ddict): dictionary containing the organised vector representations of the taxonomy
+    """
+
+    # Create lists
+    list_ids = [i[0] for i in tuple_from_sql]
+    list_taxonomy_ids = [i[1] for i in tuple_from_sql]
+    list_vectors = [deserialise_vector(i[3]) for i in tuple_from_sql]
+
+    # Stack vectors into a single numpy array
+    array_vector = np.vstack(list_vectors)
+
+    # Create return dict
+    dict_return = {key: {'id':list_taxonomy_ids[pos], 'vector': array_vector[pos]} for pos, key in enumerate(list_ids)}
+
+    return dict_return;
+
+def preprocess_taxonomy(taxonomy: dict):
+    """
+    Parses the vectorised taxonomy into a list of integers (ids) and a numpy array of vectors
+
+    Parameters
+    ----------
+    taxonomy (dict) OPTIONAL: a dict containing the taxonomy ids as keys, and vector representation as values. Default TAXONOMY_VECT
+
+    Returns
+    ----------
+    taxonomy_list (list): list of integers containind the ids
+    taxonomy_vector (numpy.array): Numpy array of shape Nx768 containing numerical representations.
+
+    Exception
+    ----------
+    If the 'taxonomy' parameter is not dict type
+    """
+
+    # Check argument is dict type
+    if not isinstance(taxonomy, dict):
+        raise TypeError('Argument is not dict type')
+
+    taxonomy_list = [int(i['id']) for i in taxonomy.values()]
+    taxonomy_vector = np.array([i['vector'] for i in taxonomy.values()], dtype = np.float32)
+
+    return taxonomy_list, taxonomy_vector;
+
+def normalise_vectors(array_vectors):
+    """
+    L2-normalises the rows of an array, returning a contiguous float32 copy. Rows with zero norm are left as zeros.
+
+    Parameters
+    ----------
+    array_vectors (numpy.array): array of shape NxD
+
+    Returns
+    ----------
+    array_normalised (numpy.array): C-contiguous float32 array of shape NxD with unit-norm rows
+    """
+
+    array_normalised = np.array(array_vectors, dtype = np.float32, order = 'C', ndmin = 2)
+
+    norms = np.linalg.norm(array_normalised, axis = 1, keepdims = True)
+    norms[norms == 0] = 1
+    array_normalised /= norms
+
+    return array_normalised;
+
+def load_taxonomy_snapshot(path_snapshot: str, verify_checksum: bool = True):
+    """
+    Loads the taxonomy snapshot exported by vectorise_taxonomy.py. The vectors are memory-mapped (read-only),
+        so all workers in the same host share a single page-cached copy.
+
+    Parameters
+    ----------
+    path_snapshot (str): root directory of the snapshots, containing the CURRENT pointer
+    verify_checksum (bool) OPTIONAL: compares the sha256 of each array with the manifest. Default True
+
+    Returns
+    ----------
+    taxonomy_list (list): list of integers containing the taxonomy ids
+    taxonomy_vector (numpy.memmap): read-only array of shape Nx768 containing numerical representations
+    manifest (dict): metadata of the snapshot (version, rows, dimension, checksums)
+
+    Exception
+    ----------
+    If the snapshot does not exist, has an unknown format or is corrupted
+    """
+
+    # Resolve current version
+    with open(os.path.join(path_snapshot, 'CURRENT'), 'r') as f:
+        path_version = os.path.join(path_snapshot, f.read().strip())
+
+    with open(os.path.join(path_version, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+
+    if manifest['format_version'] != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f'Unknown snapshot format {manifest["format_version"]}')
+
+    # Map arrays
+    dict_arrays = {i: np.load(os.path.join(path_version, f'{i}.npy'), mmap_mode = 'r') for i in manifest['checksums'].keys()}
+
+    if dict_arrays['vectors'].shape != (manifest['rows'], manifest['dimension']):
+        raise ValueError('Snapshot shape does not match its manifest')
+
+    if verify_checksum:
+        for name, array in dict_arrays.items():
+            if hashlib.sha256(array.data).hexdigest() != manifest['checksums'][name]:
+                raise ValueError(f'Checksum mismatch in snapshot array {name}')
+
+    taxonomy_list = dict_arrays['taxonomy_ids'].tolist()
+    taxonomy_vector = dict_arrays['vectors']
+
+    # Snapshots are normalised when exported. Older ones need a private normalised copy
+    if not manifest.get('normalised', False):
+        taxonomy_vector = normalise_vectors(taxonomy_vector)
+
+    return taxonomy_list, taxonomy_vector, manifest;
+
+def load_taxonomy(path_snapshot: str = TAXONOMY_SNAPSHOT_PATH, verify_checksum: bool = VERIFY_SNAPSHOT_CHECKSUM):
+    """
+    Loads the vectorised taxonomy from the on-disk snapshot, falling back to MySQL if it is not available.
+
+    Parameters
+    ----------
+    path_snapshot (str) OPTIONAL: root directory of the snapshots, None to load from MySQL. Default TAXONOMY_SNAPSHOT_PATH
+    verify_checksum (bool) OPTIONAL: verifies the snapshot checksums. Default VERIFY_SNAPSHOT_CHECKSUM
+
+    Returns
+    ----------
+    taxonomy_list (list): list of integers containing the taxonomy ids
+    taxonomy_vector (numpy.array): L2-normalised, contiguous float32 array of shape Nx768
+    manifest (dict): metadata of the snapshot, None if the taxonomy was loaded from MySQL
+    max_id (int): largest row id of the table included, used as watermark to load new rows
+    vectors_checksum (int): checksum of the stored vectors included, None if not recorded in the snapshot
+    """
+
+    if path_snapshot is not None:
+        try:
+            taxonomy_list, taxonomy_vector, manifest = load_taxonomy_snapshot(path_snapshot, verify_checksum)
+            print(f'Taxonomy loaded from snapshot {manifest["version"]}')
+
+            return taxonomy_list, taxonomy_vector, manifest, manifest['max_id'], manifest.get('vectors_crc32');
+
+        except Exception as e:
+            print(f'Taxonomy snapshot not available ({e}). Loading taxonomy from MySQL.')
+
+    tuple_vect_taxonomy = retrieve_sql_table(TAXONOMY_VECTOR_SQL_TABLE)
+    dict_taxonomy = parse_taxonomy(tuple_vect_taxonomy)
+    taxonomy_list, taxonomy_vector = preprocess_taxonomy(dict_taxonomy)
+
+    return (taxonomy_list, normalise_vectors(taxonomy_vector), None, max(dict_taxonomy.keys(), default = 0),
+            compute_vectors_checksum([i[3] for i in tuple_vect_taxonomy]));
+
+def build_ann_index(array_taxonomy, method: str = 'hnsw', params: dict = ANN_PARAMS):
+    """
+    Builds an approximate nearest-neighbour index over the taxonomy vectors. Labels are the row positions.
+
+    Parameters
+    ----------
+    array_taxonomy (numpy.array): L2-normalised array of shape Nx768
+    method (str) OPTIONAL: type of index. Only 'hnsw' is supported. Default 'hnsw'
+    params (dict) OPTIONAL: construction parameters M and ef_construction. Default ANN_PARAMS
+
+    Returns
+    ----------
+    ann_index (hnswlib.Index): index containing all taxonomy vectors
+
+    Exception
+    ----------
+    If the method is unknown or hnswlib is not installed
+    """
+
+    if method != 'hnsw':
+        raise ValueError(f'Unknown ANN method {method}')
+
+    if hnswlib is None:
+        raise ImportError('hnswlib is required to build the ANN index')
+
+    n_rows, dimension = array_taxonomy.shape
+
+    ann_index = hnswlib.Index(space = 'ip', dim = dimension)
+    ann_index.init_index(max_elements = max(n_rows, 1), M = params['M'], ef_construction = params['ef_construction'])
+    ann_index.add_items(np.asarray(array_taxonomy, dtype = np.float32), np.arange(n_rows))
+
+    return ann_index;
+
+def query_ann_index(ann_index, ingredients_array):
+    """
+    Retrieves the best-matching taxonomy row for each ingredient from the ANN index.
+
+    Parameters
+    ----------
+    ann_index (hnswlib.Index): index built with build_ann_index
+    ingredients_array (numpy.array): L2-normalised vector representation of the ingredients
+
+    Returns
+    ----------
+    best_score_idx (numpy.array): row position of the best match per ingredient
+    best_score (numpy.array): inner product (cosine similarity) of the best match per ingredient
+    """
+
+    labels, distances = ann_index.knn_query(np.asarray(ingredients_array, dtype = np.float32), k = 1)
+
+    return labels[:, 0].astype(np.int64), 1 - distances[:, 0];
+
+def compute_recall(ann_index, list_taxonomy: list, array_taxonomy, n_queries: int = 1000, noise: float = 0.5, seed: int = 888):
+    """
+    Estimates the top-1 recall of the ANN index against exact brute-force search. Queries are perturbed
+        copies of taxonomy vectors, and a hit means both searches return the same taxonomy id.
+
+    Parameters
+    ----------
+    ann_index (hnswlib.Index): index built with build_ann_index
+    list_taxonomy (list): taxonomy ids per row
+    array_taxonomy (numpy.array): L2-normalised array of shape Nx768
+    n_queries (int) OPTIONAL: number of sampled queries. Default 1000
+    noise (float) OPTIONAL: norm of the random perturbation. Default 0.5
+    seed (int) OPTIONAL: random seed. Default 888
+
+    Returns
+    ----------
+    recall (float): fraction of queries where the ANN and exact matches agree
+    """
+
+    rng = np.random.default_rng(seed)
+    n_rows, dimension = array_taxonomy.shape
+
+    # Perturb sampled rows and normalise
+    idx_sample = rng.choice(n_rows, size = min(n_queries, n_rows), replace = False)
+    array_noise = rng.standard_normal((len(idx_sample), dimension)).astype(np.float32)
+    array_queries = array_taxonomy[idx_sample] + noise * array_noise / np.linalg.norm(array_noise, axis = 1, keepdims = True)
+    array_queries /= np.linalg.norm(array_queries, axis = 1, keepdims = True)
+
+    # Compare taxonomy ids from both searches
+    array_ids = np.asarray(list_taxonomy)
+    exact_idx = np.argmax(array_queries @ array_taxonomy.T, axis = 1)
+    ann_idx, _ = query_ann_index(ann_index, array_queries)
+
+    return float(np.mean(array_ids[exact_idx] == array_ids[ann_idx]));
+
+def load_ann_index(list_taxonomy: list, array_taxonomy, manifest: dict = None, method: str = ANN_METHOD,
+                    path_snapshot: str = TAXONOMY_SNAPSHOT_PATH, ef_search: int = ANN_EF_SEARCH, min_recall: float = ANN_MIN_RECALL):
+    """
+    Loads the ANN index saved with the taxonomy snapshot, or builds it if the snapshot has none. The index is
+        discarded if its recall against exact search is below min_recall.
+
+    Parameters
+    ----------
+    list_taxonomy (list): taxonomy ids per row
+    array_taxonomy (numpy.array): L2-normalised array of shape Nx768
+    manifest (dict) OPTIONAL: snapshot metadata from load_taxonomy. Default None (no snapshot)
+    method (str) OPTIONAL: 'hnsw' or 'exact'. Default ANN_METHOD
+    path_snapshot (str) OPTIONAL: root directory of the snapshots. Default TAXONOMY_SNAPSHOT_PATH
+    ef_search (int) OPTIONAL: size of the HNSW search queue, trades latency for recall. Default ANN_EF_SEARCH
+    min_recall (float) OPTIONAL: minimum acceptable top-1 recall. Default ANN_MIN_RECALL
+
+    Returns
+    ----------
+    ann_index (hnswlib.Index): the index, or None to use exact brute-force search
+    """
+
+    if method == 'exact':
+        return None
+
+    try:
+        dict_index = manifest.get('ann_index') if manifest is not None else None
+
+        # Load from snapshot if available, else build in memory
+        if dict_index is not None and dict_index['method'] == method:
+            path_index = os.path.join(path_snapshot, manifest['version'], dict_index['file'])
+
+            if VERIFY_SNAPSHOT_CHECKSUM:
+                with open(path_index, 'rb') as f:
+                    if hashlib.sha256(f.read()).hexdigest() != dict_index['checksum']:
+                        raise ValueError('Checksum mismatch in ANN index')
+
+            ann_index = hnswlib.Index(space = 'ip', dim = array_taxonomy.shape[1])
+            ann_index.load_index(path_index, max_elements = array_taxonomy.shape[0])
+
+        else:
+            ann_index = build_ann_index(array_taxonomy, method)
+
+        ann_index.set_ef(ef_search)
+
+        # Check recall against exact search
+        recall = compute_recall(ann_index, list_taxonomy, array_taxonomy)
+        print(f'ANN index ({method}) loaded with recall {recall:.4f}')
+
+        if recall < min_recall:
+            print(f'ANN recall below {min_recall}. Using exact search.')
+            return None
+
+        return ann_index;
+
+    except Exception as e:
+        print(f'ANN index not available ({e}). Using exact search.')
+        return None;
+
+def extend_ann_index(ann_index, array_vectors, start: int, ef_search: int = ANN_EF_SEARCH):
+    """
+    Adds rows to a copy of the ANN index, so requests can keep querying the current index meanwhile.
+        Copying the index is a memory copy, much cheaper than building it again.
+
+    Parameters
+    ----------
+    ann_index (hnswlib.Index): index whose labels are the row positions 0 to start-1
+    array_vectors (numpy.array): L2-normalised array of shape Mx768 with the new rows
+    start (int): row position of the first new vector
+    ef_search (int) OPTIONAL: size of the HNSW search queue. Default ANN_EF_SEARCH
+
+    Returns
+    ----------
+    ann_index (hnswlib.Index): new index containing start + M rows
+    """
+
+    ann_index = pickle.loads(pickle.dumps(ann_index))
+    end = start + len(array_vectors)
+
+    if end > ann_index.get_max_elements():
+        ann_index.resize_index(end)
+
+    ann_index.add_items(np.asarray(array_vectors, dtype = np.float32), np.arange(start, end))
+    ann_index.set_ef(ef_search)
+
+    return ann_index;
+
+def compute_stopwords_version(list_stopwords: list):
+    """
+    Computes a version string of the stopwords, independent of their order.
+
+    Parameters
+    ----------
+    list_stopwords (list): list of stopwords
+
+    Returns
+    ----------
+    version (str): sha256 of the sorted stopwords
+    """
+
+    return hashlib.sha256('\n'.join(sorted(list_stopwords)).encode('utf-8')).hexdigest();
+
+def compute_taxonomy_version(list_taxonomy: list, array_taxonomy, manifest: dict = None):
+    """
+    Computes a version string of the taxonomy: the snapshot version if available, else a checksum of ids and vectors.
+
+    Parameters
+    ----------
+    list_taxonomy (list): taxonomy ids per row
+    array_taxonomy (numpy.array): vector representation of the taxonomy
+    manifest (dict) OPTIONAL: snapshot metadata from load_taxonomy. Default None
+
+    Returns
+    ----------
+    version (str): version of the taxonomy
+    """
+
+    if manifest is not None:
+        return manifest['version']
+
+    hash_taxonomy = hashlib.sha256(np.asarray(list_taxonomy, dtype = np.int64).data)
+    hash_taxonomy.update(np.ascontiguousarray(array_taxonomy).data)
+
+    return hash_taxonomy.hexdigest();
+
+def extend_taxonomy_version(version: str, list_taxonomy: list, array_taxonomy):
+    """
+    Computes the version of the taxonomy after appending rows, from the previous version and the new rows only.
+
+    Parameters
+    ----------
+    version (str): version of the taxonomy before the append
+    list_taxonomy (list): taxonomy ids of the new rows
+    array_taxonomy (numpy.array): vector representation of the new rows
+
+    Returns
+    ----------
+    version (str): version of the extended taxonomy
+    """
+
+    hash_taxonomy = hashlib.sha256(version.encode('utf-8'))
+    hash_taxonomy.update(np.asarray(list_taxonomy, dtype = np.int64).data)
+    hash_taxonomy.update(np.ascontiguousarray(array_taxonomy).data)
+
+    return hash_taxonomy.hexdigest();
+
+def load_property_store(keys: list = LIST_RESPONSE_KEYS[2:], tablename: str = PROPERTIES_SQL_TABLE, check_interval: float = PROPERTY_STORE_CHECK_INTERVAL):
+    """
+    Loads the reference values into an in-memory store, reloaded when the version of the table changes.
+
+    Parameters
+    ----------
+    keys (list) OPTIONAL: property names, in the order of the response. Default LIST_RESPONSE_KEYS without ids and has_data
+    tablename (str) OPTIONAL: the name of the table with the reference values. Default stored in config
+    check_interval (float) OPTIONAL: minimum seconds between version checks. Default stored in config
+
+    Returns
+    ----------
+    property_store (PropertyStore): loaded store, or None if the table could not be loaded (properties are queried per request)
+    """
+
+    # The version table is optional, without it the store is never reloaded
+    def load_version():
+        try:
+            return retrieve_data_version(tablename);
+        except Exception:
+            return None
+
+    property_store = PropertyStore(keys, lambda: retrieve_reference_values(tablename), load_version, check_interval)
+
+    try:
+        property_store.reload()
+        return property_store;
+
+    except Exception as e:
+        print(f'Property store could not be loaded, querying the database per request. Exception: {e}')
+        return None
+
+# Define state
+ServingData = namedtuple('ServingData', ['list_stopwords', 'stopwords_version', 'text_normaliser', 'array_taxonomy', 'array_taxonomy_ids', 'taxonomy_manifest',
+                                         'taxonomy_index', 'taxonomy_version', 'taxonomy_max_id', 'taxonomy_checksum', 'taxonomy_buffer',
+                                         'source_versions'])
+
+def retrieve_serving_versions(tablenames: tuple = (STOPWORDS_SQL_TABLE, TAXONOMY_VECTOR_SQL_TABLE)):
+    """
+    Retrieves the versions of the stopwords and taxonomy tables, increased by app_management every time they are updated.
+
+    Parameters
+    ----------
+    tablenames (tuple) OPTIONAL: names of the versioned tables. Default stopwords and taxonomy vectors tables
+
+    Returns
+    ----------
+    versions (tuple): version per table, None if the table was never versioned or the version could not be read
+    """
+
+    list_versions = []
+
+    # The version table is optional, without it the data is only reloaded on demand
+    for tablename in tablenames:
+        try:
+            list_versions.append(retrieve_data_version(tablename))
+        except Exception:
+            list_versions.append(None)
+
+    return tuple(list_versions);
+
+def load_stopwords_data():
+    """
+    Loads the stopwords, computes their version and builds the text normaliser.
+
+    Returns
+    ----------
+    dict_data (dict): ServingData fields of the stopwords
+    """
+
+    tuple_stopwords = retrieve_sql_table(STOPWORDS_SQL_TABLE)
+    list_stopwords = parse_stopwords(tuple_stopwords)
+
+    return {'list_stopwords': list_stopwords,
+            'stopwords_version': compute_stopwords_version(list_stopwords),
+            'text_normaliser': TextNormaliser(list_stopwords)};
+
+def load_taxonomy_data(path_snapshot: str = TAXONOMY_SNAPSHOT_PATH, tablename: str = TAXONOMY_VECTOR_SQL_TABLE):
+    """
+    Loads the vectorised taxonomy, with its ANN index, version and watermark. A snapshot may lag the table (e.g.
+        not yet synced, or a failed export), so it is checked against the table: rows added after it are appended,
+        and if rows up to its watermark differ the whole taxonomy is loaded from MySQL instead.
+
+    Parameters
+    ----------
+    path_snapshot (str) OPTIONAL: root directory of the snapshots, None to load from MySQL. Default TAXONOMY_SNAPSHOT_PATH
+    tablename (str) OPTIONAL: the name of the vectorised taxonomy table. Default stored in config
+
+    Returns
+    ----------
+    dict_data (dict): ServingData fields of the taxonomy
+    """
+
+    list_taxonomy, array_taxonomy, taxonomy_manifest, taxonomy_max_id, taxonomy_checksum = load_taxonomy(path_snapshot)
+    taxonomy_index = load_ann_index(list_taxonomy, array_taxonomy, taxonomy_manifest)
+
+    dict_data = {'array_taxonomy': array_taxonomy,
+                 'array_taxonomy_ids': np.asarray(list_taxonomy, dtype = np.int64),
+                 'taxonomy_manifest': taxonomy_manifest,
+                 'taxonomy_index': taxonomy_index,
+                 'taxonomy_version': compute_taxonomy_version(list_taxonomy, array_taxonomy, taxonomy_manifest),
+                 'taxonomy_max_id': taxonomy_max_id,
+                 'taxonomy_checksum': taxonomy_checksum,
+                 'taxonomy_buffer': None}
+
+    if taxonomy_manifest is None:
+        return dict_data;
+
+    n_rows_below, checksum_below, tuple_delta = retrieve_sql_table_delta(tablename, taxonomy_max_id)
+
+    if n_rows_below != len(list_taxonomy) or checksum_below != taxonomy_checksum:
+        print(f'Taxonomy snapshot {taxonomy_manifest["version"]} does not match the table. Loading taxonomy from MySQL.')
+        return load_taxonomy_data(None, tablename);
+
+    dict_data.update(append_taxonomy_rows(dict_data, tuple_delta))
+
+    return dict_data;
+
+def append_taxonomy_rows(dict_data: dict, tuple_delta: tuple):
+    """
+    Appends taxonomy rows to the loaded ones, extending the ANN index, version, watermark and checksum.
+
+    Parameters
+    ----------
+    dict_data (dict): ServingData fields of the loaded taxonomy
+    tuple_delta (tuple): rows of the vectorised taxonomy table with id above the watermark, ordered by id
+
+    Returns
+    ----------
+    dict_data (dict): ServingData fields of the taxonomy that changed, empty if there are no rows
+    """
+
+    if not tuple_delta:
+        return {};
+
+    dict_delta = parse_taxonomy(tuple_delta)
+    list_delta, array_delta = preprocess_taxonomy(dict_delta)
+    array_delta = normalise_vectors(array_delta)
+
+    # Append to a buffer with spare rows. The first append copies the (possibly memory-mapped) matrix once
+    taxonomy_buffer = dict_data['taxonomy_buffer']
 
-    # Attempt connection
-    try:
+    if taxonomy_buffer is None or taxonomy_buffer.n_rows != len(dict_data['array_taxonomy_ids']):
+        taxonomy_buffer = TaxonomyBuffer(dict_data['array_taxonomy'], dict_data['array_taxonomy_ids'])
 
-        # Create a cursor object
-        cursorObject = connectionObject.cursor() 
-        
-        # SQL query string
-        sqlQuery = f'''SELECT {select_cols}
-                        FROM {tablename}
-                        WHERE taxonomy_id in ({string_ids})
-                            AND property_type <> "score"''' # Get only needed columns, filter out mean score (not needed)
-        
-        # Execute the query
-        cursorObject.execute(sqlQuery)
-        
-        #Fetch all the rows
-        rows = cursorObject.fetchall()
+    start = taxonomy_buffer.n_rows
+    array_taxonomy, array_taxonomy_ids = taxonomy_buffer.append(array_delta, list_delta)
 
-        return rows;
+    taxonomy_index = dict_data['taxonomy_index']
 
-    except Exception as e:
-        raise Exception("Exeception occured:{}".format(e))
+    if taxonomy_index is not None:
+        taxonomy_index = extend_ann_index(taxonomy_index, array_delta, start)
 
-    finally:
-        connectionObject.close();
+    print(f'Taxonomy extended with {len(list_delta)} rows')
 
-def parse_stopwords(tuple_from_sql: tuple):
+    return {'array_taxonomy': array_taxonomy,
+            'array_taxonomy_ids': array_taxonomy_ids,
+            'taxonomy_index': taxonomy_index,
+            'taxonomy_version': extend_taxonomy_version(dict_data['taxonomy_version'], list_delta, array_delta),
+            'taxonomy_max_id': max(dict_delta.keys()),
+            'taxonomy_checksum': dict_data['taxonomy_checksum'] + compute_vectors_checksum([i[3] for i in tuple_delta]),
+            'taxonomy_buffer': taxonomy_buffer};
+
+def load_taxonomy_delta(data, tablename: str = TAXONOMY_VECTOR_SQL_TABLE):
     """
-    Parses the tuples from the DB query to a list of stopwords
+    Appends the taxonomy rows added since the data was loaded, without loading the rest of the table again.
+        If the count or checksum of the rows up to the watermark differ from the loaded ones (rows deleted or
+        updated), the whole taxonomy is loaded instead.
 
     Parameters
     ----------
-    tuple_from_sql (tuple): a tuple with the stopwords in the second element
+    data (ServingData): current data
+    tablename (str) OPTIONAL: the name of the vectorised taxonomy table. Default stored in config
 
     Returns
     ----------
-    list_stopwords (list): list with the elements of the tuple
+    dict_data (dict): ServingData fields of the taxonomy
     """
 
-    # Extract stopwords to list
-    list_stopwords = [i[1] for i in tuple_from_sql]
+    n_rows_below, checksum_below, tuple_delta = retrieve_sql_table_delta(tablename, data.taxonomy_max_id)
 
-    return list_stopwords;
+    if n_rows_below != len(data.array_taxonomy_ids) or checksum_below != data.taxonomy_checksum:
+        print(f'Taxonomy rows changed below id {data.taxonomy_max_id}. Loading the whole taxonomy.')
+        return load_taxonomy_data(tablename = tablename);
 
-def parse_taxonomy(tuple_from_sql: tuple):
-    """
-    Parses the tuples from the DB query to a dict containing table id (unique) as the key, and
-        taxonomy_id (non unique - plurals and singulars) and vector form.
+    return append_taxonomy_rows(data._asdict(), tuple_delta);
 
-    Parameters
-    ----------
-    tuple_from_sql (tuple): a tuple with the ids in the first element, taxonomy_ids in the second, and vectors in the fourth.
+def load_serving_data():
+    """
+    Loads the stopwords and the vectorised taxonomy, with its ANN index and versions.
 
     Returns
     ----------
-    dict_return (ddict): dictionary containing the organised vector representations of the taxonomy
+    data (ServingData): data used to clean and match ingredients
     """
 
-    # Create lists
-    list_ids = [i[0] for i in tuple_from_sql]
-    list_taxonomy_ids = [i[1] for i in tuple_from_sql]
-    list_vectors = [i[3].strip('] [').split(',') for i in tuple_from_sql]
-
-    # Convert vector text to numpy
-    array_vector = np.array(list_vectors)
-    array_vector = array_vector.astype(np.float32)
+    # Read versions first, so an update during the load triggers another reload
+    source_versions = retrieve_serving_versions()
 
-    # Create return dict
-    dict_return = {key: {'id':list_taxonomy_ids[pos], 'vector': array_vector[pos]} for pos, key in enumerate(list_ids)}
+    data = ServingData(**load_stopwords_data(), **load_taxonomy_data(), source_versions = source_versions)
 
-    return dict_return;
+    return data;
 
-def preprocess_taxonomy(taxonomy: dict):
+def update_serving_data(data, source_versions: tuple):
     """
-    Parses the vectorised taxonomy into a list of integers (ids) and a numpy array of vectors
+    Updates the data to new versions of the source tables. Stopwords are loaded again, whereas only the taxonomy
+        rows added since the last load are retrieved.
 
     Parameters
     ----------
-    taxonomy (dict) OPTIONAL: a dict containing the taxonomy ids as keys, and vector representation as values. Default TAXONOMY_VECT
+    data (ServingData): current data
+    source_versions (tuple): new versions of the stopwords and taxonomy tables
 
     Returns
     ----------
-    taxonomy_list (list): list of integers containind the ids
-    taxonomy_vector (numpy.array): Numpy array of shape Nx768 containing numerical representations.
+    data (ServingData): new data. The current data is not modified
+    """
 
-    Exception
+    dict_update = {'source_versions': source_versions}
+
+    if source_versions[0] != data.source_versions[0]:
+        dict_update.update(load_stopwords_data())
+
+    if source_versions[1] != data.source_versions[1]:
+        dict_update.update(load_taxonomy_delta(data))
+
+    return data._replace(**dict_update);
+
+class ServingState:
+    """
+    Model and data used to serve requests. Nothing is loaded at import: the server calls initialise() at startup,
+    and the getters load whatever is missing on first use (e.g. in tests). The data is replaced as a whole when
+    reloaded, so requests holding the previous data are not affected.
+
+    Parameters
     ----------
-    If the 'taxonomy' parameter is not dict type
+    load_data (callable) OPTIONAL: function returning the ServingData. Default load_serving_data
+    load_versions (callable) OPTIONAL: function returning the versions of the source tables. Default retrieve_serving_versions
+    update_data (callable) OPTIONAL: function returning the ServingData for new versions of the source tables. Default update_serving_data
+    check_interval (float) OPTIONAL: minimum seconds between version checks. Default stored in config
     """
 
-    # Check argument is dict type
-    if not isinstance(taxonomy, dict):
-        raise TypeError('Argument is not dict type')
+    def __init__(self, load_data = load_serving_data, load_versions = retrieve_serving_versions, update_data = update_serving_data,
+                 check_interval: float = DATA_RELOAD_CHECK_INTERVAL):
 
-    taxonomy_list = [int(i['id']) for i in taxonomy.values()]
-    taxonomy_vector = np.array([i['vector'] for i in taxonomy.values()], dtype = np.float32)
+        self.model = None
+        self.data = None
+        self.property_store = None
+        self.embedding_cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL)
+        self.ready = False
+        self.error = None
+        self.check_interval = check_interval
+        self.last_check = time.monotonic()
 
-    return taxonomy_list, taxonomy_vector;
+        self._load_data = load_data
+        self._load_versions = load_versions
+        self._update_data = update_data
+        self._property_store_loaded = False
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+
+    def get_model(self):
+
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    self.model = encoders.load_encoder(config_env.ENCODER_BACKEND, config_env.SENTENCE_MODEL_NAME,
+                                                       config_env.ONNX_MODEL_PATH, config_env.ONNX_QUANTISED)
+
+        return self.model;
+
+    def get_data(self):
+
+        if self.data is None:
+            with self._lock:
+                if self.data is None:
+                    self.data = self._load_data()
+                    self.last_check = time.monotonic()
+
+        return self.data;
+
+    def get_property_store(self):
+
+        if not self._property_store_loaded:
+            with self._lock:
+                if not self._property_store_loaded:
+                    self.property_store = load_property_store() if PROPERTY_STORE_ENABLED else None
+                    self._property_store_loaded = True
+
+        return self.property_store;
+
+    def initialise(self, warm_up: bool = True):
+        """
+        Loads the model, data and property store, and runs a warm-up encode so the first request does not pay
+        for lazy initialisation inside the model.
+
+        Parameters
+        ----------
+        warm_up (bool) OPTIONAL: if True, encodes and scores a dummy ingredient. Default True
+
+        Returns
+        ----------
+        ready (bool): True if everything was loaded. Otherwise, the exception is stored in error
+        """
+
+        try:
+            model = self.get_model()
+            data = self.get_data()
+            self.get_property_store()
+
+            if warm_up:
+                compute_scores(vectorise_ingredients(['warm up'], model), data.array_taxonomy_ids, data.array_taxonomy, normalised = True)
+
+            self.ready = True
+            self.error = None
 
-# Store data in memory - stopwords
-TUPLE_STOPWORDS = retrieve_sql_table(STOPWORDS_SQL_TABLE)
-LIST_STOPWORDS = parse_stopwords(TUPLE_STOPWORDS)
+        except Exception as e:
+            self.error = repr(e)
+            print(f'Server not ready. Exception: {e}')
 
-# Store data in memory - taxonomy
-TUPLE_VECT_TAXONOMY = retrieve_sql_table(TAXONOMY_VECTOR_SQL_TABLE)
-DICT_TAXONOMY = parse_taxonomy(TUPLE_VECT_TAXONOMY)
-LIST_TAXONOMY, ARRAY_TAXONOMY = preprocess_taxonomy(DICT_TAXONOMY)
+        return self.ready;
+
+    def reload(self):
+        """
+        Loads the stopwords and taxonomy again and swaps them in once fully built. Concurrent calls wait
+        for the running reload.
+
+        Returns
+        ----------
+        source_versions (tuple): versions of the source tables of the loaded data
+        """
+
+        with self._reload_lock:
+            data = self._load_data()
+            self.data = data
+            self.last_check = time.monotonic()
+
+        print(f'Serving data reloaded, versions {data.source_versions}')
+
+        return data.source_versions;
+
+    def _check_versions(self):
+
+        try:
+            versions = self._load_versions()
+
+            if any(i is not None for i in versions) and versions != self.data.source_versions:
+                data = self._update_data(self.data, versions)
+                self.data = data
+                print(f'Serving data updated, versions {data.source_versions}')
+
+        except Exception as e:
+            print(f'Serving data not reloaded, keeping the current data. Exception: {e}')
+
+        finally:
+            self.last_check = time.monotonic()
+            self._reload_lock.release()
+
+    def refresh(self):
+        """
+        Checks the versions of the source tables in a background thread if check_interval has passed since the
+        last check, and updates the data if they changed. Requests are served from the current data meanwhile.
+        """
+
+        if self.data is None or time.monotonic() - self.last_check < self.check_interval:
+            return
+
+        if not self._reload_lock.acquire(blocking = False):
+            return
+
+        threading.Thread(target = self._check_versions, daemon = True).start()
+
+STATE = ServingState()
 
 #############################################################
 ##################### Define functions ######################
@@ -299,7 +1284,7 @@ def remove_all_special_chars(sentences: list):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
-    processed_sentences = [re.sub('[^A-Za-z ]+', ' ', i) for i in sentences]
+    processed_sentences = [PATTERN_SPECIAL_CHARS.sub(' ', i) for i in sentences]
     processed_sentences = [i.lower() for i in processed_sentences]
 
     return processed_sentences;
@@ -325,19 +1310,19 @@ def remove_double_spaces(sentences: list):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
-    processed_sentences = [re.sub(' +', ' ', i) for i in sentences]
+    processed_sentences = [PATTERN_DOUBLE_SPACES.sub(' ', i) for i in sentences]
     processed_sentences = [i.strip() for i in processed_sentences]
 
     return processed_sentences;
 
-def remove_stopwords(sentences: list, stopwords: list = LIST_STOPWORDS):
+def remove_stopwords(sentences: list, stopwords: list = None):
     """
     Removes all words matched with the stopword list from the sentences
 
     Parameters
     ----------
     sentences (list): a list containing text to be processed
-    stopwords (list) OPTIONAL: list with words to be removed. Default STOPWORDS['stopwords']
+    stopwords (list) OPTIONAL: list with words to be removed. Default None (stopwords loaded from the database)
 
     Returns
     ----------
@@ -352,6 +1337,12 @@ def remove_stopwords(sentences: list, stopwords: list = LIST_STOPWORDS):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
+    if stopwords is None:
+        stopwords = STATE.get_data().text_normaliser.stopwords
+
+    # Set lookup instead of scanning the list per word
+    stopwords = frozenset(stopwords)
+
     # Remove stopwords
     list_double_ingredients = [i.split(' ') for i in sentences]
     list_double_ingredients_sliced = [[i for i in sublist if i not in stopwords] for sublist in list_double_ingredients]
@@ -361,14 +1352,43 @@ def remove_stopwords(sentences: list, stopwords: list = LIST_STOPWORDS):
 
     return list_ingredients_clean;
 
-def vectorise_ingredients(sentences: list, model = SENTENCE_MODEL):
+def deduplicate_sentences(sentences: list):
+    """
+    Collapses repeated sentences so each one is vectorised and scored only once.
+
+    Parameters
+    ----------
+    sentences (list): a list containing cleaned text
+
+    Returns
+    ----------
+    list_unique (list): unique sentences in order of first appearance
+    list_inverse (list): position in list_unique of each original sentence
+
+    Exception
+    ----------
+    If the 'sentences' parameter is not list type
+    """
+
+    # Check argument is list type
+    if not isinstance(sentences, list):
+        raise TypeError('Argument is not list type')
+
+    # Map each sentence to the position of its first appearance
+    dict_positions = {}
+    list_inverse = [dict_positions.setdefault(i, len(dict_positions)) for i in sentences]
+    list_unique = list(dict_positions.keys())
+
+    return list_unique, list_inverse;
+
+def vectorise_ingredients(sentences: list, model = None):
     """
     Uses Huggingface model to vectorise the list of words
 
     Parameters
     ----------
     sentences (list): a list containing text to be processed with N elements
-    model (class sentence_transformer) OPTIONAL: model to encode the sentences. Default SENTENCE_MODEL
+    model (class sentence_transformer) OPTIONAL: model to encode the sentences. Default None (model loaded from config)
 
     Returns
     ----------
@@ -383,6 +1403,9 @@ def vectorise_ingredients(sentences: list, model = SENTENCE_MODEL):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
+    if model is None:
+        model = STATE.get_model()
+
     # Apply model
     vectorised_sentences = model.encode(sentences, normalize_embeddings = True)
 
@@ -390,14 +1413,40 @@ def vectorise_ingredients(sentences: list, model = SENTENCE_MODEL):
     
 
 
-def compute_scores(ingredients_array, list_taxonomy: list = LIST_TAXONOMY, array_taxonomy = ARRAY_TAXONOMY):
+def resolve_taxonomy(list_taxonomy: list = None, array_taxonomy = None):
+    """
+    Replaces missing taxonomy ids or vectors with the loaded taxonomy.
+
+    Parameters
+    ----------
+    list_taxonomy (list or numpy.array) OPTIONAL: taxonomy ids per row of array_taxonomy. Default None
+    array_taxonomy (numpy.array) OPTIONAL: vector representation of the taxonomy. Default None
+
+    Returns
+    ----------
+    list_taxonomy (list or numpy.array): taxonomy ids per row
+    array_taxonomy (numpy.array): vector representation of the taxonomy
+    """
+
+    if list_taxonomy is None or array_taxonomy is None:
+        data = STATE.get_data()
+
+        list_taxonomy = data.array_taxonomy_ids if list_taxonomy is None else list_taxonomy
+        array_taxonomy = data.array_taxonomy if array_taxonomy is None else array_taxonomy
+
+    return list_taxonomy, array_taxonomy;
+
+def compute_scores(ingredients_array, list_taxonomy: list = None, array_taxonomy = None, ann_index = None, normalised: bool = False):
     """
     Computes similarity scores for ingredients and taxonomy data
 
     Parameters
     ----------
     ingredients_array (numpy.array): vector representation of the incoming ingredients.
-    dict_taxonomy (dict): a dict containing the taxonomy ids as keys, and vector representation as values. Default TAXONOMY_VECT
+    list_taxonomy (list or numpy.array) OPTIONAL: taxonomy ids per row of array_taxonomy. Default None (loaded taxonomy)
+    array_taxonomy (numpy.array) OPTIONAL: vector representation of the taxonomy. Default None (loaded taxonomy, L2-normalised)
+    ann_index (hnswlib.Index) OPTIONAL: approximate nearest-neighbour index over array_taxonomy. Default None (exact search)
+    normalised (bool) OPTIONAL: both arrays are already L2-normalised, so the cosine similarity is a plain matrix product. Default False
 
     Returns
     ----------
@@ -405,21 +1454,98 @@ def compute_scores(ingredients_array, list_taxonomy: list = LIST_TAXONOMY, array
     matched_score (list): scores of cosine similarity for each match
     """
 
-    # Obtain ids and vector forms from taxonomy
-    
+    list_taxonomy, array_taxonomy = resolve_taxonomy(list_taxonomy, array_taxonomy)
+
+    # Normalise vectors if needed
+    if not normalised:
+        ingredients_array = normalise_vectors(ingredients_array)
+        array_taxonomy = normalise_vectors(array_taxonomy)
+
+    # Approximate search
+    if ann_index is not None:
+        best_score_idx, best_score = query_ann_index(ann_index, ingredients_array)
 
-    # Compute scores
-    array_scores = cosine_similarity(ingredients_array, array_taxonomy)
+    # Exact search: a single matrix product gives all cosine similarities
+    else:
+        array_scores = np.dot(ingredients_array, array_taxonomy.T)
 
-    # Get best match
-    best_score_idx = np.argmax(array_scores, axis = 1)
+        # Get best match
+        best_score_idx = np.argmax(array_scores, axis = 1)
+        best_score = array_scores[np.arange(array_scores.shape[0]), best_score_idx]
 
-    # Assign ingredient and score to df
-    matched_ingredient = [list_taxonomy[i] for i in best_score_idx]
-    matched_score = [np.round(array_scores[i][j], 5) for i, j in enumerate(best_score_idx)]
+    # Gather ids and scores
+    matched_ingredient = np.asarray(list_taxonomy)[best_score_idx].tolist()
+    matched_score = np.round(best_score, 5).tolist()
 
     return matched_ingredient, matched_score;
 
+def compute_top_k(ingredients_array, top_k: int, list_taxonomy: list = None, array_taxonomy = None, normalised: bool = False):
+    """
+    Computes the k best-matching taxonomy ids per ingredient, using a partial sort over the score matrix.
+        Rows sharing a taxonomy id (e.g. singular and plural names) count as a single candidate with their best score.
+
+    Parameters
+    ----------
+    ingredients_array (numpy.array): vector representation of the incoming ingredients.
+    top_k (int): number of candidates per ingredient. Capped to the number of distinct taxonomy ids
+    list_taxonomy (list or numpy.array) OPTIONAL: taxonomy ids per row of array_taxonomy. Default None (loaded taxonomy)
+    array_taxonomy (numpy.array) OPTIONAL: vector representation of the taxonomy. Default None (loaded taxonomy, L2-normalised)
+    normalised (bool) OPTIONAL: both arrays are already L2-normalised. Default False
+
+    Returns
+    ----------
+    candidate_ids (list): list with the k best taxonomy ids per ingredient, best first
+    candidate_scores (list): list with the k best scores per ingredient, best first
+    margins (list): difference between the first and second best scores per ingredient. None if there is a single candidate
+
+    Exception
+    ----------
+    If top_k is lower than 1
+    """
+
+    if top_k < 1:
+        raise ValueError('top_k must be at least 1')
+
+    list_taxonomy, array_taxonomy = resolve_taxonomy(list_taxonomy, array_taxonomy)
+
+    # Normalise vectors if needed
+    if not normalised:
+        ingredients_array = normalise_vectors(ingredients_array)
+        array_taxonomy = normalise_vectors(array_taxonomy)
+
+    array_scores = np.dot(ingredients_array, array_taxonomy.T)
+
+    # Collapse rows by taxonomy id, keeping the best score of each id
+    array_ids = np.asarray(list_taxonomy)
+    order = np.argsort(array_ids, kind = 'stable')
+    array_ids_sorted = array_ids[order]
+    starts = np.flatnonzero(np.r_[True, array_ids_sorted[1:] != array_ids_sorted[:-1]])
+
+    array_scores_grouped = np.maximum.reduceat(array_scores[:, order], starts, axis = 1)
+    array_ids_grouped = array_ids_sorted[starts]
+
+    # Partial sort: at least 2 candidates are needed for the margin
+    n_candidates = min(top_k, len(starts))
+    n_partition = min(max(n_candidates, 2), len(starts))
+
+    idx_best = np.argpartition(-array_scores_grouped, n_partition - 1, axis = 1)[:, :n_partition]
+    scores_best = np.take_along_axis(array_scores_grouped, idx_best, axis = 1)
+
+    order_best = np.argsort(-scores_best, axis = 1, kind = 'stable')
+    idx_best = np.take_along_axis(idx_best, order_best, axis = 1)
+    scores_best = np.take_along_axis(scores_best, order_best, axis = 1)
+
+    # Format output
+    candidate_ids = array_ids_grouped[idx_best[:, :n_candidates]].tolist()
+    candidate_scores = np.round(scores_best[:, :n_candidates], 5).tolist()
+
+    if n_partition > 1:
+        margins = np.round(scores_best[:, 0] - scores_best[:, 1], 5).tolist()
+    else:
+        margins = [None] * scores_best.shape[0]
+
+    return candidate_ids, candidate_scores, margins;
+
 def encode_allergens(tuple_values: tuple):
     """
     Encodes allergen information into T(rue) and F(alse) values.
@@ -470,11 +1596,11 @@ def parse_reference_values(tuple_values: tuple):
     dict_out (dict): dictionary with taxonomy_ids as keys, and properties (energy, nuts, etc.) as values.
     """
 
-    # Generate unique taxonomy ids
-    set_ids = set([i[0] for i in tuple_values])
+    # Group properties by taxonomy id in a single pass
+    dict_out = {}
 
-    # Create response dict
-    dict_out = {i: {j[2]: j[3] for j in tuple_values if j[0] == i} for i in set_ids}
+    for i in tuple_values:
+        dict_out.setdefault(i[0], {})[i[2]] = i[3]
 
     return dict_out;
 
@@ -515,7 +1641,41 @@ def insert_properties(list_ids: list, dict_values: dict, KEYS: list = LIST_RESPO
 
     return list_out;
 
-def create_response_match_ingredients(sentences: list, matched_ingredients: list, matched_score: list):
+def create_response_properties(list_ids: list, tuple_values: tuple, KEYS: list = LIST_RESPONSE_KEYS):
+    """
+    Encodes allergens, groups properties by taxonomy id and formats the API response in a single pass over the
+    rows. Equivalent to chaining encode_allergens, parse_reference_values and insert_properties.
+
+    Parameters
+    ----------
+    list_ids (list): list of original ids passed as input
+    tuple_values (tuple): tuple containing the results from the SQL query
+    KEYS (list) OPTIONAL: list containing the keys for the response. Default is LIST_RESPONSE_KEYS stored as constant
+
+    Returns
+    ----------
+    list_out (list): list containing the response, including null values if ids/properties are not found.
+    """
+    # Define empty properties
+    dict_empty = dict.fromkeys(KEYS[2:])
+    dict_rows = {}
+
+    # Fill out properties of each taxonomy id
+    for taxonomy_id, property_type, property, reference_value in tuple_values:
+        dict_row = dict_rows.get(taxonomy_id)
+
+        if dict_row is None:
+            dict_row = dict_rows[taxonomy_id] = dict_empty.copy()
+
+        if property in dict_empty:
+            dict_row[property] = reference_value != 0 if property_type == 'allergen' else reference_value
+
+    # Create response item per input id, duplicates included
+    list_out = [{'id': i, 'has_data': i in dict_rows, **dict_rows.get(i, dict_empty)} for i in list_ids]
+
+    return list_out;
+
+def create_response_match_ingredients(sentences: list, matched_ingredients: list, matched_score: list, top_k_results: tuple = None, list_inverse: list = None):
     """
     Receives the original ingredients and the results to zip them into an organised dictionary.
 
@@ -524,10 +1684,13 @@ def create_response_match_ingredients(sentences: list, matched_ingredients: list
     sentences (list): list of original ingredients
     matched_ingredients (list): list of ids of best-matched ingredients
     matched_score (list): list of scores for the best-matched ingredients
+    top_k_results (tuple) OPTIONAL: candidate ids, candidate scores and margins from compute_top_k. Default None
+    list_inverse (list) OPTIONAL: position in the results of each original ingredient, from deduplicate_sentences. Default None (one result per ingredient)
 
     Returns
     ----------
-    dict_response (list): list object with a dict per input ingredient. Dict contains name, id matched and score as keys: values
+    dict_response (list): list object with a dict per input ingredient. Dict contains name, id matched and score as keys: values.
+        If top_k_results is passed, it also contains the candidates (id and score) and the margin.
 
     Exception
     ----------
@@ -539,7 +1702,24 @@ def create_response_match_ingredients(sentences: list, matched_ingredients: list
     len_matched_ings = len(matched_ingredients)
     len_score = len(matched_score)
 
-    if len_sentences != len_matched_ings or len_matched_ings != len_score:
+    if len_matched_ings != len_score:
+        raise Exception('Lists are not the same length.')
+
+    if top_k_results is not None and any(len(i) != len_matched_ings for i in top_k_results):
+        raise Exception('Lists are not the same length.')
+
+    # Scatter the results of unique ingredients back to their original positions
+    if list_inverse is not None:
+        if len(list_inverse) != len_sentences:
+            raise Exception('Lists are not the same length.')
+
+        matched_ingredients = [matched_ingredients[i] for i in list_inverse]
+        matched_score = [matched_score[i] for i in list_inverse]
+
+        if top_k_results is not None:
+            top_k_results = tuple([results[i] for i in list_inverse] for results in top_k_results)
+
+    elif len_sentences != len_matched_ings:
         raise Exception('Lists are not the same length.')
 
     # Convert scores to float with precision 4
@@ -550,15 +1730,17 @@ def create_response_match_ingredients(sentences: list, matched_ingredients: list
     #                 'matched_ids': matched_ingredients,
     #                 'matching_score': matched_score}
 
-    return list_response;
+    # Add candidates and margin
+    if top_k_results is not None:
+        for response, ids, scores, margin in zip(list_response, *top_k_results):
+            response['candidates'] = [{'id': i, 'score': round(float(j), 4)} for i, j in zip(ids, scores)]
+            response['margin'] = round(float(margin), 4) if margin is not None else None
 
-#############################################################
-#################### Endpoint functions #####################
-#############################################################
+    return list_response;
 
-def execute_matched_ingredients(ingredient_list: list):
+def prepare_ingredients(ingredient_list: list):
     """
-    Executes all chained functions required to process the ingredients.
+    Cleans the ingredients and collapses the repeated ones, so each one is vectorised and scored only once.
 
     Parameters
     ----------
@@ -566,36 +1748,131 @@ def execute_matched_ingredients(ingredient_list: list):
 
     Returns
     ----------
-    list_response (list): list object for the response. Contains dicts per each ingredients passed.
+    list_unique (list): unique cleaned ingredients
+    list_inverse (list): position in list_unique of each original ingredient
     """
     # TIME = time.time()
-    # Execute sequentially the functions to return the match
     ingredients = convert_list_elements_str(ingredient_list)
     # print(f'Time to convert_list_elements_str: {time.time() - TIME:.2f} s')
     # TIME = time.time()
 
-    ingredients = remove_all_special_chars(ingredients)
-    # print(f'Time to remove_all_special_chars: {time.time() - TIME:.2f} s')
-    # TIME = time.time()
+    # Remove special characters, double spaces and stopwords in a single pass
+    ingredients = STATE.get_data().text_normaliser.normalise(ingredients)
+    # print(f'Time to normalise: {time.time() - TIME:.2f} s')
 
-    ingredients = remove_double_spaces(ingredients)
-    # print(f'Time to remove_double_spaces: {time.time() - TIME:.2f} s')
-    # TIME = time.time()
+    return deduplicate_sentences(ingredients);
 
-    ingredients = remove_stopwords(ingredients)
-    # print(f'Time to remove_stopwords: {time.time() - TIME:.2f} s')
-    # TIME = time.time()
+def match_cleaned_ingredients(list_items: list):
+    """
+    Vectorises and scores cleaned ingredients in a single batch, which may combine several requests.
 
-    array_vector = vectorise_ingredients(ingredients)
-    # print(f'Time to vectorise_ingredients: {time.time() - TIME:.2f} s')
-    # TIME = time.time()
+    Parameters
+    ----------
+    list_items (list): list of tuples with a cleaned ingredient and its number of candidates (None for best match only)
 
-    matched_ingredients, matched_scores = compute_scores(array_vector)
-    # print(f'Time to compute_scores: {time.time() - TIME:.2f} s')
-    # TIME = time.time()
+    Returns
+    ----------
+    list_results (list): list with a tuple per item: matched id, score, candidate ids, candidate scores and margin.
+        The last three are None if the item has no number of candidates.
+    """
+    # Collapse ingredients repeated across requests
+    ingredients, list_inverse = deduplicate_sentences([i[0] for i in list_items])
+
+    # Use the same data for the whole batch, checking for new versions of the source tables
+    STATE.refresh()
+    data = STATE.get_data()
+    embedding_cache = STATE.embedding_cache
+
+    # Retrieve embeddings and best matches from cache, and compute only the missing ones
+    embedding_cache.validate((data.taxonomy_version, data.stopwords_version))
+
+    list_cached = [embedding_cache.get(i) for i in ingredients]
+    list_missing = [pos for pos, i in enumerate(list_cached) if i is None]
+
+    if list_missing:
+        # TIME = time.time()
+        array_vector = vectorise_ingredients([ingredients[i] for i in list_missing])
+        # print(f'Time to vectorise_ingredients: {time.time() - TIME:.2f} s')
+        # TIME = time.time()
+
+        matched_ingredients, matched_scores = compute_scores(array_vector, data.array_taxonomy_ids, data.array_taxonomy, data.taxonomy_index, normalised = True)
+        # print(f'Time to compute_scores: {time.time() - TIME:.2f} s')
+
+        for pos, vector, matched_id, score in zip(list_missing, array_vector, matched_ingredients, matched_scores):
+            list_cached[pos] = (vector.copy(), matched_id, score)
+            embedding_cache.put(ingredients[pos], list_cached[pos])
+
+    # Compute candidates once for the largest number requested. Best match is the first candidate, from the same score matrix
+    list_top_k = [i[1] for i in list_items if i[1] is not None]
+    dict_top_k = {}
+
+    if list_top_k:
+        list_positions = sorted({pos for pos, i in zip(list_inverse, list_items) if i[1] is not None})
+        array_vector = np.vstack([list_cached[i][0] for i in list_positions])
 
-    list_response = create_response_match_ingredients(ingredient_list, matched_ingredients, matched_scores)
-    # print(f'Time to create_response_match_ingredients: {time.time() - TIME:.2f} s')
+        top_k_results = compute_top_k(array_vector, min(max(list_top_k), MAX_TOP_K), data.array_taxonomy_ids, data.array_taxonomy, normalised = True)
+        dict_top_k = {pos: i for pos, i in zip(list_positions, zip(*top_k_results))}
+
+    # Format results per item
+    list_results = []
+
+    for (_, top_k), pos in zip(list_items, list_inverse):
+        if top_k is None:
+            list_results.append((list_cached[pos][1], list_cached[pos][2], None, None, None))
+        else:
+            candidate_ids, candidate_scores, margin = dict_top_k[pos]
+            n_candidates = min(top_k, MAX_TOP_K)
+            list_results.append((candidate_ids[0], candidate_scores[0], candidate_ids[:n_candidates], candidate_scores[:n_candidates], margin))
+
+    return list_results;
+
+def assemble_response_match_ingredients(ingredient_list: list, list_results: list, list_inverse: list, top_k: int = None):
+    """
+    Formats the results of the unique cleaned ingredients into the response of the original ingredients.
+
+    Parameters
+    ----------
+    ingredient_list (list): a list of all ingredients to be matched
+    list_results (list): results of the unique cleaned ingredients, from match_cleaned_ingredients
+    list_inverse (list): position in list_results of each original ingredient, from prepare_ingredients
+    top_k (int) OPTIONAL: number of candidates returned per ingredient. Default None (best match only)
+
+    Returns
+    ----------
+    list_response (list): list object for the response. Contains dicts per each ingredients passed.
+    """
+
+    matched_ingredients = [i[0] for i in list_results]
+    matched_scores = [i[1] for i in list_results]
+    top_k_results = None if top_k is None else tuple([i[k] for i in list_results] for k in range(2, 5))
+
+    list_response = create_response_match_ingredients(ingredient_list, matched_ingredients, matched_scores, top_k_results, list_inverse)
+
+    return list_response;
+
+#############################################################
+#################### Endpoint functions #####################
+#############################################################
+
+def execute_matched_ingredients(ingredient_list: list, top_k: int = None):
+    """
+    Executes all chained functions required to process the ingredients.
+
+    Parameters
+    ----------
+    ingredient_list (list): a list of all ingredients to be matched
+    top_k (int) OPTIONAL: number of candidates returned per ingredient, with the margin between the first two. Default None (best match only)
+
+    Returns
+    ----------
+    list_response (list): list object for the response. Contains dicts per each ingredients passed.
+    """
+    # Execute sequentially the stages to return the match. The API server batches the second stage across requests
+    ingredients, list_inverse = prepare_ingredients(ingredient_list)
+
+    list_results = match_cleaned_ingredients([(i, top_k) for i in ingredients])
+
+    list_response = assemble_response_match_ingredients(ingredient_list, list_results, list_inverse, top_k)
 
     return list_response;
 
@@ -613,16 +1890,55 @@ def execute_fill_properties(list_ingredient_ids: list):
     """
     # Format input
     list_ids = convert_list_elements_int(list_ingredient_ids)
+
+    # Read properties from memory, checking for a new version of the table
+    property_store = STATE.get_property_store()
+
+    if property_store is not None:
+        property_store.refresh()
+
+        return property_store.lookup(list_ids);
+
     set_ids = set(list_ids) # set() discards ducplicate ids
 
     # Extract properties from db
     tuple_properties = retrieve_sql_table_filtered(PROPERTIES_SQL_TABLE, set_ids)
 
     # Parse properties
-    tuple_properties = encode_allergens(tuple_properties)
+    list_response = create_response_properties(list_ids, tuple_properties)
+
+    return list_response;
+
+async def execute_fill_properties_async(list_ingredient_ids: list):
+    """
+    Async version of execute_fill_properties, for the API endpoint. Properties are read from memory or, if the
+    property store is not loaded, from the database without blocking the event loop.
+
+    Parameters
+    ----------
+    list_ingredient_ids (list): a list of all ingredient_ids (from taxonomy) to be matched
+
+    Returns
+    ----------
+    list_response (list): list object containing dicts with elements and their properties
+    """
+    # Format input
+    list_ids = convert_list_elements_int(list_ingredient_ids)
 
-    dict_properties = parse_reference_values(tuple_properties)
+    # Read properties from memory, checking for a new version of the table
+    property_store = STATE.get_property_store()
 
-    list_response = insert_properties(list_ids, dict_properties)
+    if property_store is not None:
+        property_store.refresh()
 
-    return list_response;
\ No newline at end of file
+        return property_store.lookup(list_ids);
+
+    set_ids = set(list_ids) # set() discards ducplicate ids
+
+    # Extract properties from db
+    tuple_properties = await retrieve_sql_table_filtered_async(PROPERTIES_SQL_TABLE, set_ids)
+
+    # Parse properties
+    list_response = create_response_properties(list_ids, tuple_properties)
+
+    return list_response;
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Coalesces the items of concurrent requests into a single batch, so the model encodes and scores
+them together. A batch is processed when the first waiting request has waited max_wait_ms, or
+earlier if max_batch items are waiting."""
+
+# Import modules
+import asyncio
+
+# Define classes
+class MicroBatcher:
+    """
+    Collects items from concurrent coroutines and processes them in batches. Must be used from a single event loop.
+
+    Parameters
+    ----------
+    process_batch (callable): blocking function receiving a list of items and returning a list of results in the same order
+    run (callable): coroutine function running process_batch, e.g. BoundedExecutor.run
+    max_wait_ms (float) OPTIONAL: milliseconds the first item waits for others. Default 5
+    max_batch (int) OPTIONAL: number of waiting items that triggers a batch immediately. Default 64
+    """
+
+    def __init__(self, process_batch, run, max_wait_ms: float = 5, max_batch: int = 64):
+
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.batch_items = 0
+
+        self._process_batch = process_batch
+        self._run = run
+        self._pending = [] # (items, future) per request
+        self._n_pending = 0
+        self._timer = None
+        self._tasks = set() # Running batches, referenced so they are not garbage collected
+
+    async def submit(self, list_items: list):
+        """
+        Adds the items of a request to the next batch and waits for their results.
+
+        Parameters
+        ----------
+        list_items (list): items of a single request
+
+        Returns
+        ----------
+        list_results (list): results of the items, in the same order
+
+        Exception
+        ----------
+        Any exception raised while running the batch, e.g. QueueFullError
+        """
+
+        if not list_items:
+            return []
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        self._pending.append((list_items, future))
+        self._n_pending += len(list_items)
+
+        if self._n_pending >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future;
+
+    def _flush(self):
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        list_pending = self._pending
+        self._pending = []
+        self._n_pending = 0
+
+        if list_pending:
+            task = asyncio.ensure_future(self._process(list_pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, list_pending: list):
+
+        list_items = [j for i, _ in list_pending for j in i]
+
+        try:
+            list_results = await self._run(self._process_batch, list_items)
+
+        except Exception as e:
+            for _, future in list_pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batch_items += len(list_items)
+
+        # Fan results out to each request
+        position = 0
+
+        for items, future in list_pending:
+            if not future.done():
+                future.set_result(list_results[position:position + len(items)])
+
+            position += len(items)
+
+    async def close(self):
+        """
+        Processes the waiting items and waits for all running batches, e.g. on server shutdown.
+        """
+
+        self._flush()
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions = True)
+
+    def stats(self):
+        """
+        Returns the counters of the batcher.
+
+        Returns
+        ----------
+        dict_stats (dict): processed batches, mean items per batch and limits
+        """
+
+        return {'batches': self.batches,
+                'mean_batch_size': round(self.batch_items / self.batches, 2) if self.batches > 0 else None,
+                'max_wait_ms': self.max_wait * 1000,
+                'max_batch': self.max_batch};
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""In-memory store of the reference values per taxonomy id, so property lookups are array reads
+instead of database queries. The store is rebuilt in the background when the version of the
+source table changes."""
+
+# Import modules
+import time
+import threading
+import numpy as np
+
+# Define classes
+class PropertyStore:
+    """
+    Dense matrix of properties indexed by taxonomy_id, with a has_data bitmap.
+
+    Parameters
+    ----------
+    keys (list): property names, in the order of the response
+    load_rows (callable): function returning the rows (taxonomy_id, property_type, property, reference_value) of the table
+    load_version (callable): function returning the current version of the table, or None if it is unknown
+    check_interval (float) OPTIONAL: minimum seconds between version checks. Default 30
+    """
+
+    def __init__(self, keys: list, load_rows, load_version, check_interval: float = 30):
+
+        self.keys = list(keys)
+        self.check_interval = check_interval
+        self.version = None
+        self.last_check = 0.0
+
+        self._load_rows = load_rows
+        self._load_version = load_version
+        self._key_positions = {key: pos for pos, key in enumerate(self.keys)}
+        self._data = None # (values, has_data, bool_cols), swapped as a whole on reload
+        self._reload_lock = threading.Lock()
+
+    def is_loaded(self):
+
+        return self._data is not None;
+
+    def build(self, rows: tuple):
+        """
+        Builds the arrays of the store from the table rows.
+
+        Parameters
+        ----------
+        rows (tuple): tuple of (taxonomy_id, property_type, property, reference_value). Rows of type 'score' and
+            properties not in keys are ignored
+
+        Returns
+        ----------
+        data (tuple): matrix of values (NaN if missing), has_data bitmap and boolean mask of allergen columns
+        """
+
+        # Keep rows of known properties
+        list_rows = [i for i in rows if i[1] != 'score' and i[2] in self._key_positions]
+
+        array_ids = np.array([i[0] for i in list_rows], dtype = np.int64)
+        array_cols = np.array([self._key_positions[i[2]] for i in list_rows], dtype = np.int64)
+        array_refs = np.array([np.nan if i[3] is None else float(i[3]) for i in list_rows], dtype = np.float64)
+
+        n_rows = int(array_ids.max(initial = 0)) + 1
+
+        # Fill out matrix and bitmap
+        array_values = np.full((n_rows, len(self.keys)), np.nan, dtype = np.float64)
+        array_values[array_ids, array_cols] = array_refs
+
+        array_has_data = np.zeros(n_rows, dtype = bool)
+        array_has_data[array_ids] = True
+
+        # Allergens are returned as booleans
+        array_bool_cols = np.zeros(len(self.keys), dtype = bool)
+        array_bool_cols[[self._key_positions[i[2]] for i in list_rows if i[1] == 'allergen']] = True
+
+        return array_values, array_has_data, array_bool_cols;
+
+    def reload(self):
+        """
+        Loads the table and swaps the arrays of the store.
+
+        Returns
+        ----------
+        version: version of the loaded table
+        """
+
+        version = self._load_version()
+        self._data = self.build(self._load_rows())
+        self.version = version
+        self.last_check = time.monotonic()
+
+        return version;
+
+    def _check_version(self):
+
+        try:
+            version = self._load_version()
+
+            if version is not None and version != self.version:
+                self._data = self.build(self._load_rows())
+                self.version = version
+
+        except Exception as e:
+            print(f'Property store not reloaded, keeping the current data. Exception: {e}')
+
+        finally:
+            self.last_check = time.monotonic()
+            self._reload_lock.release()
+
+    def refresh(self):
+        """
+        Checks the table version in a background thread if check_interval has passed since the last check.
+        Requests are served from the current data until the reload finishes.
+        """
+
+        if time.monotonic() - self.last_check < self.check_interval:
+            return
+
+        if not self._reload_lock.acquire(blocking = False):
+            return
+
+        threading.Thread(target = self._check_version, daemon = True).start()
+
+    def lookup(self, list_ids: list):
+        """
+        Retrieves the properties of the ids, formatted to the API response.
+
+        Parameters
+        ----------
+        list_ids (list): list of taxonomy ids, with duplicates if needed
+
+        Returns
+        ----------
+        list_out (list): list containing a dict per id, including null values if ids/properties are not found
+        """
+
+        array_values_all, array_has_data_all, array_bool_cols = self._data
+
+        # Ids outside the matrix have no data
+        array_ids = np.asarray(list_ids, dtype = np.int64).reshape(-1)
+        array_valid = (array_ids >= 0) & (array_ids < len(array_has_data_all))
+        array_rows = np.where(array_valid, array_ids, 0)
+
+        array_has_data = array_valid & array_has_data_all[array_rows]
+        array_values = array_values_all[array_rows]
+
+        # Convert to python values, with None for missing properties
+        array_out = array_values.astype(object)
+        array_out[:, array_bool_cols] = array_values[:, array_bool_cols] != 0
+        array_out[np.isnan(array_values) | ~array_has_data[:, None]] = None
+
+        list_out = [{'id': i, 'has_data': j, **dict(zip(self.keys, k))}
+                    for i, j, k in zip(list_ids, array_has_data.tolist(), array_out.tolist())]
+
+        return list_out;
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Growable arrays of taxonomy vectors and ids, so new taxonomy rows are appended in place instead
+of copying the whole matrix. Rows are only written past the ones already handed out, so arrays
+returned before an append are never modified while requests read them."""
+
+# Import modules
+import numpy as np
+
+# Define classes
+class TaxonomyBuffer:
+    """
+    Preallocated matrix of taxonomy vectors and their ids, with spare rows for appends. Must be appended
+    from a single thread at a time.
+
+    Parameters
+    ----------
+    array_vectors (numpy.array): L2-normalised array of shape NxD
+    array_ids (numpy.array): taxonomy ids per row
+    growth (float) OPTIONAL: factor applied to the capacity when the buffer is full. Default 1.5
+    """
+
+    def __init__(self, array_vectors, array_ids, growth: float = 1.5):
+
+        self.growth = growth
+        self.n_rows = 0
+
+        # Leave room for the next appends
+        capacity = max(int(len(array_ids) * growth), 1)
+
+        self._vectors = np.empty((capacity, array_vectors.shape[1]), dtype = np.float32)
+        self._ids = np.empty(capacity, dtype = np.int64)
+
+        self.append(array_vectors, array_ids)
+
+    @property
+    def capacity(self):
+
+        return self._vectors.shape[0];
+
+    def _grow(self, n_rows: int):
+
+        capacity = max(n_rows, int(self.capacity * self.growth), 1)
+
+        # Arrays handed out before keep the previous storage
+        array_vectors = np.empty((capacity, self._vectors.shape[1]), dtype = np.float32)
+        array_ids = np.empty(capacity, dtype = np.int64)
+
+        array_vectors[:self.n_rows] = self._vectors[:self.n_rows]
+        array_ids[:self.n_rows] = self._ids[:self.n_rows]
+
+        self._vectors = array_vectors
+        self._ids = array_ids
+
+    def append(self, array_vectors, array_ids):
+        """
+        Appends rows to the buffer.
+
+        Parameters
+        ----------
+        array_vectors (numpy.array): L2-normalised array of shape MxD
+        array_ids (numpy.array): taxonomy ids of the M rows
+
+        Returns
+        ----------
+        array_vectors (numpy.array): view of shape (N+M)xD with all rows
+        array_ids (numpy.array): view with the taxonomy ids of all rows
+        """
+
+        start = self.n_rows
+        end = start + len(array_ids)
+
+        if end > self.capacity:
+            self._grow(end)
+
+        self._vectors[start:end] = array_vectors
+        self._ids[start:end] = array_ids
+        self.n_rows = end
+
+        return self.views();
+
+    def views(self):
+        """
+        Returns the filled rows of the buffer.
+
+        Returns
+        ----------
+        array_vectors (numpy.array): view of shape NxD
+        array_ids (numpy.array): view with the taxonomy ids per row
+        """
+
+        return self._vectors[:self.n_rows], self._ids[:self.n_rows];
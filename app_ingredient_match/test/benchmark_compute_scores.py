@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Micro-benchmark of compute_scores against the previous cosine_similarity implementation.
+To execute, type in the command line: PYTHONPATH=. python test/benchmark_compute_scores.py
+"""
+
+# Import modules
+import timeit
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+import src.ingredient_match as moduleTest
+
+# Define constants
+RANDOM_SEED = 888
+MODEL_COMPONENTS = 768
+TAXONOMY_SIZES = [1000, 10000, 100000]
+BATCH_SIZES = [1, 5, 50]
+REPEAT = 20
+
+# Define functions
+def compute_scores_cosine(ingredients_array, list_taxonomy, array_taxonomy):
+
+    # Previous implementation, kept for reference
+    array_scores = cosine_similarity(ingredients_array, array_taxonomy)
+    best_score_idx = np.argmax(array_scores, axis = 1)
+
+    matched_ingredient = [list_taxonomy[i] for i in best_score_idx]
+    matched_score = [np.round(array_scores[i][j], 5) for i, j in enumerate(best_score_idx)]
+
+    return matched_ingredient, matched_score;
+
+def random_unit_vectors(n_rows: int, rng):
+
+    return moduleTest.normalise_vectors(rng.standard_normal((n_rows, MODEL_COMPONENTS)));
+
+def time_function(function, *args, **kwargs):
+
+    # Best of REPEAT runs, in milliseconds
+    return min(timeit.repeat(lambda: function(*args, **kwargs), number = 1, repeat = REPEAT)) * 1000;
+
+#############################################################
+###################### Execute script #######################
+#############################################################
+
+rng = np.random.default_rng(RANDOM_SEED)
+
+print(f'{"taxonomy":>10} {"batch":>6} {"cosine (ms)":>12} {"matmul (ms)":>12} {"speedup":>8}')
+
+for taxonomy_size in TAXONOMY_SIZES:
+    array_taxonomy = random_unit_vectors(taxonomy_size, rng)
+    list_taxonomy = list(range(taxonomy_size))
+    array_taxonomy_ids = np.asarray(list_taxonomy)
+
+    for batch_size in BATCH_SIZES:
+        array_ingredients = random_unit_vectors(batch_size, rng)
+
+        # Both implementations must agree
+        ids_cosine, _ = compute_scores_cosine(array_ingredients, list_taxonomy, array_taxonomy)
+        ids_matmul, _ = moduleTest.compute_scores(array_ingredients, array_taxonomy_ids, array_taxonomy, normalised = True)
+        assert ids_cosine == ids_matmul
+
+        time_cosine = time_function(compute_scores_cosine, array_ingredients, list_taxonomy, array_taxonomy)
+        time_matmul = time_function(moduleTest.compute_scores, array_ingredients, array_taxonomy_ids, array_taxonomy, normalised = True)
+
+        print(f'{taxonomy_size:>10} {batch_size:>6} {time_cosine:>12.3f} {time_matmul:>12.3f} {time_cosine / time_matmul:>7.1f}x')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Micro-benchmark of create_response_properties against the previous chain of encode_allergens,
+parse_reference_values and insert_properties. The previous grouping is quadratic, so the largest
+size takes a few minutes.
+To execute, type in the command line: PYTHONPATH=. python test/benchmark_fill_properties.py
+"""
+
+# Import modules
+import timeit
+import numpy as np
+
+import src.ingredient_match as moduleTest
+
+# Define constants
+RANDOM_SEED = 888
+ID_SIZES = [1000, 10000]
+REPEAT = 5
+KEYS = moduleTest.LIST_RESPONSE_KEYS
+ALLERGEN_KEYS = KEYS[10:]
+
+# Define functions
+def parse_reference_values_quadratic(tuple_values: tuple):
+
+    # Previous implementation, kept for reference
+    set_ids = set([i[0] for i in tuple_values])
+    dict_out = {i: {j[2]: j[3] for j in tuple_values if j[0] == i} for i in set_ids}
+
+    return dict_out;
+
+def fill_properties_chained(list_ids: list, tuple_values: tuple):
+
+    tuple_values = moduleTest.encode_allergens(tuple_values)
+    dict_values = parse_reference_values_quadratic(tuple_values)
+
+    return moduleTest.insert_properties(list_ids, dict_values);
+
+def random_properties(n_ids: int, rng):
+
+    # One row per taxonomy id and property, as returned by retrieve_sql_table_filtered
+    list_rows = []
+
+    for taxonomy_id in range(n_ids):
+        for key in KEYS[2:]:
+            if key in ALLERGEN_KEYS:
+                list_rows.append((taxonomy_id, 'allergen', key, float(rng.integers(0, 2))))
+            else:
+                list_rows.append((taxonomy_id, 'macro_nutrient', key, round(float(rng.random()) * 100, 4)))
+
+    return tuple(list_rows);
+
+def time_function(function, *args, repeat: int = REPEAT):
+
+    # Best of repeat runs, in milliseconds
+    return min(timeit.repeat(lambda: function(*args), number = 1, repeat = repeat)) * 1000;
+
+#############################################################
+###################### Execute script #######################
+#############################################################
+
+rng = np.random.default_rng(RANDOM_SEED)
+
+print(f'{"ids":>8} {"rows":>8} {"chained (ms)":>13} {"single pass (ms)":>17} {"speedup":>8}')
+
+for n_ids in ID_SIZES:
+    tuple_values = random_properties(n_ids, rng)
+    list_ids = rng.integers(0, n_ids, n_ids).tolist()
+
+    # Both implementations must agree
+    list_chained = fill_properties_chained(list_ids, tuple_values)
+    assert list_chained == moduleTest.create_response_properties(list_ids, tuple_values)
+
+    time_chained = time_function(fill_properties_chained, list_ids, tuple_values, repeat = 1)
+    time_single_pass = time_function(moduleTest.create_response_properties, list_ids, tuple_values)
+
+    print(f'{n_ids:>8} {len(tuple_values):>8} {time_chained:>13.1f} {time_single_pass:>17.1f} {time_chained / time_single_pass:>7.1f}x')
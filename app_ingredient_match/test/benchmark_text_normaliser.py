@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Micro-benchmark of TextNormaliser against the previous chain of remove_all_special_chars,
+remove_double_spaces and remove_stopwords, on random ingredient names. Both must give the same output.
+To execute, type in the command line: PYTHONPATH=. python test/benchmark_text_normaliser.py
+"""
+
+# Import modules
+import re
+import timeit
+import numpy as np
+
+from src.text_normaliser import TextNormaliser
+
+# Define constants
+RANDOM_SEED = 888
+N_NAMES = 100000
+N_STOPWORDS = [100, 1000]
+REPEAT = 3
+WORDS = ['apple', 'Granny', 'Smith', 'ripe', 'avocado', 'x6', '1kg', 'fresh', 'FROZEN', 'chicken', 'breast',
+         'skinless', '(diced)', 'olive', 'oil', 'extra-virgin', '500ml', 'salt', '&', 'pepper', 'Crème', 'fraîche']
+
+# Define functions
+def normalise_chained(sentences: list, stopwords: list):
+
+    # Previous implementation, kept for reference
+    processed_sentences = [re.sub('[^A-Za-z ]+', ' ', i) for i in sentences]
+    processed_sentences = [i.lower() for i in processed_sentences]
+
+    processed_sentences = [re.sub(' +', ' ', i) for i in processed_sentences]
+    processed_sentences = [i.strip() for i in processed_sentences]
+
+    list_double_ingredients = [i.split(' ') for i in processed_sentences]
+    list_double_ingredients_sliced = [[i for i in sublist if i not in stopwords] for sublist in list_double_ingredients]
+
+    return [' '.join(i).strip() for i in list_double_ingredients_sliced];
+
+def random_names(n_names: int, rng):
+
+    # Names of 2 to 8 words, with random separators
+    list_names = []
+
+    for n_words in rng.integers(2, 9, size = n_names):
+        words = rng.choice(WORDS, size = n_words)
+        separators = rng.choice([' ', '  ', ', ', ' - '], size = n_words)
+        list_names.append(''.join(i + j for i, j in zip(words, separators)))
+
+    return list_names;
+
+def random_stopwords(n_stopwords: int):
+
+    # Generated words that never match, followed by a few real ones at the end of the list (worst case for a list scan)
+    return [f'stopword{i}' for i in range(n_stopwords - 3)] + ['fresh', 'frozen', 'kg'];
+
+#############################################################
+###################### Execute script #######################
+#############################################################
+
+if __name__ == '__main__':
+
+    rng = np.random.default_rng(RANDOM_SEED)
+    list_names = random_names(N_NAMES, rng)
+
+    print(f'{"Stopwords":>10} {"Chained (s)":>12} {"Normaliser (s)":>15} {"Speed-up":>9}')
+
+    for n_stopwords in N_STOPWORDS:
+        list_stopwords = random_stopwords(n_stopwords)
+        normaliser = TextNormaliser(list_stopwords)
+
+        # Check both implementations agree
+        assert normalise_chained(list_names, list_stopwords) == normaliser.normalise(list_names)
+
+        time_chained = min(timeit.repeat(lambda: normalise_chained(list_names, list_stopwords), number = 1, repeat = REPEAT))
+        time_normaliser = min(timeit.repeat(lambda: normaliser.normalise(list_names), number = 1, repeat = REPEAT))
+
+        print(f'{n_stopwords:>10} {time_chained:>12.3f} {time_normaliser:>15.3f} {time_chained / time_normaliser:>8.1f}x')
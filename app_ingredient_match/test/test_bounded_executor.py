@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'bounded_executor'.
+To execute, type in the command line: python -m unittest test/test_bounded_executor.py
+"""
+
+# Import modules
+import asyncio
+import threading
+import unittest
+
+from src.bounded_executor import BoundedExecutor, QueueFullError
+
+# Create class
+class Test_bounded_executor(unittest.TestCase):
+
+    def test_run(self):
+        print('\nTesting run...')
+
+        executor = BoundedExecutor(max_workers = 1, max_queue = 0)
+
+        self.assertEqual(asyncio.run(executor.run(sum, [1, 2, 3])), 6)
+        self.assertEqual(executor.stats()['pending'], 0)
+
+        with self.assertRaises(ZeroDivisionError):
+            asyncio.run(executor.run(lambda: 1 / 0))
+
+        self.assertEqual(executor.stats()['pending'], 0)
+        executor.shutdown()
+
+    def test_queue_full(self):
+        print('\nTesting queue limit...')
+
+        executor = BoundedExecutor(max_workers = 1, max_queue = 1)
+        event = threading.Event()
+
+        async def burst():
+            # Two calls fit (one running, one waiting), the third is rejected
+            list_tasks = [asyncio.ensure_future(executor.run(event.wait, 5)) for _ in range(2)]
+            await asyncio.sleep(0)
+
+            with self.assertRaises(QueueFullError):
+                await executor.run(event.wait, 5)
+
+            event.set()
+
+            return await asyncio.gather(*list_tasks);
+
+        self.assertEqual(asyncio.run(burst()), [True, True])
+        self.assertEqual(executor.stats()['rejected'], 1)
+        self.assertEqual(executor.stats()['pending'], 0)
+        executor.shutdown()
+
+    def test_cancel(self):
+        print('\nTesting cancelled call...')
+
+        executor = BoundedExecutor(max_workers = 1, max_queue = 0)
+        event = threading.Event()
+
+        async def cancel():
+            task = asyncio.ensure_future(executor.run(event.wait, 5))
+            await asyncio.sleep(0.05)
+
+            task.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            # The job keeps running, so it still counts as pending
+            self.assertEqual(executor.stats()['pending'], 1)
+
+            with self.assertRaises(QueueFullError):
+                await executor.run(event.wait, 5)
+
+            event.set()
+
+            # Released once the job ends
+            for _ in range(100):
+                if executor.stats()['pending'] == 0:
+                    break
+                await asyncio.sleep(0.01)
+
+            return await executor.run(sum, [1, 2]);
+
+        self.assertEqual(asyncio.run(cancel()), 3)
+        self.assertEqual(executor.stats()['pending'], 0)
+        executor.shutdown()
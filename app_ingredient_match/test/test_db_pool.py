@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'db_pool'. Connections are simulated, so no database is needed.
+To execute, type in the command line: python -m unittest test/test_db_pool.py
+"""
+
+# Import modules
+import threading
+import unittest
+
+from src.db_pool import ConnectionPool
+
+# Define constants
+DB_PARAMS = {'DB_HOST': 'localhost', 'DB_NAME': 'kafoodle', 'DB_PORT': 3306, 'DB_USERNAME': 'user', 'DB_PASSWORD': None,
+             'DB_POOL_SIZE': 2, 'DB_POOL_TIMEOUT': 0.1, 'DB_POOL_RECYCLE': 3600}
+
+# Create simulated connection
+class FakeConnection:
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = False
+        self.alive = True
+
+    def ping(self, reconnect = False):
+        if not self.alive:
+            raise ConnectionError('Lost connection')
+
+    def close(self):
+        self.closed = True
+
+class FakeConnect:
+
+    def __init__(self):
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        with self.lock:
+            self.connections.append(FakeConnection(**kwargs))
+            return self.connections[-1];
+
+# Create class
+class Test_db_pool(unittest.TestCase):
+
+    def test_reuse(self):
+        print('\nTesting connection reuse...')
+
+        connect = FakeConnect()
+        pool = ConnectionPool(DB_PARAMS, connect)
+
+        with pool.connection() as connection_a:
+            pass
+
+        with pool.connection() as connection_b:
+            pass
+
+        self.assertIs(connection_a, connection_b)
+        self.assertEqual(len(connect.connections), 1)
+        self.assertTrue(connection_a.kwargs['autocommit'])
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 1, 'pool_size': 2})
+
+    def test_bounded(self):
+        print('\nTesting pool size and timeout...')
+
+        connect = FakeConnect()
+        pool = ConnectionPool(DB_PARAMS, connect)
+
+        connection_a, created_a = pool.acquire()
+        connection_b, created_b = pool.acquire()
+
+        self.assertIsNot(connection_a, connection_b)
+
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+
+        pool.release(connection_a, created_a)
+
+        self.assertIs(pool.acquire()[0], connection_a)
+        self.assertEqual(len(connect.connections), 2)
+
+    def test_recycle_on_error(self):
+        print('\nTesting recycle on error...')
+
+        connect = FakeConnect()
+        pool = ConnectionPool(DB_PARAMS, connect)
+
+        with self.assertRaises(ValueError):
+            with pool.connection() as connection_a:
+                raise ValueError('Bad query')
+
+        self.assertTrue(connection_a.closed)
+        self.assertEqual(pool.stats()['open'], 0)
+
+        with pool.connection() as connection_b:
+            pass
+
+        self.assertIsNot(connection_a, connection_b)
+
+    def test_health_check(self):
+        print('\nTesting health check...')
+
+        connect = FakeConnect()
+        pool = ConnectionPool(DB_PARAMS, connect)
+
+        # Dead connection idle for longer than the ping threshold
+        connection_a, created_a = pool.acquire()
+        connection_a.alive = False
+        pool.release(connection_a, created_a)
+        pool._idle[-1] = (connection_a, created_a, created_a - 3600)
+
+        with pool.connection() as connection_b:
+            pass
+
+        self.assertIsNot(connection_a, connection_b)
+        self.assertTrue(connection_a.closed)
+
+        # Connection older than the recycle limit
+        pool.recycle = 0
+
+        with pool.connection() as connection_c:
+            pass
+
+        self.assertIsNot(connection_b, connection_c)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_close(self):
+        print('\nTesting close...')
+
+        connect = FakeConnect()
+        pool = ConnectionPool(DB_PARAMS, connect)
+
+        connection_b, created_b = pool.acquire()
+
+        with pool.connection() as connection_a:
+            pass
+
+        pool.close()
+
+        self.assertTrue(connection_a.closed)
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 0, 'pool_size': 2})
+
+        # Connections in use are closed when released, and no new ones are opened
+        pool.release(connection_b, created_b)
+
+        self.assertTrue(connection_b.closed)
+        self.assertEqual(pool.stats(), {'open': 0, 'idle': 0, 'pool_size': 2})
+
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+
+        self.assertEqual(len(connect.connections), 2)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'embedding_cache'.
+To execute, type in the command line: python -m unittest test/test_embedding_cache.py
+"""
+
+# Import modules
+import time
+import unittest
+
+from src.embedding_cache import EmbeddingCache
+
+# Create class
+class Test_embedding_cache(unittest.TestCase):
+
+    def test_get_put(self):
+        print('\nTesting get and put...')
+
+        cache = EmbeddingCache(max_size = 2)
+        cache.put('salt', (None, 1, 0.9))
+
+        self.assertEqual(cache.get('salt'), (None, 1, 0.9))
+        self.assertIsNone(cache.get('pepper'))
+        self.assertEqual(len(cache), 1)
+
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hit_ratio'], 0.5)
+
+    def test_lru_eviction(self):
+        print('\nTesting LRU eviction...')
+
+        cache = EmbeddingCache(max_size = 2)
+        cache.put('salt', 1)
+        cache.put('pepper', 2)
+        cache.get('salt') # 'pepper' becomes the least recently used
+        cache.put('olive oil', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('salt'), 1)
+        self.assertIsNone(cache.get('pepper'))
+        self.assertEqual(cache.get('olive oil'), 3)
+
+    def test_ttl(self):
+        print('\nTesting time-to-live...')
+
+        cache = EmbeddingCache(max_size = 10, ttl = 0.01)
+        cache.put('salt', 1)
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('salt'))
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        print('\nTesting disabled cache...')
+
+        cache = EmbeddingCache(max_size = 0)
+        cache.put('salt', 1)
+
+        self.assertIsNone(cache.get('salt'))
+        self.assertEqual(len(cache), 0)
+
+    def test_validate(self):
+        print('\nTesting validate...')
+
+        cache = EmbeddingCache(max_size = 10, version = ('taxonomy_v1', 'stopwords_v1'))
+        cache.put('salt', 1)
+
+        self.assertFalse(cache.validate(('taxonomy_v1', 'stopwords_v1')))
+        self.assertEqual(cache.get('salt'), 1)
+
+        self.assertTrue(cache.validate(('taxonomy_v2', 'stopwords_v1')))
+        self.assertIsNone(cache.get('salt'))
+        self.assertEqual(cache.version, ('taxonomy_v2', 'stopwords_v1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'encoders'. Compares the ONNX backend against the PyTorch model, and is
+skipped if onnxruntime is not installed or the model was not exported (python -m src.encoders).
+To execute, type in the command line: python -m unittest test/test_encoders.py
+"""
+
+# Import modules
+import os
+import csv
+import unittest
+import numpy as np
+
+import src.encoders as moduleTest
+import src.config_env as config_env
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# Define constants
+PATH_WORDS = os.path.join(os.path.dirname(__file__), 'ingredient_match_words.txt')
+MIN_COSINE = 0.99 # Minimum similarity between the embeddings of both backends
+
+ONNX_AVAILABLE = onnxruntime is not None and os.path.exists(os.path.join(config_env.ONNX_MODEL_PATH, moduleTest.ONNX_CONFIG_FILENAME))
+
+# Define functions
+def load_words(path: str = PATH_WORDS):
+
+    # Each non-empty line is a comma-separated list of quoted ingredients
+    with open(path, 'r') as F:
+        list_words = [j for i in csv.reader(F) for j in i]
+
+    return list(dict.fromkeys(list_words));
+
+# Create class
+@unittest.skipIf(not ONNX_AVAILABLE, 'ONNX model not exported')
+class Test_encoders(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        import src.ingredient_match as ingredient_match
+
+        cls.ingredient_match = ingredient_match
+        cls.list_words = ingredient_match.remove_stopwords(ingredient_match.remove_double_spaces(ingredient_match.remove_all_special_chars(load_words())))
+
+        cls.model_torch = moduleTest.load_encoder('torch', config_env.SENTENCE_MODEL_NAME)
+        cls.model_onnx = moduleTest.load_encoder('onnx', path_onnx = config_env.ONNX_MODEL_PATH, quantised = config_env.ONNX_QUANTISED)
+
+        cls.array_torch = ingredient_match.vectorise_ingredients(cls.list_words, cls.model_torch)
+        cls.array_onnx = ingredient_match.vectorise_ingredients(cls.list_words, cls.model_onnx)
+
+    def test_encode(self):
+        print('\nTesting encode...')
+
+        self.assertEqual(self.array_onnx.shape, self.array_torch.shape)
+        self.assertEqual(self.model_onnx.encode('salt').shape, (self.array_torch.shape[1],))
+        self.assertEqual(self.model_onnx.encode([]).shape, (0, self.array_torch.shape[1]))
+
+        np.testing.assert_allclose(np.linalg.norm(self.array_onnx, axis = 1), 1, rtol = 1e-5)
+
+        # Batches of different sizes give the same embeddings
+        np.testing.assert_allclose(self.model_onnx.encode(self.list_words[:3], batch_size = 1), self.model_onnx.encode(self.list_words[:3]), atol = 1e-4)
+
+    def test_parity(self):
+        print('\nTesting parity with PyTorch embeddings...')
+
+        array_cosine = np.sum(self.array_torch * self.array_onnx, axis = 1)
+
+        print(f'Cosine similarity between backends: min {array_cosine.min():.4f}, mean {array_cosine.mean():.4f}')
+        self.assertGreaterEqual(array_cosine.min(), MIN_COSINE)
+
+    def test_top1_unchanged(self):
+        print('\nTesting top-1 matches...')
+
+        ids_torch, _ = self.ingredient_match.compute_scores(self.array_torch, self.ingredient_match.STATE.get_data().array_taxonomy_ids, normalised = True)
+        ids_onnx, _ = self.ingredient_match.compute_scores(self.array_onnx, self.ingredient_match.STATE.get_data().array_taxonomy_ids, normalised = True)
+
+        self.assertEqual(ids_onnx, ids_torch)
+
+    def test_unknown_backend(self):
+        print('\nTesting unknown backend...')
+
+        with self.assertRaises(ValueError):
+            moduleTest.load_encoder('tensorflow')
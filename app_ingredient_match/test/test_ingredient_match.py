@@ -5,6 +5,13 @@ To execute, type in the command line: python -m unittest test/test_ingredient_ma
 """
 
 # Import modules
+import os
+import json
+import time
+import asyncio
+import struct
+import hashlib
+import tempfile
 import unittest
 import numpy as np
 
@@ -73,6 +80,16 @@ class Test_ingredient_match(unittest.TestCase):
         with self.assertRaises(TypeError):
             moduleTest.remove_stopwords(0, STOPWORDS)
 
+    def test_deduplicate_sentences(self):
+        print('\nTesting deduplicate_sentences...')
+
+        self.assertEqual(moduleTest.deduplicate_sentences(['salt', 'pepper', 'salt', 'salt']), (['salt', 'pepper'], [0, 1, 0, 0]))
+        self.assertEqual(moduleTest.deduplicate_sentences(['a', 'b']), (['a', 'b'], [0, 1]))
+        self.assertEqual(moduleTest.deduplicate_sentences([]), ([], []))
+
+        with self.assertRaises(TypeError):
+            moduleTest.deduplicate_sentences(0)
+
     def test_vectorise_ingredients(self):
         print('\nLoading sentence_transformers module for the test')
         from sentence_transformers import SentenceTransformer
@@ -126,6 +143,86 @@ class Test_ingredient_match(unittest.TestCase):
         self.assertEqual(moduleTest.compute_scores(array_ingredients, LIST_TAXONOMY, ARRAY_TAXONOMY)[0], [2, 1]) # Ingredients
         self.assertEqual(moduleTest.compute_scores(array_ingredients, LIST_TAXONOMY, ARRAY_TAXONOMY)[1], [1, 1]) # Score
 
+        # Pre-normalised inputs give the same result
+        array_ingredients_norm = moduleTest.normalise_vectors(array_ingredients)
+        ARRAY_TAXONOMY_NORM = moduleTest.normalise_vectors(ARRAY_TAXONOMY)
+
+        self.assertEqual(moduleTest.compute_scores(array_ingredients_norm, np.array(LIST_TAXONOMY), ARRAY_TAXONOMY_NORM, normalised = True)[0], [2, 1])
+        self.assertEqual(moduleTest.compute_scores(array_ingredients_norm, np.array(LIST_TAXONOMY), ARRAY_TAXONOMY_NORM, normalised = True)[1], [1, 1])
+        self.assertIsInstance(moduleTest.compute_scores(array_ingredients_norm, np.array(LIST_TAXONOMY), ARRAY_TAXONOMY_NORM, normalised = True)[0][0], int)
+
+    def test_compute_top_k(self):
+        print('\nTesting compute_top_k...')
+
+        array_ingredients = np.array([[1, 1], [3/5, 4/5]])
+        LIST_TAXONOMY = [1, 2, 2, 3]
+        ARRAY_TAXONOMY = np.array([[3/5, 4/5], [1, 0], [1, 1], [0, 1]], dtype = np.float32)
+
+        candidate_ids, candidate_scores, margins = moduleTest.compute_top_k(array_ingredients, 2, LIST_TAXONOMY, ARRAY_TAXONOMY)
+
+        self.assertIsInstance(candidate_ids, list)
+        self.assertIsInstance(candidate_scores, list)
+        self.assertIsInstance(margins, list)
+        self.assertEqual(len(candidate_ids), 2)
+        self.assertEqual(len(candidate_ids[0]), 2)
+
+        # Duplicated taxonomy ids are collapsed into a single candidate
+        self.assertEqual(candidate_ids, [[2, 1], [1, 2]])
+        self.assertEqual(candidate_scores[0][0], 1)
+        self.assertEqual(candidate_scores[1][0], 1)
+        self.assertAlmostEqual(margins[0], 1 - 0.98995, places = 4)
+        self.assertAlmostEqual(margins[1], 1 - 0.98995, places = 4)
+
+        # Best candidate is the same as compute_scores
+        self.assertEqual([i[0] for i in moduleTest.compute_top_k(array_ingredients, 1, LIST_TAXONOMY, ARRAY_TAXONOMY)[0]],
+                        moduleTest.compute_scores(array_ingredients, LIST_TAXONOMY, ARRAY_TAXONOMY)[0])
+        self.assertEqual(len(moduleTest.compute_top_k(array_ingredients, 1, LIST_TAXONOMY, ARRAY_TAXONOMY)[2]), 2)
+
+        # k is capped to the number of distinct ids
+        self.assertEqual(len(moduleTest.compute_top_k(array_ingredients, 10, LIST_TAXONOMY, ARRAY_TAXONOMY)[0][0]), 3)
+        self.assertEqual(moduleTest.compute_top_k(array_ingredients, 10, [1, 1, 1, 1], ARRAY_TAXONOMY)[2], [None, None])
+
+        with self.assertRaises(ValueError):
+            moduleTest.compute_top_k(array_ingredients, 0, LIST_TAXONOMY, ARRAY_TAXONOMY)
+
+    def test_normalise_vectors(self):
+        print('\nTesting normalise_vectors...')
+
+        array_in = np.array([[3, 4], [0, 0], [0, 2]])
+
+        self.assertEqual(moduleTest.normalise_vectors(array_in).dtype, np.float32)
+        self.assertTrue(moduleTest.normalise_vectors(array_in).flags['C_CONTIGUOUS'])
+        self.assertEqual(moduleTest.normalise_vectors(array_in).shape, (3, 2))
+        self.assertTrue(np.allclose(moduleTest.normalise_vectors(array_in), [[0.6, 0.8], [0, 0], [0, 1]]))
+        self.assertTrue(np.allclose(moduleTest.normalise_vectors(np.array([3, 4])), [[0.6, 0.8]]))
+
+        # Input is not modified
+        self.assertEqual(array_in.tolist(), [[3, 4], [0, 0], [0, 2]])
+
+    @unittest.skipIf(moduleTest.hnswlib is None, 'hnswlib is not installed')
+    def test_compute_scores_ann(self):
+        print('\nTesting compute_scores with ANN index...')
+
+        rng = np.random.default_rng(888)
+        ARRAY_TAXONOMY = rng.standard_normal((500, 16)).astype(np.float32)
+        ARRAY_TAXONOMY /= np.linalg.norm(ARRAY_TAXONOMY, axis = 1, keepdims = True)
+        LIST_TAXONOMY = list(range(500))
+        array_ingredients = ARRAY_TAXONOMY[[3, 250, 499]]
+
+        ann_index = moduleTest.build_ann_index(ARRAY_TAXONOMY)
+        ann_index.set_ef(64)
+
+        self.assertEqual(moduleTest.compute_scores(array_ingredients, LIST_TAXONOMY, ARRAY_TAXONOMY, ann_index)[0], [3, 250, 499])
+        self.assertEqual(moduleTest.compute_scores(array_ingredients, LIST_TAXONOMY, ARRAY_TAXONOMY, ann_index)[0],
+                        moduleTest.compute_scores(array_ingredients, LIST_TAXONOMY, ARRAY_TAXONOMY)[0])
+        self.assertTrue(np.allclose(moduleTest.compute_scores(array_ingredients, LIST_TAXONOMY, ARRAY_TAXONOMY, ann_index)[1], 1, atol = 1e-4))
+
+        self.assertGreaterEqual(moduleTest.compute_recall(ann_index, LIST_TAXONOMY, ARRAY_TAXONOMY, n_queries = 100), 0.95)
+        self.assertIsNone(moduleTest.load_ann_index(LIST_TAXONOMY, ARRAY_TAXONOMY, method = 'exact'))
+
+        with self.assertRaises(ValueError):
+            moduleTest.build_ann_index(ARRAY_TAXONOMY, method = 'ivf')
+
     def test_create_response_match_ingredients(self):
         print('\nTesting create_response...')
 
@@ -153,6 +250,42 @@ class Test_ingredient_match(unittest.TestCase):
         with self.assertRaises(IndexError):
             moduleTest.create_response_match_ingredients(list_a, list_b, list_c)[2]
 
+        top_k_results = ([[2, 3], [1, 2]], [[0.8, 0.7], [0.9, 0.5]], [0.1, 0.4])
+
+        self.assertEqual(moduleTest.create_response_match_ingredients(list_a, list_b, list_c, top_k_results)[0]['candidates'], [{'id': 2, 'score': 0.8}, {'id': 3, 'score': 0.7}])
+        self.assertEqual(moduleTest.create_response_match_ingredients(list_a, list_b, list_c, top_k_results)[1]['margin'], 0.4)
+        self.assertFalse('candidates' in moduleTest.create_response_match_ingredients(list_a, list_b, list_c)[0].keys())
+
+        with self.assertRaises(Exception):
+            moduleTest.create_response_match_ingredients(list_a, list_b, list_c, ([[2]], [[0.8]], [0.1]))
+
+        list_a_dup = ['salt', 'Salt', 'pepper', 'SALT.']
+        list_inverse = [0, 0, 1, 0]
+
+        self.assertEqual(len(moduleTest.create_response_match_ingredients(list_a_dup, list_b, list_c, list_inverse = list_inverse)), 4)
+        self.assertEqual(moduleTest.create_response_match_ingredients(list_a_dup, list_b, list_c, list_inverse = list_inverse)[3], {'ingredient': 'SALT.', 'id': 2, 'score': 0.8})
+        self.assertEqual(moduleTest.create_response_match_ingredients(list_a_dup, list_b, list_c, list_inverse = list_inverse)[2]['id'], 1)
+        self.assertEqual(moduleTest.create_response_match_ingredients(list_a_dup, list_b, list_c, top_k_results, list_inverse)[1]['margin'], 0.1)
+
+        with self.assertRaises(Exception):
+            moduleTest.create_response_match_ingredients(list_a_dup, list_b, list_c, list_inverse = [0, 1])
+
+    def test_assemble_response_match_ingredients(self):
+        print('\nTesting assemble_response_match_ingredients...')
+
+        list_a = ['salt', 'Salt', 'pepper']
+        list_inverse = [0, 0, 1]
+        list_results = [(2, 0.8, [2, 3], [0.8, 0.7], 0.1),
+                        (1, 0.9, [1, 2], [0.9, 0.5], 0.4)]
+        list_results_best = [(2, 0.8, None, None, None),
+                             (1, 0.9, None, None, None)]
+
+        self.assertEqual(moduleTest.assemble_response_match_ingredients(list_a, list_results_best, list_inverse),
+                        [{'ingredient': 'salt', 'id': 2, 'score': 0.8}, {'ingredient': 'Salt', 'id': 2, 'score': 0.8}, {'ingredient': 'pepper', 'id': 1, 'score': 0.9}])
+        self.assertEqual(moduleTest.assemble_response_match_ingredients(list_a, list_results, list_inverse, 2)[1]['candidates'], [{'id': 2, 'score': 0.8}, {'id': 3, 'score': 0.7}])
+        self.assertEqual(moduleTest.assemble_response_match_ingredients(list_a, list_results, list_inverse, 2)[2]['margin'], 0.4)
+        self.assertEqual(moduleTest.assemble_response_match_ingredients([], [], [], 2), [])
+
     def test_retrieve_sql_table(self):
         print('\nTesting retrieve_sql_table...')
 
@@ -228,6 +361,145 @@ class Test_ingredient_match(unittest.TestCase):
         self.assertEqual(moduleTest.parse_taxonomy(tuple_taxonomy)[1]['id'], 1)
         self.assertEqual(len(moduleTest.parse_taxonomy(tuple_taxonomy)[2]['vector']), 2)
 
+        # Binary and legacy text rows can be mixed during the migration
+        blob = struct.pack('<2sH', b'f4', 2) + np.array([0.6, 0.8], dtype = '<f4').tobytes()
+        tuple_taxonomy_binary = ((1, 1, 'crab', '[1, 0]'),
+                                (2, 2, 'lobster', blob))
+
+        self.assertEqual(moduleTest.parse_taxonomy(tuple_taxonomy_binary)[2]['vector'].dtype, np.float32)
+        self.assertTrue(np.allclose(moduleTest.parse_taxonomy(tuple_taxonomy_binary)[2]['vector'], [0.6, 0.8]))
+
+    def test_compute_vectors_checksum(self):
+        print('\nTesting compute_vectors_checksum...')
+
+        # Same value as CRC32('MySQL') in MySQL
+        self.assertEqual(moduleTest.compute_vectors_checksum(['MySQL']), 3259397556)
+        self.assertEqual(moduleTest.compute_vectors_checksum([b'MySQL', None]), 3259397556)
+        self.assertEqual(moduleTest.compute_vectors_checksum([]), 0)
+
+        # Updating a vector changes the checksum
+        self.assertNotEqual(moduleTest.compute_vectors_checksum(['[1, 0]', '[0, 1]']), moduleTest.compute_vectors_checksum(['[1, 0]', '[0, 2]']))
+
+    def test_deserialise_vector(self):
+        print('\nTesting deserialise_vector...')
+
+        blob_f4 = struct.pack('<2sH', b'f4', 3) + np.array([1, 0.5, -2], dtype = '<f4').tobytes()
+        blob_f2 = struct.pack('<2sH', b'f2', 3) + np.array([1, 0.5, -2], dtype = '<f2').tobytes()
+        blob_wrong = struct.pack('<2sH', b'f4', 4) + np.array([1, 0.5, -2], dtype = '<f4').tobytes()
+
+        self.assertIsInstance(moduleTest.deserialise_vector(blob_f4), np.ndarray)
+        self.assertEqual(moduleTest.deserialise_vector(blob_f4).dtype, np.float32)
+        self.assertEqual(moduleTest.deserialise_vector(blob_f2).dtype, np.float32)
+
+        self.assertEqual(moduleTest.deserialise_vector(blob_f4).tolist(), [1, 0.5, -2])
+        self.assertEqual(moduleTest.deserialise_vector(blob_f2).tolist(), [1, 0.5, -2])
+        self.assertEqual(moduleTest.deserialise_vector('[1,0.5,-2]').tolist(), [1, 0.5, -2])
+        self.assertEqual(moduleTest.deserialise_vector(b'[1,0.5,-2]').tolist(), [1, 0.5, -2])
+
+        with self.assertRaises(ValueError):
+            moduleTest.deserialise_vector(blob_wrong)
+
+    def test_load_taxonomy_snapshot(self):
+        print('\nTesting load_taxonomy_snapshot...')
+
+        dict_arrays = {'vectors': np.array([[0.6, 0.8], [1, 0], [0, 1]], dtype = np.float32),
+                    'ids': np.array([1, 2, 3], dtype = np.int64),
+                    'taxonomy_ids': np.array([10, 10, 20], dtype = np.int64)}
+
+        with tempfile.TemporaryDirectory() as path_snapshot:
+            os.mkdir(os.path.join(path_snapshot, 'v1'))
+
+            for name, array in dict_arrays.items():
+                np.save(os.path.join(path_snapshot, 'v1', f'{name}.npy'), array)
+
+            manifest = {'format_version': 1, 'version': 'v1', 'rows': 3, 'dimension': 2, 'dtype': 'float32', 'max_id': 3, 'normalised': True,
+                        'checksums': {name: hashlib.sha256(array.data).hexdigest() for name, array in dict_arrays.items()}}
+
+            with open(os.path.join(path_snapshot, 'v1', 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+
+            with open(os.path.join(path_snapshot, 'CURRENT'), 'w') as f:
+                f.write('v1')
+
+            taxonomy_list, taxonomy_vector, manifest_out = moduleTest.load_taxonomy_snapshot(path_snapshot)
+
+            self.assertIsInstance(taxonomy_list, list)
+            self.assertIsInstance(taxonomy_vector, np.memmap)
+            self.assertEqual(taxonomy_list, [10, 10, 20])
+            self.assertEqual(taxonomy_vector.shape, (3, 2))
+            self.assertEqual(manifest_out['version'], 'v1')
+            self.assertTrue(np.array_equal(taxonomy_vector, dict_arrays['vectors']))
+
+            # Corrupted manifest
+            manifest['checksums']['vectors'] = '0'
+
+            with open(os.path.join(path_snapshot, 'v1', 'manifest.json'), 'w') as f:
+                json.dump(manifest, f)
+
+            with self.assertRaises(ValueError):
+                moduleTest.load_taxonomy_snapshot(path_snapshot)
+
+            self.assertEqual(len(moduleTest.load_taxonomy_snapshot(path_snapshot, verify_checksum = False)[0]), 3)
+
+        with self.assertRaises(FileNotFoundError):
+            moduleTest.load_taxonomy_snapshot(path_snapshot)
+
+    def test_load_taxonomy_data_lagging_snapshot(self):
+        print('\nTesting load_taxonomy_data with a snapshot lagging the table...')
+
+        list_rows = [(1, 10, 'crab', '[1, 0]'), (2, 20, 'lobster', '[0, 1]')]
+        dict_arrays = {'vectors': np.array([[1, 0], [0, 1]], dtype = np.float32),
+                    'ids': np.array([1, 2], dtype = np.int64),
+                    'taxonomy_ids': np.array([10, 20], dtype = np.int64)}
+
+        # Table served by the simulated queries
+        dict_table = {'rows': list_rows + [(3, 30, 'prawn', '[0.6, 0.8]')]}
+
+        def retrieve_sql_table_delta(tablename, min_id):
+            list_below = [i for i in dict_table['rows'] if i[0] <= min_id]
+            return len(list_below), moduleTest.compute_vectors_checksum([i[3] for i in list_below]), tuple(i for i in dict_table['rows'] if i[0] > min_id);
+
+        functions = moduleTest.retrieve_sql_table_delta, moduleTest.retrieve_sql_table, moduleTest.load_ann_index
+        moduleTest.retrieve_sql_table_delta = retrieve_sql_table_delta
+        moduleTest.retrieve_sql_table = lambda tablename: tuple(dict_table['rows'])
+        moduleTest.load_ann_index = lambda *args: None
+
+        try:
+            with tempfile.TemporaryDirectory() as path_snapshot:
+                os.mkdir(os.path.join(path_snapshot, 'v1'))
+
+                for name, array in dict_arrays.items():
+                    np.save(os.path.join(path_snapshot, 'v1', f'{name}.npy'), array)
+
+                manifest = {'format_version': 1, 'version': 'v1', 'rows': 2, 'dimension': 2, 'dtype': 'float32', 'max_id': 2, 'normalised': True,
+                            'vectors_crc32': moduleTest.compute_vectors_checksum([i[3] for i in list_rows]),
+                            'checksums': {name: hashlib.sha256(array.data).hexdigest() for name, array in dict_arrays.items()}}
+
+                with open(os.path.join(path_snapshot, 'v1', 'manifest.json'), 'w') as f:
+                    json.dump(manifest, f)
+
+                with open(os.path.join(path_snapshot, 'CURRENT'), 'w') as f:
+                    f.write('v1')
+
+                # Rows added after the snapshot are appended
+                dict_data = moduleTest.load_taxonomy_data(path_snapshot)
+
+                self.assertEqual(dict_data['taxonomy_manifest']['version'], 'v1')
+                self.assertEqual(dict_data['array_taxonomy_ids'].tolist(), [10, 20, 30])
+                self.assertEqual(dict_data['taxonomy_max_id'], 3)
+                self.assertEqual(dict_data['taxonomy_checksum'], moduleTest.compute_vectors_checksum([i[3] for i in dict_table['rows']]))
+
+                # Rows of the snapshot updated in the table, the whole taxonomy is loaded from MySQL
+                dict_table['rows'][1] = (2, 20, 'lobster', '[0.8, 0.6]')
+                dict_data = moduleTest.load_taxonomy_data(path_snapshot)
+
+                self.assertIsNone(dict_data['taxonomy_manifest'])
+                self.assertEqual(dict_data['array_taxonomy_ids'].tolist(), [10, 20, 30])
+                self.assertTrue(np.allclose(dict_data['array_taxonomy'][1], [0.8, 0.6]))
+
+        finally:
+            moduleTest.retrieve_sql_table_delta, moduleTest.retrieve_sql_table, moduleTest.load_ann_index = functions
+
     def test_encode_allergens(self):
         print('\nTesting encode_allergens...')
 
@@ -298,6 +570,143 @@ class Test_ingredient_match(unittest.TestCase):
         self.assertEqual(moduleTest.insert_properties(list_ids, dict_values, KEYS)[0]['carbs'], 3)
         self.assertIsNone(moduleTest.insert_properties(list_ids, dict_values, KEYS)[1]['carbs'])
 
+    def test_create_response_properties(self):
+        print('\nTesting create_response_properties...')
+
+        list_ids = [1, 2, 3, 2]
+        tuple_in = ((1, 'allergen', 'nuts', 1),
+                    (1, 'allergen', 'celery', 0),
+                    (1, 'macro_nutrient', 'unknown', 7),
+                    (2, 'macro_nutrient', 'energy', 5))
+        KEYS = ['ingredient_ids', 'has_data', 'energy', 'nuts', 'celery']
+
+        list_out = moduleTest.create_response_properties(list_ids, tuple_in, KEYS)
+
+        self.assertEqual(list_out[0], {'id': 1, 'has_data': True, 'energy': None, 'nuts': True, 'celery': False})
+        self.assertEqual(list_out[1], {'id': 2, 'has_data': True, 'energy': 5, 'nuts': None, 'celery': None})
+        self.assertEqual(list_out[2], {'id': 3, 'has_data': False, 'energy': None, 'nuts': None, 'celery': None})
+        self.assertEqual(list_out[3], list_out[1])
+        self.assertEqual(moduleTest.create_response_properties([], tuple_in, KEYS), [])
+
+        # Same response as the chained functions
+        dict_values = moduleTest.parse_reference_values(moduleTest.encode_allergens(tuple_in))
+
+        self.assertEqual(list_out, moduleTest.insert_properties(list_ids, dict_values, KEYS))
+
+    def test_serving_state_reload(self):
+        print('\nTesting ServingState reload...')
+
+        dict_tables = {'stopwords': ['fresh'], 'versions': (1, 1)}
+
+        def load_data():
+            return moduleTest.ServingData(list(dict_tables['stopwords']), None, None, np.ones((1, 2), dtype = np.float32), np.array([1]),
+                                          None, None, None, 1, None, None, dict_tables['versions'])
+
+        def update_data(data, versions):
+            return data._replace(list_stopwords = list(dict_tables['stopwords']), source_versions = versions)
+
+        def wait(state):
+            # Background check releases the lock when done
+            for _ in range(100):
+                if not state._reload_lock.locked():
+                    return
+                time.sleep(0.01)
+
+        state = moduleTest.ServingState(load_data, lambda: dict_tables['versions'], update_data, check_interval = 0)
+        data = state.get_data()
+
+        # New rows are only loaded after a version changes
+        dict_tables['stopwords'] = ['fresh', 'large']
+        state.refresh()
+        wait(state)
+
+        self.assertIs(state.get_data(), data)
+
+        dict_tables['versions'] = (2, 1)
+        state.refresh()
+        wait(state)
+
+        self.assertEqual(state.get_data().list_stopwords, ['fresh', 'large'])
+        self.assertEqual(state.get_data().source_versions, (2, 1))
+        self.assertEqual(data.list_stopwords, ['fresh']) # Previous data is not modified
+
+        # Forced reload
+        dict_tables['stopwords'] = ['ripe']
+        self.assertEqual(state.reload(), (2, 1))
+        self.assertEqual(state.get_data().list_stopwords, ['ripe'])
+
+        # Unversioned tables are not reloaded by the check
+        dict_tables['versions'] = (None, None)
+        dict_tables['stopwords'] = []
+        state.refresh()
+        wait(state)
+
+        self.assertEqual(state.get_data().list_stopwords, ['ripe'])
+
+    def test_serving_state_unknown_backend(self):
+        print('\nTesting ServingState with an unknown encoder backend...')
+
+        backend = moduleTest.config_env.ENCODER_BACKEND
+        moduleTest.config_env.ENCODER_BACKEND = 'onxx'
+
+        try:
+            with self.assertRaises(ValueError):
+                moduleTest.ServingState().get_model()
+
+        finally:
+            moduleTest.config_env.ENCODER_BACKEND = backend
+
+    @unittest.skipIf(moduleTest.hnswlib is None, 'hnswlib is not installed')
+    def test_extend_ann_index(self):
+        print('\nTesting extend_ann_index...')
+
+        rng = np.random.default_rng(888)
+        ARRAY_TAXONOMY = rng.standard_normal((300, 16)).astype(np.float32)
+        ARRAY_TAXONOMY /= np.linalg.norm(ARRAY_TAXONOMY, axis = 1, keepdims = True)
+
+        ann_index = moduleTest.build_ann_index(ARRAY_TAXONOMY[:200])
+        ann_index_extended = moduleTest.extend_ann_index(ann_index, ARRAY_TAXONOMY[200:], 200)
+
+        # Original index is not modified
+        self.assertEqual(ann_index.get_current_count(), 200)
+        self.assertEqual(ann_index_extended.get_current_count(), 300)
+
+        array_ingredients = ARRAY_TAXONOMY[[3, 250, 299]]
+        self.assertEqual(moduleTest.query_ann_index(ann_index_extended, array_ingredients)[0].tolist(), [3, 250, 299])
+        self.assertEqual(moduleTest.compute_scores(array_ingredients, list(range(300)), ARRAY_TAXONOMY, ann_index_extended)[0], [3, 250, 299])
+
+    def test_extend_taxonomy_version(self):
+        print('\nTesting extend_taxonomy_version...')
+
+        ARRAY_TAXONOMY = np.array([[1, 0], [0, 1]], dtype = np.float32)
+
+        self.assertIsInstance(moduleTest.extend_taxonomy_version('v1', [1, 2], ARRAY_TAXONOMY), str)
+        self.assertEqual(moduleTest.extend_taxonomy_version('v1', [1, 2], ARRAY_TAXONOMY), moduleTest.extend_taxonomy_version('v1', [1, 2], ARRAY_TAXONOMY))
+        self.assertNotEqual(moduleTest.extend_taxonomy_version('v1', [1, 2], ARRAY_TAXONOMY), moduleTest.extend_taxonomy_version('v2', [1, 2], ARRAY_TAXONOMY))
+        self.assertNotEqual(moduleTest.extend_taxonomy_version('v1', [1, 2], ARRAY_TAXONOMY), moduleTest.extend_taxonomy_version('v1', [1, 3], ARRAY_TAXONOMY))
+
+    def test_retrieve_sql_table_filtered_async_timeout(self):
+        print('\nTesting retrieve_sql_table_filtered_async timeout...')
+
+        # Pool where no connection ever becomes free
+        class ExhaustedPool:
+
+            def acquire(self):
+                return asyncio.sleep(60)
+
+        async def get_async_pool(db_params):
+            return ExhaustedPool();
+
+        aiomysql, get_pool = moduleTest.db_pool.aiomysql, moduleTest.db_pool.get_async_pool
+        moduleTest.db_pool.aiomysql, moduleTest.db_pool.get_async_pool = object(), get_async_pool
+
+        try:
+            with self.assertRaises(TimeoutError):
+                asyncio.run(moduleTest.retrieve_sql_table_filtered_async('table', {1}, db_params = dict(DB_PARAMS, DB_POOL_TIMEOUT = 0.05)))
+
+        finally:
+            moduleTest.db_pool.aiomysql, moduleTest.db_pool.get_async_pool = aiomysql, get_pool
+
     def test_execute_matched_ingredients(self):
         print('\nTesting test_execute_matched_ingredients...')
 
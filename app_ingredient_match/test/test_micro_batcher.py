@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'micro_batcher'.
+To execute, type in the command line: python -m unittest test/test_micro_batcher.py
+"""
+
+# Import modules
+import asyncio
+import unittest
+
+from src.micro_batcher import MicroBatcher
+
+# Create class
+class Test_micro_batcher(unittest.TestCase):
+
+    def setUp(self):
+
+        self.list_batches = []
+
+    def process_batch(self, list_items: list):
+
+        self.list_batches.append(list(list_items))
+
+        return [i * 10 for i in list_items];
+
+    async def run_batch(self, function, *args):
+
+        return function(*args);
+
+    def test_coalesce(self):
+        print('\nTesting coalescing of requests...')
+
+        batcher = MicroBatcher(self.process_batch, self.run_batch, max_wait_ms = 20, max_batch = 100)
+
+        async def requests():
+            return await asyncio.gather(batcher.submit([1, 2]), batcher.submit([3]), batcher.submit([]), batcher.submit([4, 5, 6]));
+
+        self.assertEqual(asyncio.run(requests()), [[10, 20], [30], [], [40, 50, 60]])
+        self.assertEqual(self.list_batches, [[1, 2, 3, 4, 5, 6]])
+        self.assertEqual(batcher.stats()['batches'], 1)
+        self.assertEqual(batcher.stats()['mean_batch_size'], 6)
+
+    def test_max_batch(self):
+        print('\nTesting batch size limit...')
+
+        batcher = MicroBatcher(self.process_batch, self.run_batch, max_wait_ms = 1000, max_batch = 3)
+
+        async def requests():
+            return await asyncio.wait_for(asyncio.gather(batcher.submit([1, 2]), batcher.submit([3]), batcher.submit([4, 5, 6])), 0.5);
+
+        # Both batches are processed without waiting max_wait_ms
+        self.assertEqual(asyncio.run(requests()), [[10, 20], [30], [40, 50, 60]])
+        self.assertEqual(self.list_batches, [[1, 2, 3], [4, 5, 6]])
+
+    def test_exception(self):
+        print('\nTesting exceptions...')
+
+        async def run_fail(function, *args):
+            raise RuntimeError('Queue full')
+
+        batcher = MicroBatcher(self.process_batch, run_fail, max_wait_ms = 1, max_batch = 100)
+
+        async def requests():
+            return await asyncio.gather(batcher.submit([1]), batcher.submit([2]), return_exceptions = True);
+
+        list_results = asyncio.run(requests())
+
+        self.assertIsInstance(list_results[0], RuntimeError)
+        self.assertIsInstance(list_results[1], RuntimeError)
+
+    def test_close(self):
+        print('\nTesting close...')
+
+        batcher = MicroBatcher(self.process_batch, self.run_batch, max_wait_ms = 1000, max_batch = 100)
+
+        async def requests():
+            task = asyncio.ensure_future(batcher.submit([1, 2]))
+            await asyncio.sleep(0)
+
+            # Waiting items are processed without waiting for the timer, and no batch is left running
+            await batcher.close()
+
+            self.assertEqual(len(batcher._tasks), 0)
+            return await task;
+
+        self.assertEqual(asyncio.run(asyncio.wait_for(requests(), 0.5)), [10, 20])
+        self.assertEqual(self.list_batches, [[1, 2]])
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'property_store'. Table rows are simulated, so no database is needed.
+To execute, type in the command line: python -m unittest test/test_property_store.py
+"""
+
+# Import modules
+import time
+import unittest
+
+from src.property_store import PropertyStore
+
+# Define constants
+KEYS = ['energy', 'fat', 'gluten', 'milk']
+
+ROWS = ((1, 'macro_nutrient', 'energy', 52.0),
+        (1, 'macro_nutrient', 'fat', 0.2),
+        (1, 'allergen', 'gluten', 0.0),
+        (1, 'allergen', 'milk', 1.0),
+        (3, 'macro_nutrient', 'energy', 160.0),
+        (3, 'allergen', 'milk', 0.5),
+        (3, 'score', 'score', 0.9),
+        (4, 'score', 'score', 0.95),
+        (3, 'macro_nutrient', 'unknown', 1.0))
+
+# Create class
+class Test_property_store(unittest.TestCase):
+
+    def test_lookup(self):
+        print('\nTesting lookup...')
+
+        store = PropertyStore(KEYS, lambda: ROWS, lambda: 1)
+        store.reload()
+
+        list_out = store.lookup([1, 3, 2, 4, -1, 100, 1])
+
+        self.assertEqual(len(list_out), 7)
+        self.assertEqual(list_out[0], {'id': 1, 'has_data': True, 'energy': 52.0, 'fat': 0.2, 'gluten': False, 'milk': True})
+        self.assertEqual(list_out[1], {'id': 3, 'has_data': True, 'energy': 160.0, 'fat': None, 'gluten': None, 'milk': True})
+        self.assertEqual(list_out[6], list_out[0])
+
+        # Unknown ids and ids with only a score have no data
+        for i in list_out[2:6]:
+            self.assertFalse(i['has_data'])
+            self.assertEqual([i[j] for j in KEYS], [None] * 4)
+
+        self.assertIs(list_out[0]['gluten'], False)
+        self.assertIsInstance(list_out[0]['energy'], float)
+        self.assertEqual(store.lookup([]), [])
+
+    def test_empty(self):
+        print('\nTesting empty table...')
+
+        store = PropertyStore(KEYS, lambda: (), lambda: None)
+        store.reload()
+
+        self.assertTrue(store.is_loaded())
+        self.assertEqual(store.lookup([0, 1]), [{'id': i, 'has_data': False, 'energy': None, 'fat': None, 'gluten': None, 'milk': None} for i in [0, 1]])
+
+    def test_refresh(self):
+        print('\nTesting refresh...')
+
+        dict_table = {'rows': ROWS, 'version': 1}
+
+        store = PropertyStore(KEYS, lambda: dict_table['rows'], lambda: dict_table['version'], check_interval = 0)
+        self.assertFalse(store.is_loaded())
+
+        store.reload()
+
+        # New rows are only loaded after the version changes
+        dict_table['rows'] = ((5, 'macro_nutrient', 'energy', 10.0),)
+        store.refresh()
+        self._wait(store)
+
+        self.assertTrue(store.lookup([1])[0]['has_data'])
+
+        dict_table['version'] = 2
+        store.refresh()
+        self._wait(store)
+
+        self.assertFalse(store.lookup([1])[0]['has_data'])
+        self.assertEqual(store.lookup([5])[0]['energy'], 10.0)
+        self.assertEqual(store.version, 2)
+
+    def _wait(self, store):
+
+        # Background check releases the lock when done
+        for _ in range(100):
+            if not store._reload_lock.locked():
+                return
+            time.sleep(0.01)
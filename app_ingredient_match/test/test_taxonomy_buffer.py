@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'taxonomy_buffer'.
+To execute, type in the command line: python -m unittest test/test_taxonomy_buffer.py
+"""
+
+# Import modules
+import unittest
+import numpy as np
+
+from src.taxonomy_buffer import TaxonomyBuffer
+
+# Define constants
+ARRAY_VECTORS = np.array([[1, 0], [0, 1], [0.6, 0.8]], dtype = np.float32)
+ARRAY_IDS = np.array([10, 10, 20], dtype = np.int64)
+
+# Create class
+class Test_taxonomy_buffer(unittest.TestCase):
+
+    def test_views(self):
+        print('\nTesting views...')
+
+        buffer = TaxonomyBuffer(ARRAY_VECTORS, ARRAY_IDS)
+        array_vectors, array_ids = buffer.views()
+
+        self.assertEqual(buffer.n_rows, 3)
+        self.assertGreater(buffer.capacity, 3)
+        self.assertTrue(np.array_equal(array_vectors, ARRAY_VECTORS))
+        self.assertTrue(np.array_equal(array_ids, ARRAY_IDS))
+        self.assertEqual(array_vectors.dtype, np.float32)
+        self.assertTrue(array_vectors.flags['C_CONTIGUOUS'])
+
+    def test_append(self):
+        print('\nTesting append...')
+
+        buffer = TaxonomyBuffer(ARRAY_VECTORS, ARRAY_IDS, growth = 1.5)
+        array_vectors_before, array_ids_before = buffer.views()
+
+        array_vectors, array_ids = buffer.append(np.array([[0.8, 0.6]], dtype = np.float32), [30])
+
+        self.assertEqual(array_vectors.shape, (4, 2))
+        self.assertEqual(array_ids.tolist(), [10, 10, 20, 30])
+        self.assertTrue(np.allclose(array_vectors[3], [0.8, 0.6]))
+
+        # Arrays handed out before are not modified
+        self.assertEqual(array_vectors_before.shape, (3, 2))
+        self.assertEqual(array_ids_before.tolist(), [10, 10, 20])
+
+        # Appending past the capacity grows the buffer
+        array_vectors, array_ids = buffer.append(np.tile(ARRAY_VECTORS, (4, 1)), np.arange(12))
+
+        self.assertEqual(buffer.n_rows, 16)
+        self.assertGreaterEqual(buffer.capacity, 16)
+        self.assertEqual(array_ids.tolist(), [10, 10, 20, 30] + list(range(12)))
+        self.assertTrue(np.array_equal(array_vectors[4:], np.tile(ARRAY_VECTORS, (4, 1))))
+        self.assertEqual(array_ids_before.tolist(), [10, 10, 20])
+
+        # Empty appends
+        self.assertEqual(buffer.append(np.empty((0, 2), dtype = np.float32), [])[0].shape, (16, 2))
+
+if __name__ == '__main__':
+    unittest.main()
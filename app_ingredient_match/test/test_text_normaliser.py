@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testing for module 'text_normaliser'.
+To execute, type in the command line: python -m unittest test/test_text_normaliser.py
+"""
+
+# Import modules
+import unittest
+
+import src.ingredient_match as ingredient_match
+from src.text_normaliser import TextNormaliser
+
+# Define constants
+STOPWORDS = ['fresh', 'kg', 'x']
+
+# Create class
+class Test_text_normaliser(unittest.TestCase):
+
+    def test_normalise_sentence(self):
+        print('\nTesting normalise_sentence...')
+
+        normaliser = TextNormaliser(STOPWORDS)
+
+        self.assertEqual(normaliser.normalise_sentence('Fresh Granny-Smith apples 1kg'), 'granny smith apples')
+        self.assertEqual(normaliser.normalise_sentence('  Ripe   avocado x6 '), 'ripe avocado')
+        self.assertEqual(normaliser.normalise_sentence('Crème fraîche'), 'cr me fra che')
+        self.assertEqual(normaliser.normalise_sentence('fresh'), '')
+        self.assertEqual(normaliser.normalise_sentence(''), '')
+        self.assertEqual(TextNormaliser().normalise_sentence('Fresh  apples'), 'fresh apples')
+
+    def test_normalise(self):
+        print('\nTesting normalise...')
+
+        normaliser = TextNormaliser(STOPWORDS)
+
+        self.assertEqual(normaliser.normalise(['Fresh apples', 'PEARS 1kg']), ['apples', 'pears'])
+        self.assertEqual(normaliser.normalise([]), [])
+        self.assertIsInstance(normaliser.normalise(['a']), list)
+
+        with self.assertRaises(TypeError):
+            normaliser.normalise('apples')
+
+    def test_same_as_chain(self):
+        print('\nTesting normalise against the chained functions...')
+
+        normaliser = TextNormaliser(STOPWORDS)
+        list_names = ['Fresh Granny-Smith apples 1kg', '\tRipe avocado x6\n', 'Salt & pepper (to taste)', 'x', '', '   ',
+                      'Jalapeño peppers', 'kg KG Kg', "Baker's flour, 1.5 kg", 'İstanbul spice']
+
+        list_chain = ingredient_match.remove_all_special_chars(list_names)
+        list_chain = ingredient_match.remove_double_spaces(list_chain)
+        list_chain = ingredient_match.remove_stopwords(list_chain, STOPWORDS)
+
+        self.assertEqual(normaliser.normalise(list_names), list_chain)
+
+if __name__ == '__main__':
+    unittest.main()
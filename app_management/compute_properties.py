@@ -7,6 +7,8 @@ Each one of 34 properties (per ingredient) follows a statistical approach.
 
 # Import modules
 import os
+import json
+import hashlib
 import numpy as np
 import pandas as pd
 import config_env
@@ -22,21 +24,30 @@ PROPERTIES_SQL_TABLE = 'pantry__taxonomy_ref_values'
 SUMMARY_SQL_TABLE = 'pantry__summary'
 TAXONOMY_SQL_TABLE = 'pantry__taxonomy'
 CATEGORIES_SQL_TABLE = 'ste__ingredient_categories'
+STATE_SQL_TABLE = 'pantry__taxonomy_ref_state'
+NUTRITION_VALUES_SQL_TABLE = 'ste__nutrition_values'
 
 STRING_CONN = config_env.get_mysql_uri()
 PROPERTIES_FILENAME = config_env.INGREDIENT_PROPERTIES_QUERY_FILENAME
 BI_DATA_FILENAME = config_env.BI_DATA_FILENAME
 CONV_FACTORS = config_env.CONV_FACTORS
 CONV_UNITS = config_env.CONV_UNITS
+INCREMENTAL = config_env.INCREMENTAL_PROPERTIES
 
 
 THRESHOLD = 0.8
 DATA_SOURCE = 'kafoodle_pantry'
+ALLERGEN_COLUMN = 'allergen_bytes_sequence'
 
+# Allergens map to their bit position in allergen_bytes_sequence
 COL_GROUPS = {'index': ['ingredient_id', 'taxonomy_id', 'matched_score', 'nutrition_id', 'has_nutrition_data'],
+              'prop_id': ['energy_id', 'fibre_id', 'protein_id', 'salt_id', 'fat_id', 'saturated_fat_id', 'carbohydrate_id', 'sugar_id'],
               'prop_quantity': ['energy_quantity', 'fibre_quantity', 'protein_quantity', 'salt_quantity', 'fat_quantity', 'saturated_fat_quantity', 'carbohydrate_quantity', 'sugar_quantity'],
               'prop_unit': ['energy_unit', 'fibre_unit', 'protein_unit', 'salt_unit', 'fat_unit', 'saturated_fat_unit', 'carbohydrate_unit', 'sugar_unit'],
-              'allergens': ['GLUTEN', 'GLUTEN_WHEAT', 'GLUTEN_RYE', 'GLUTEN_BARLEY', 'GLUTEN_OATS', 'CRUSTACEANS', 'EGGS', 'FISH', 'PEANUTS', 'SOYA', 'MILK', 'NUTS', 'NUTS_ALMONDS', 'NUTS_HAZELNUTS', 'NUTS_WALNUTS', 'NUTS_CASHEWS', 'NUTS_PECANS', 'NUTS_BRAZIL', 'NUTS_PISTACHIOS', 'NUTS_MACADAMIA', 'SESAME_SEEDS', 'SULPHUR_DIOXIDE', 'MOLLUSCS', 'CELERY', 'MUSTARD', 'LUPIN']}
+              'allergens': {'GLUTEN': 0, 'GLUTEN_WHEAT': 16, 'GLUTEN_RYE': 17, 'GLUTEN_BARLEY': 18, 'GLUTEN_OATS': 19, 'CRUSTACEANS': 1, 'EGGS': 2,
+                            'FISH': 3, 'PEANUTS': 4, 'SOYA': 5, 'MILK': 6, 'NUTS': 7, 'NUTS_ALMONDS': 20, 'NUTS_HAZELNUTS': 21, 'NUTS_WALNUTS': 22,
+                            'NUTS_CASHEWS': 23, 'NUTS_PECANS': 24, 'NUTS_BRAZIL': 25, 'NUTS_PISTACHIOS': 26, 'NUTS_MACADAMIA': 27, 'SESAME_SEEDS': 8,
+                            'SULPHUR_DIOXIDE': 9, 'MOLLUSCS': 10, 'CELERY': 11, 'MUSTARD': 12, 'LUPIN': 13}}
 
 TABULAR_COLS = ['taxonomy_id', 'product_name', 'category', 'number_data_points',
                 'energy', 'fat', 'saturated', 'carbohydrate', 'fibre',
@@ -50,153 +61,224 @@ TABULAR_COLS = ['taxonomy_id', 'product_name', 'category', 'number_data_points',
 BI_COLS = ['taxonomy_id', 'property_type', 'property', 'n_rows', 'reference_value', 'mean_absolute_deviation', 'data_source', 'ingredient_name', 'category']
 
 DICT_ALLERGEN_ENCODE = {0: 'N', 1: 'Y'}
+DICT_AGGREGATIONS = {'score': 'mean', 'macro_nutrient': 'median', 'allergen': 'median'} # Reference value of each property type, in the order of the table
 
 # Define functions
-def transform_dataframe(df, col_groups = COL_GROUPS, data_source: str = DATA_SOURCE):
+def unpivot_block(array_values, array_ids, names: list, mask):
     
-    # Define id vars
-    ID_VARS = ['ingredient_id', 'taxonomy_id']
-    COLS_CONCAT = ID_VARS + ['property', 'value', 'unit', 'property_type']
-    
-    # Extract dataframes
-    df_scores = df[col_groups['index']]
-    df_quantity = df[col_groups['index'] + col_groups['prop_quantity']]
-    df_unit = df[col_groups['index'] + col_groups['prop_unit']]
-    df_allergen = df[col_groups['index'] + col_groups['allergens']]
-    
-    # Prepare match dataframe
-    df_scores.rename(columns = {'matched_score': 'value'}, inplace = True)
-    df_scores['property'] = 'score'
-    df_scores['unit'] = None
-    df_scores['property_type'] = 'score'
-    
-    # Unpivot dataframes
-    df_quantity = pd.melt(df_quantity,
-                          id_vars = ID_VARS,
-                          value_vars = col_groups['prop_quantity'],
-                          var_name = 'name',
-                          value_name = 'value')
-    df_unit = pd.melt(df_unit,
-                      id_vars = ID_VARS,
-                      value_vars = col_groups['prop_unit'],
-                      var_name = 'name',
-                      value_name = 'unit')
-    df_allergen = pd.melt(df_allergen,
-                          id_vars = ID_VARS,
-                          value_vars = col_groups['allergens'],
-                          var_name = 'property',
-                          value_name = 'value')
-    
-    # Create dataframe with quantities and units
-    df_quantity['property'] = df_quantity['name'].str.split('_', expand = True)[0]
-    df_unit['property'] = df_unit['name'].str.split('_', expand = True)[0]
-    
-    df_properties = pd.merge(df_quantity,
-                             df_unit,
-                             how = 'left',
-                             on = ID_VARS + ['property'])
-    
-    df_properties.dropna(inplace = True)
-    df_properties['property_type'] = 'macro_nutrient'
-    
-    # Drop nulls and add empty units to allergens
-    df_allergen.dropna(inplace = True)
-    df_allergen['unit'] = None
-    df_allergen['property_type'] = 'allergen'
-    
-    # Concat datasets
-    df_scores = df_scores[COLS_CONCAT]
-    df_properties = df_properties[COLS_CONCAT]
-    df_allergen =df_allergen[COLS_CONCAT]
-    
-    df_out = pd.concat([df_scores, df_properties, df_allergen])
-    df_out['value'] = pd.to_numeric(df_out['value'], errors = 'coerce')
-    df_out['property'] = df_out['property'].str.lower()
-    df_out['data_source'] = data_source
-    df_out.reset_index(drop = True, inplace = True)
+    # Columns are stacked one after the other, the same order as pd.melt
+    n_rows = array_ids.shape[0]
+    mask_flat = mask.T.ravel()
     
-    return df_out;
-
-def convert_units(df, conv_factors = CONV_FACTORS, conv_units = CONV_UNITS):
+    array_ids_long = np.tile(array_ids, (len(names), 1))[mask_flat]
+    array_values_long = array_values.T.ravel()[mask_flat]
+    array_names_long = np.repeat(np.array(names, dtype = object), n_rows)[mask_flat]
     
-    COLS = df.columns.tolist()
-    df_return = df.copy()
+    return array_ids_long, array_values_long, array_names_long;
+
+def convert_units(array_values, array_units, conv_factors = CONV_FACTORS, conv_units = CONV_UNITS):
     
-    # Make conversions
-    df_return['conv_factor'] = df_return['unit'].map(conv_factors)
-    df_return['new_value'] = df_return['value'] * df_return['conv_factor']
-    df_return['new_unit'] = df_return['unit'].map(conv_units)
+    # Look up factors once per distinct unit, then broadcast with the codes
+    codes, uniques = pd.factorize(array_units)
     
-    # Replace values
-    df_return.loc[df_return['conv_factor'].notnull(), 'value'] = df_return['new_value']
-    df_return.loc[df_return['conv_factor'].notnull(), 'unit'] = df_return['new_unit']
+    array_factors = np.array([conv_factors.get(i, 1.0) for i in uniques] + [1.0], dtype = np.float64)
+    array_new_units = np.array([conv_units.get(i, i) if i in conv_factors else i for i in uniques] + [None], dtype = object)
     
-    return df_return[COLS];
+    return array_values * array_factors[codes], array_new_units[codes];
 
-def rank_df(df):
+def assemble_nutrition_values(df, df_values, col_groups = COL_GROUPS):
+    
+    # Position of the nutrition value of each cell, -1 when the id is null or not found
+    index_values = pd.Index(df_values['id'])
+    array_ids = df[col_groups['prop_id']].to_numpy()
+    array_positions = index_values.get_indexer(array_ids.ravel()).reshape(array_ids.shape)
+    
+    # Missing values take the null appended at the end, like the previous left joins
+    array_quantity = np.append(df_values['quantity'].to_numpy(dtype = object), None)[array_positions]
+    array_unit = np.append(df_values['unit'].to_numpy(dtype = object), None)[array_positions]
+    
+    # Wide dataframe with the columns of the previous query, in the same order
+    df_out = df.drop(columns = col_groups['prop_id'])
+    list_cols = [i for i in df_out.columns if i not in col_groups['index']]
     
-    df_rank = df.copy()
+    for i, (col_quantity, col_unit) in enumerate(zip(col_groups['prop_quantity'], col_groups['prop_unit'])):
+        df_out[col_quantity] = array_quantity[:, i]
+        df_out[col_unit] = array_unit[:, i]
     
-    df_rank['rank'] = df_rank.groupby(['taxonomy_id', 'property'])['value'].rank(method='first')
+    list_props = [j for i in zip(col_groups['prop_quantity'], col_groups['prop_unit']) for j in i]
     
-    return df_rank;
+    return df_out[col_groups['index'] + list_props + list_cols];
 
-def compute_mad(df_main, df_reference, cols):
+def decode_allergens(array_bitmask, dict_allergens: dict):
+    
+    # One column per allergen with 0 or 1, in the order of dict_allergens
+    array_bitmask = pd.to_numeric(array_bitmask, errors = 'coerce')
+    array_bitmask = np.nan_to_num(np.asarray(array_bitmask, dtype = np.float64)).astype(np.int64)
+    array_bits = np.array(list(dict_allergens.values()), dtype = np.int64)
+    
+    return (array_bitmask[:, None] >> array_bits[None, :]) & 1;
+
+def transform_dataframe(df, col_groups = COL_GROUPS, data_source: str = DATA_SOURCE, conv_factors = CONV_FACTORS, conv_units = CONV_UNITS):
+    
+    # Define id vars
+    ID_VARS = ['ingredient_id', 'taxonomy_id']
+    
+    array_ids = df[ID_VARS].to_numpy()
+    mask_ids = pd.notna(array_ids).all(axis = 1)[:, None]
+    
+    # Scores, one per row
+    array_scores = pd.to_numeric(df['matched_score'].to_numpy(), errors = 'coerce').astype(np.float64)
     
-    df_mad = pd.merge(df_main, df_reference[['reference_value']], how = 'left',
-                           left_on = cols, right_index = True)
-    df_mad['absolute_deviation'] = np.abs(df_mad['reference_value'] - df_mad['value'])
+    # Quantities and units, paired by position. Rows without quantity or unit are dropped
+    array_quantity = df[col_groups['prop_quantity']].to_numpy()
+    array_unit = df[col_groups['prop_unit']].to_numpy()
+    list_properties = [i.split('_')[0] for i in col_groups['prop_quantity']]
     
-    df_mad = df_mad[cols + ['absolute_deviation']].groupby(cols).agg(['size', 'sum']).droplevel(0, axis = 1)
-    df_mad['mean_absolute_deviation'] = df_mad['sum'] / (df_mad['size'] - 1)
-    df_mad.loc[df_mad['size'] == 1, 'mean_absolute_deviation'] = 0
+    mask_properties = pd.notna(array_quantity) & pd.notna(array_unit) & mask_ids
+    array_ids_properties, array_quantity, array_names_properties = unpivot_block(array_quantity, array_ids, list_properties, mask_properties)
+    array_unit = array_unit.T.ravel()[mask_properties.T.ravel()]
     
-    return df_mad;
+    array_quantity = pd.to_numeric(array_quantity, errors = 'coerce').astype(np.float64)
+    array_quantity, array_unit = convert_units(array_quantity, array_unit, conv_factors, conv_units)
+    
+    # Allergens, unpacked from the bitmask. Ingredients without bitmask have no allergens, as in the previous query
+    array_allergen = decode_allergens(df[ALLERGEN_COLUMN].to_numpy(), col_groups['allergens'])
+    list_allergens = [i.lower() for i in col_groups['allergens']]
+    
+    mask_allergens = np.broadcast_to(mask_ids, array_allergen.shape)
+    array_ids_allergens, array_allergen, array_names_allergens = unpivot_block(array_allergen, array_ids, list_allergens, mask_allergens)
+    array_allergen = array_allergen.astype(np.float64)
+    
+    # Build long dataframe in a single allocation per column
+    n_scores, n_properties, n_allergens = array_ids.shape[0], array_quantity.shape[0], array_allergen.shape[0]
+    array_ids_out = np.concatenate([array_ids, array_ids_properties, array_ids_allergens])
+    
+    df_out = pd.DataFrame({'ingredient_id': array_ids_out[:, 0],
+                           'taxonomy_id': array_ids_out[:, 1],
+                           'property': np.concatenate([np.full(n_scores, 'score', dtype = object), array_names_properties, array_names_allergens]),
+                           'value': np.concatenate([array_scores, array_quantity, array_allergen]),
+                           'unit': pd.Categorical(np.concatenate([np.full(n_scores, None, dtype = object), array_unit, np.full(n_allergens, None, dtype = object)])),
+                           'property_type': np.repeat(np.array(['score', 'macro_nutrient', 'allergen'], dtype = object), [n_scores, n_properties, n_allergens])})
+    
+    df_out['data_source'] = pd.Categorical.from_codes(np.zeros(df_out.shape[0], dtype = np.int8), categories = [data_source])
+    
+    return df_out;
+
+def sum_groups(array_values, array_group):
+    
+    # Groups are contiguous integers, so no keys are hashed or sorted again. Nulls are skipped
+    return pd.Series(array_values).groupby(array_group, sort = False).sum().to_numpy();
 
-def compute_mean_properties(df):
+def compute_mean_properties(df, dict_aggregations = DICT_AGGREGATIONS):
     
     # Define constants
     GROUP_COLS = ['taxonomy_id', 'property_type', 'property']
-    RELEVANT_COLS = GROUP_COLS + ['value']
     
-    # Filter irrelevant columns out
-    df_compute = df[RELEVANT_COLS]
+    # Encode groups as sortable integers, keeping the property types in the order of dict_aggregations
+    array_block = df['property_type'].map({j: i for i, j in enumerate(dict_aggregations)}).to_numpy(dtype = np.float64)
+    taxonomy_codes, taxonomy_uniques = pd.factorize(df['taxonomy_id'], sort = True)
+    property_codes, property_uniques = pd.factorize(df['property'], sort = True)
+    array_value = df['value'].to_numpy(dtype = np.float64)
     
-    # Slice datased
-    df_mean = df_compute[df_compute['property_type'] == 'score']
-    df_median = df_compute[df_compute['property_type'] == 'macro_nutrient']
-    df_mode = df_compute[df_compute['property_type'] == 'allergen']
+    # Skip rows without group, then sort by group. The sort is stable, so rows keep their order within each group
+    mask = ~np.isnan(array_block) & (taxonomy_codes >= 0) & (property_codes >= 0)
+    array_block, taxonomy_codes, property_codes, array_value = array_block[mask].astype(np.int64), taxonomy_codes[mask], property_codes[mask], array_value[mask]
     
-    # Summarise datasets
-    df_mean_grouped = df_mean.groupby(GROUP_COLS).agg(['size', 'mean']).droplevel(0, axis = 1)
-    df_mean_grouped.rename(columns = {'size': 'n_rows', 'mean': 'reference_value'}, inplace = True)
+    order = np.lexsort((property_codes, taxonomy_codes, array_block))
+    array_block, taxonomy_codes, property_codes, array_value = array_block[order], taxonomy_codes[order], property_codes[order], array_value[order]
     
-    df_median_grouped = df_median.groupby(GROUP_COLS).agg(['size', 'median']).droplevel(0, axis = 1)
-    df_median_grouped.rename(columns = {'size': 'n_rows', 'median': 'reference_value'}, inplace = True)
+    # Find contiguous groups
+    is_start = np.ones(array_value.shape[0], dtype = bool)
+    is_start[1:] = (np.diff(array_block) != 0) | (np.diff(taxonomy_codes) != 0) | (np.diff(property_codes) != 0)
+    starts = np.flatnonzero(is_start)
     
-    df_mode_grouped = df_mode.groupby(GROUP_COLS).agg(['size', 'median']).droplevel(0, axis = 1)
-    df_mode_grouped.rename(columns = {'size': 'n_rows', 'median': 'reference_value'}, inplace = True)
+    if starts.shape[0] == 0:
+        return pd.DataFrame(columns = GROUP_COLS + ['n_rows', 'reference_value', 'mean_absolute_deviation']);
     
-    # Compute mean absolute deviation
-    df_mean_mad = compute_mad(df_mean, df_mean_grouped, GROUP_COLS)
-    df_median_mad = compute_mad(df_median, df_median_grouped, GROUP_COLS)  
-    df_mode_mad = compute_mad(df_mode, df_mode_grouped, GROUP_COLS)  
+    array_size = np.diff(np.append(starts, array_value.shape[0]))
+    array_valid = np.add.reduceat(~np.isnan(array_value), starts)
+    array_group = np.repeat(np.arange(starts.shape[0]), array_size)
     
-    # Merge deviations
-    df_mean_grouped_merge = pd.merge(df_mean_grouped, df_mean_mad[['mean_absolute_deviation']], how = 'left', left_index = True, right_index = True)
-    df_median_grouped_merge = pd.merge(df_median_grouped, df_median_mad[['mean_absolute_deviation']], how = 'left', left_index = True, right_index = True)
-    df_mode_grouped_merge = pd.merge(df_mode_grouped, df_mode_mad[['mean_absolute_deviation']], how = 'left', left_index = True, right_index = True)
+    # Mean of the groups (nulls are skipped). Sums use the compensated summation of pandas, as the previous groupby did
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        array_mean = sum_groups(array_value, array_group) / array_valid
     
-    # Concat and return
-    df_return = pd.concat([df_mean_grouped_merge, df_median_grouped_merge, df_mode_grouped_merge])
-    df_return.reset_index(inplace = True)
-
-    # Round values to 4 decimal places
-    df_return['reference_value'] = np.round(df_return['reference_value'], 4)
-    df_return['mean_absolute_deviation'] = np.round(df_return['mean_absolute_deviation'], 4)
+    # Median of the groups, from the middle of the non-null values sorted within each group (nulls last)
+    array_sorted = array_value[np.lexsort((array_value, array_group))]
+    index_low = starts + np.maximum(array_valid - 1, 0) // 2
+    index_high = starts + array_valid // 2
+    array_median = np.where(array_valid > 0, (array_sorted[index_low] + array_sorted[index_high]) / 2, np.nan)
+    
+    # Reference value following the aggregation of each property type
+    array_group_block = array_block[starts]
+    array_is_median = np.array([dict_aggregations[i] == 'median' for i in dict_aggregations])[array_group_block]
+    array_reference = np.where(array_is_median, array_median, array_mean)
+    
+    # Mean absolute deviation (sample size minus one, 0 for single rows). Null values do not add deviation
+    array_deviation = np.abs(array_value - array_reference[array_group])
+    
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        array_mad = np.where(array_size == 1, 0, sum_groups(array_deviation, array_group) / (array_size - 1))
+    
+    # Build dataframe and round values to 4 decimal places
+    df_return = pd.DataFrame({'taxonomy_id': taxonomy_uniques[taxonomy_codes[starts]],
+                              'property_type': np.array(list(dict_aggregations), dtype = object)[array_group_block],
+                              'property': np.asarray(property_uniques, dtype = object)[property_codes[starts]],
+                              'n_rows': array_size.astype(np.int64),
+                              'reference_value': np.round(array_reference, 4),
+                              'mean_absolute_deviation': np.round(array_mad, 4)})
     
     return df_return;
 
+def compute_fingerprints(df):
+    
+    # Order-independent hash of the rows of each taxonomy id (sum of row hashes, wrapping around)
+    array_hash = pd.util.hash_pandas_object(df, index = False).to_numpy()
+    codes, uniques = pd.factorize(df['taxonomy_id'], sort = True)
+    
+    mask = codes >= 0
+    codes, array_hash = codes[mask], array_hash[mask]
+    
+    array_size = np.bincount(codes, minlength = uniques.shape[0])
+    array_fingerprint = np.zeros(uniques.shape[0], dtype = np.uint64)
+    np.add.at(array_fingerprint, codes, array_hash)
+    
+    # Stored as signed integers, as the database has no unsigned 64-bit type in pandas
+    df_fingerprints = pd.DataFrame({'taxonomy_id': np.asarray(uniques),
+                                    'n_rows': array_size.astype(np.int64),
+                                    'fingerprint': array_fingerprint.view(np.int64)})
+    
+    return df_fingerprints;
+
+def identify_changed_taxonomies(df_fingerprints, df_state):
+    
+    # Taxonomy ids that gained, lost or modified contributing rows since the state was stored
+    df_compare = pd.merge(df_fingerprints,
+                          df_state[['taxonomy_id', 'n_rows', 'fingerprint']],
+                          how = 'outer',
+                          on = 'taxonomy_id',
+                          suffixes = ('', '_state'),
+                          indicator = True)
+    
+    mask = (df_compare['_merge'] != 'both') | (df_compare['n_rows'] != df_compare['n_rows_state']) | (df_compare['fingerprint'] != df_compare['fingerprint_state'])
+    
+    return df_compare.loc[mask, 'taxonomy_id'].tolist();
+
+def compute_settings_hash(df_taxonomy, df_categories, settings: dict = None):
+    
+    # Hash of everything besides the contributing rows that changes the stored tables. A different hash forces a full rebuild
+    if settings is None:
+        settings = {'threshold': THRESHOLD, 'conv_factors': CONV_FACTORS, 'conv_units': CONV_UNITS,
+                    'aggregations': DICT_AGGREGATIONS, 'allergen_encode': DICT_ALLERGEN_ENCODE}
+    
+    hash_settings = hashlib.sha256(json.dumps(settings, sort_keys = True, default = str).encode('utf-8'))
+    
+    # Columns used by get_tabular_data, in id order so the hash does not depend on the order of the query
+    for df in [df_taxonomy[['id', 'ingredient_name', 'category_id']], df_categories[['id', 'name']]]:
+        hash_settings.update(pd.util.hash_pandas_object(df.sort_values('id'), index = False).to_numpy().tobytes())
+    
+    return hash_settings.hexdigest();
+
 def get_tabular_data(df, df_categories, df_taxonomy, order_cols = TABULAR_COLS, dict_allergen_encode = DICT_ALLERGEN_ENCODE):
 
     # Process long dataframe
@@ -228,84 +310,144 @@ def get_tabular_data(df, df_categories, df_taxonomy, order_cols = TABULAR_COLS,
     df_properties = pd.merge(df_properties, df_cats, how = 'left', on = 'category_id')
     df_properties = pd.merge(df_properties, df_data_points, how = 'left', on = 'taxonomy_id')
     
-    return df_properties[order_cols];
+    return df_properties.reindex(columns = order_cols);
 
 #############################################################
 ###################### Execute script #######################
 #############################################################
 
-print('\nBeginning script execution...')
+# Guarded, so time_extract_properties.py can import the functions
+if __name__ == '__main__':
+
+    print('\nBeginning script execution...')
+
+    # Load query
+    try:
+        PATH = os.path.join(PATH_SQL, PROPERTIES_FILENAME)
+
+        with open(f'{PATH}.sql', 'r') as F:
+            query = F.read()
 
-# Load query
-try:
-    PATH = os.path.join(PATH_SQL, PROPERTIES_FILENAME)
+    except:
+        raise FileNotFoundError('There was an error loading the query. Please try again.')
 
-    with open(f'{PATH}.sql', 'r') as F:
-        query = F.read()
+    # Include threshold in the query
+    query_threshold = query.replace('?', str(THRESHOLD))
 
-except:
-    raise FileNotFoundError('There was an error loading the query. Please try again.')
+    # Extract data from query, then quantities and units once by id
+    df_properties = kp.retrieve_sql_query(query_threshold, STRING_CONN)
+    df_values = kp.retrieve_sql_table_by_ids(NUTRITION_VALUES_SQL_TABLE, STRING_CONN, df_properties[COL_GROUPS['prop_id']].to_numpy().ravel(), ['quantity', 'unit'])
 
-# Include threshold in the query
-query_threshold = query.replace('?', str(THRESHOLD))
+    df_properties = assemble_nutrition_values(df_properties, df_values)
+    del df_values
+    df_fingerprints = compute_fingerprints(df_properties)
 
-# Extract data from query
-df_properties = kp.retrieve_sql_query(query_threshold, STRING_CONN)
+    # Retrieve categories and taxonomy
+    df_categories = kp.retrieve_sql_table(CATEGORIES_SQL_TABLE, STRING_CONN)
+    df_taxonomy = kp.retrieve_sql_table(TAXONOMY_SQL_TABLE, STRING_CONN)
 
-# Retrieve categories and taxonomy
-df_categories = kp.retrieve_sql_table(CATEGORIES_SQL_TABLE, STRING_CONN)
+    # Stored with the state, so changes of settings, taxonomy names or categories rebuild all tables
+    settings_hash = compute_settings_hash(df_taxonomy, df_categories)
+    df_fingerprints['settings_hash'] = settings_hash
 
-# Compute long form of dataframe
-df_properties_long = transform_dataframe(df_properties)
+    # Retrieve state of the last run, a full rebuild is needed without it
+    df_state = None
 
-# Convert units and rank properties (rank is needed to compute median values)
-df_properties_long_normalised = convert_units(df_properties_long)
-df_properties_long_normalised = rank_df(df_properties_long_normalised)
+    if INCREMENTAL:
+        try:
+            df_state = kp.retrieve_sql_table(STATE_SQL_TABLE, STRING_CONN)
 
-# Compute aggregated properties
-df_properties_aggregated = compute_mean_properties(df_properties_long_normalised)
+        except Exception:
+            print(f'\nTable {STATE_SQL_TABLE} not found. Rebuilding all tables.')
 
-# Insert to database
-kp.insert_data_sql(df_properties_aggregated, STRING_CONN, PROPERTIES_SQL_TABLE, append = False)
+    if df_state is not None and ('settings_hash' not in df_state.columns or set(df_state['settings_hash']) != {settings_hash}):
+        print('\nSettings, taxonomy or categories changed since the last run. Rebuilding all tables.')
+        df_state = None
 
-print('\nProperty table created succesfully! Continuing to second stage.')
+    if df_state is not None:
 
-# Retrieve SQL tables
-df_categories = kp.retrieve_sql_table(CATEGORIES_SQL_TABLE, STRING_CONN)
-df_taxonomy = kp.retrieve_sql_table(TAXONOMY_SQL_TABLE, STRING_CONN)
-df_properties = kp.retrieve_sql_table(PROPERTIES_SQL_TABLE, STRING_CONN)
+        # Recompute only the taxonomy ids whose contributing rows changed
+        list_changed = identify_changed_taxonomies(df_fingerprints, df_state)
+        print(f'\n{len(list_changed)} taxonomy ids changed since the last run')
 
-df_tabular = get_tabular_data(df_properties, df_categories, df_taxonomy)
+        if list_changed:
+            df_properties_changed = df_properties[df_properties['taxonomy_id'].isin(list_changed)]
+            del df_properties
 
-# Insert to database
-kp.insert_data_sql(df_tabular, STRING_CONN, SUMMARY_SQL_TABLE, append = False)
+            df_properties_aggregated = compute_mean_properties(transform_dataframe(df_properties_changed))
+            df_tabular = get_tabular_data(df_properties_aggregated, df_categories, df_taxonomy)
 
-print('\nSummary table created succesfully! Continuing to third stage.')
+            # Replace rows of the changed ids in a single transaction. Ids without rows left are only deleted
+            dict_tables = {PROPERTIES_SQL_TABLE: df_properties_aggregated,
+                           SUMMARY_SQL_TABLE: df_tabular,
+                           STATE_SQL_TABLE: df_fingerprints[df_fingerprints['taxonomy_id'].isin(list_changed)]}
 
-# Merge with taxonomy and properties
-df_bi = pd.merge(df_properties,
-                df_taxonomy[['id', 'ingredient_name', 'category_id']].rename(columns = {'id': 'taxonomy_id'}),
-                how = 'left',
-                on = 'taxonomy_id')
+            kp.replace_rows_sql(dict_tables, STRING_CONN, 'taxonomy_id', list_changed)
+            kp.bump_data_version(PROPERTIES_SQL_TABLE, STRING_CONN)
 
-df_bi = pd.merge(df_bi,
-                df_categories[['id', 'name']].rename(columns = {'id': 'category_id', 'name': 'category'}),
-                how = 'left',
-                on = 'category_id')
+        print('\nProperty and summary tables updated succesfully! Continuing to third stage.')
 
-# Add source
-df_bi['data_source'] = 'kafoodle_pantry'
+        # Retrieve reference values of all taxonomy ids
+        df_properties = kp.retrieve_sql_table(PROPERTIES_SQL_TABLE, STRING_CONN)
 
-# Organise columns
-df_bi = df_bi[BI_COLS]
+    else:
 
-# Export to csv
-try:
-    PATH = os.path.join(PATH_CSV, BI_DATA_FILENAME)
+        # Remove the state first, so a run failing before the end is followed by another full rebuild
+        kp.drop_table_sql(STATE_SQL_TABLE, STRING_CONN)
+
+        # Compute long form of dataframe with converted units
+        df_properties_long = transform_dataframe(df_properties)
+        del df_properties
+
+        # Compute aggregated properties
+        df_properties_aggregated = compute_mean_properties(df_properties_long)
+
+        # Insert to database
+        kp.insert_data_sql(df_properties_aggregated, STRING_CONN, PROPERTIES_SQL_TABLE, append = False)
+        kp.bump_data_version(PROPERTIES_SQL_TABLE, STRING_CONN)
+
+        print('\nProperty table created succesfully! Continuing to second stage.')
+
+        # Retrieve SQL table, also used for the csv file
+        df_properties = kp.retrieve_sql_table(PROPERTIES_SQL_TABLE, STRING_CONN)
+
+        df_tabular = get_tabular_data(df_properties, df_categories, df_taxonomy)
+
+        # Insert to database
+        kp.insert_data_sql(df_tabular, STRING_CONN, SUMMARY_SQL_TABLE, append = False)
+
+        print('\nSummary table created succesfully! Continuing to third stage.')
+
+    # Merge with taxonomy and properties
+    df_bi = pd.merge(df_properties,
+                    df_taxonomy[['id', 'ingredient_name', 'category_id']].rename(columns = {'id': 'taxonomy_id'}),
+                    how = 'left',
+                    on = 'taxonomy_id')
+
+    df_bi = pd.merge(df_bi,
+                    df_categories[['id', 'name']].rename(columns = {'id': 'category_id', 'name': 'category'}),
+                    how = 'left',
+                    on = 'category_id')
+
+    # Add source
+    df_bi['data_source'] = 'kafoodle_pantry'
+
+    # Organise columns
+    df_bi = df_bi[BI_COLS]
+
+    # Export to csv
+    try:
+        PATH = os.path.join(PATH_CSV, BI_DATA_FILENAME)
     
-    # Export file
-    df_bi.to_csv(f'{PATH}.csv', index = False)
-    print('File written successfully! Script finalised.')
+        # Export file
+        df_bi.to_csv(f'{PATH}.csv', index = False)
+        print('File written successfully!')
+
+    except:
+        raise Exception(f'Could not write csv file in path {PATH}.csv')
+
+    # Store the state for the next incremental run, once everything else succeeded
+    if df_state is None:
+        kp.insert_data_sql(df_fingerprints, STRING_CONN, STATE_SQL_TABLE, append = False)
 
-except:
-    raise Exception(f'Could not write csv file in path {PATH}.csv')
\ No newline at end of file
+    print('Script finalised.')
\ No newline at end of file
@@ -17,6 +17,16 @@ CONV_FACTORS = {'mg': 1.0/1000,
 CONV_UNITS = {'mg': 'g',
               'kj': 'kcal'}
 
+VECTOR_DTYPE = 'float32' # Storage precision of taxonomy vectors, 'float32' or 'float16'
+TAXONOMY_SNAPSHOT_PATH = os.environ.get('TAXONOMY_SNAPSHOT_PATH', 'snapshot/') # Shared with the API server
+ANN_METHOD = os.environ.get('ANN_METHOD', 'exact') # ANN index saved with the snapshot, 'hnsw' (requires hnswlib) or 'exact' (no index)
+
+SCORING_CHUNK_SIZE = int(os.environ.get('SCORING_CHUNK_SIZE', '10000')) # Ingredients read, encoded and scored at a time by create_scored_ingredients.py
+ENCODING_WORKERS = int(os.environ.get('ENCODING_WORKERS', '1')) # Processes encoding ingredients in batch jobs, 1 encodes in the script process
+ENCODING_THREADS_PER_WORKER = int(os.environ.get('ENCODING_THREADS_PER_WORKER', '0')) # Torch threads per process, 0 divides the cores between workers
+EMBEDDING_STORE_PATH = os.environ.get('EMBEDDING_STORE_PATH', 'embeddings/embeddings.sqlite') # Vectors reused between batch runs, empty to encode everything
+INCREMENTAL_PROPERTIES = os.environ.get('INCREMENTAL_PROPERTIES', '0') == '1' # compute_properties.py recomputes only taxonomy ids whose rows changed since the last run
+
 # Define functions
 def get_mysql_uri():
     """
@@ -6,8 +6,11 @@ Script to compute matching scores for reference. Script is based on extract_ingr
 
 # Import modules
 import os
+from sqlalchemy.types import BigInteger, Float, Text
 import config_env
 import kafoodle_pantry as kp
+from text_normaliser import TextNormaliser
+from embedding_store import EmbeddingStore
 
 import warnings
 warnings.filterwarnings('ignore')
@@ -15,59 +18,105 @@ warnings.filterwarnings('ignore')
 # Define constants
 PATH_SQL = 'sql/'
 MATCHED_INGREDIENTS_SQL_TABLE = 'pantry__ingredients_scored'
+STAGING_SQL_TABLE = f'{MATCHED_INGREDIENTS_SQL_TABLE}_new'
 TAXONOMY_VECTOR_SQL_TABLE = 'pantry__taxonomy_vector'
 STOPWORDS_SQL_TABLE = 'pantry__stopwords'
 
 QUERY_FILENAME = config_env.EXTRACT_INGREDIENTS_QUERY_FILENAME
+CHUNK_SIZE = config_env.SCORING_CHUNK_SIZE
+ENCODING_WORKERS = config_env.ENCODING_WORKERS
+ENCODING_THREADS_PER_WORKER = config_env.ENCODING_THREADS_PER_WORKER
+EMBEDDING_STORE_PATH = config_env.EMBEDDING_STORE_PATH
 STRING_CONN = config_env.get_mysql_uri()
 
+# Column types of the scored table, so they do not depend on the values of the first chunk (e.g. all names null)
+SCORED_DTYPES = {'ingredient_id': BigInteger, 'ingredient_name': Text, 'taxonomy_id': BigInteger, 'matched_score': Float}
+
 #############################################################
 ###################### Execute script #######################
 #############################################################
 
-print('\nBeginning script execution...')
+# Guarded, as encoding workers are spawned and import this module again
+if __name__ == '__main__':
+
+    print('\nBeginning script execution...')
+
+    # Load query
+    try:
+        PATH = os.path.join(PATH_SQL, QUERY_FILENAME)
+
+        with open(f'{PATH}.sql', 'r') as F:
+            query = F.read()
+
+    except:
+        raise FileNotFoundError('There was an error loading the query. Please try again.')
+
+    # Retrieve vectoried taxonomy and stopwords
+    df_vect_taxonomy = kp.retrieve_sql_table(TAXONOMY_VECTOR_SQL_TABLE, STRING_CONN)
+    df_stopwords = kp.retrieve_sql_table(STOPWORDS_SQL_TABLE, STRING_CONN)
+
+    # Prepare stopwords
+    list_stopwords = df_stopwords['stopword'].tolist()
+    normaliser = TextNormaliser(list_stopwords)
+
+    # Prepare taxonomy (normalised once, ingredients are normalised by the model)
+    array_vector_taxonomy = kp.normalise_vectors(kp.extract_taxonomy_from_df(df_vect_taxonomy))
+    array_taxonomy_ids = df_vect_taxonomy['taxonomy_id'].to_numpy()
+
+    # Start encoding workers once for all chunks
+    pool = kp.start_encoding_pool(ENCODING_WORKERS, ENCODING_THREADS_PER_WORKER) if ENCODING_WORKERS > 1 else None
+
+    # Open store of vectors from previous runs, so only unseen names are encoded
+    store = EmbeddingStore(EMBEDDING_STORE_PATH, kp.SENTENCE_MODEL_NAME) if EMBEDDING_STORE_PATH else None
+
+    # Stream ingredients from the query in chunks, so memory does not grow with the number of ingredients.
+    # Chunks are written to a staging table, swapped in once all of them succeed, so readers never see a
+    # half-written table and a failed run keeps the previous one
+    n_rows = 0
+
+    try:
+        kp.drop_table_sql(STAGING_SQL_TABLE, STRING_CONN)
 
-# Load query
-try:
-    PATH = os.path.join(PATH_SQL, QUERY_FILENAME)
+        for df_ingredients in kp.retrieve_sql_query_chunks(query, STRING_CONN, CHUNK_SIZE):
 
-    with open(f'{PATH}.sql', 'r') as F:
-        query = F.read()
+            # Prepare list of ingredients
+            list_ingredients = df_ingredients['ingredient_name'].tolist()
+            list_ingredients = normaliser.normalise(list_ingredients)
 
-except:
-    raise FileNotFoundError('There was an error loading the query. Please try again.')
+            if store is not None:
+                array_vector_ingredients = store.encode(list_ingredients, lambda x: kp.vectorise_ingredients(x, pool = pool))
+            else:
+                array_vector_ingredients = kp.vectorise_ingredients(list_ingredients, pool = pool)
 
-# Extract data from query
-df_ingredients = kp.retrieve_sql_query(query, STRING_CONN)
+            # Match ingredients
+            list_matched_ingredients, list_matched_scores = kp.compute_scores(array_vector_ingredients, array_vector_taxonomy, array_taxonomy_ids, normalised = True)
 
-# Retrieve vectoried taxonomy and stopwords
-df_vect_taxonomy = kp.retrieve_sql_table(TAXONOMY_VECTOR_SQL_TABLE, STRING_CONN)
-df_stopwords = kp.retrieve_sql_table(STOPWORDS_SQL_TABLE, STRING_CONN)
+            # Build result of the chunk
+            df_ingredients_scored = df_ingredients.copy()
+            df_ingredients_scored['taxonomy_id'] = list_matched_ingredients
+            df_ingredients_scored['matched_score'] = list_matched_scores
 
-# Prepare stopwords
-list_stopwords = df_stopwords['stopword'].tolist()
+            # Insert to staging table, the first chunk creates it
+            kp.insert_data_sql(df_ingredients_scored, STRING_CONN, STAGING_SQL_TABLE, append = n_rows > 0, dtype = SCORED_DTYPES)
 
-# Prepare list of ingredients
-list_ingredients = df_ingredients['ingredient_name'].tolist()
-list_ingredients = kp.remove_all_special_chars(list_ingredients)
-list_ingredients = kp.remove_double_spaces(list_ingredients)
-list_ingredients = kp.remove_stopwords(list_ingredients, list_stopwords)
+            n_rows += df_ingredients_scored.shape[0]
+            print(f'{n_rows} ingredients scored')
 
-array_vector_ingredients = kp.vectorise_ingredients(list_ingredients)
+        if n_rows > 0:
+            kp.swap_table_sql(MATCHED_INGREDIENTS_SQL_TABLE, STAGING_SQL_TABLE, STRING_CONN)
 
-# Prepare taxonomy
-array_vector_taxonomy = kp.extract_taxonomy_from_df(df_vect_taxonomy)
-list_taxonomy_ids = df_vect_taxonomy['taxonomy_id'].tolist()
+    finally:
+        if pool is not None:
+            kp.stop_encoding_pool(pool)
 
-# Match ingredients
-list_matched_ingredients, list_matched_scores = kp.compute_scores(array_vector_ingredients, array_vector_taxonomy, list_taxonomy_ids)
+        if store is not None:
+            store.close()
 
-# Build final result
-df_ingredients_scored = df_ingredients.copy()
-df_ingredients_scored['taxonomy_id'] = list_matched_ingredients
-df_ingredients_scored['matched_score'] = list_matched_scores
+        # Remove the staging table left by a failed run (already renamed if the run succeeded)
+        kp.drop_table_sql(STAGING_SQL_TABLE, STRING_CONN)
 
-# Insert to database
-kp.insert_data_sql(df_ingredients_scored, STRING_CONN, MATCHED_INGREDIENTS_SQL_TABLE, append = False)
+    if n_rows == 0:
+        print('\nLooks like the query returned no ingredients. Table was not replaced.')
 
-print('\nTable created succesfully! Script finalised.')
\ No newline at end of file
+    else:
+        print('\nTable created succesfully! Script finalised.')
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""On-disk store of ingredient embeddings for batch jobs, keyed by model name and cleaned ingredient text.
+Batch jobs encode only the names not seen in previous runs and reuse the stored vectors for the rest."""
+
+# Import modules
+import os
+import sqlite3
+import numpy as np
+
+# Define constants
+MAX_SQL_PARAMS = 900 # SQLite limits the number of parameters in a query (999 in old versions)
+
+# Define classes
+class EmbeddingStore:
+    """
+    SQLite table of float32 vectors, one row per model and cleaned text.
+
+    Parameters
+    ----------
+    path (str): path of the SQLite file, created if it does not exist
+    model_name (str): name of the model encoding the texts. Vectors of other models are never returned
+    """
+
+    def __init__(self, path: str, model_name: str):
+
+        # Create folder of the store
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok = True)
+
+        self.path = path
+        self.model_name = model_name
+        self.conn = sqlite3.connect(path)
+
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS embeddings ('
+                              'model_name TEXT NOT NULL, '
+                              'text TEXT NOT NULL, '
+                              'vector BLOB NOT NULL, '
+                              'PRIMARY KEY (model_name, text)) WITHOUT ROWID')
+
+    def __enter__(self):
+
+        return self;
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def close(self):
+
+        self.conn.close()
+
+    def get_many(self, texts: list):
+        """
+        Retrieves stored vectors.
+
+        Parameters
+        ----------
+        texts (list): cleaned texts to look up
+
+        Returns
+        ----------
+        dict_vectors (dict): texts found in the store as keys and float32 vectors as values
+        """
+
+        dict_vectors = {}
+        texts = list(set(texts))
+
+        # Query in chunks to stay below the parameter limit
+        for i in range(0, len(texts), MAX_SQL_PARAMS):
+            chunk = texts[i:i + MAX_SQL_PARAMS]
+            query = f'SELECT text, vector FROM embeddings WHERE model_name = ? AND text IN ({",".join("?" * len(chunk))})'
+
+            for text, vector in self.conn.execute(query, [self.model_name] + chunk):
+                dict_vectors[text] = np.frombuffer(vector, dtype = '<f4')
+
+        return dict_vectors;
+
+    def put_many(self, texts: list, array_vectors):
+        """
+        Stores vectors, replacing the ones already stored for the same texts.
+
+        Parameters
+        ----------
+        texts (list): cleaned texts with N elements
+        array_vectors (numpy.array): array of shape NxD with the vectors of the texts
+        """
+
+        array_vectors = np.asarray(array_vectors, dtype = '<f4')
+
+        if len(texts) != array_vectors.shape[0]:
+            raise ValueError('Number of texts and vectors do not match')
+
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO embeddings (model_name, text, vector) VALUES (?, ?, ?)',
+                                  [(self.model_name, i, j.tobytes()) for i, j in zip(texts, array_vectors)])
+
+    def encode(self, texts: list, encode_function):
+        """
+        Returns the vectors of the texts, encoding and storing only those not in the store.
+
+        Parameters
+        ----------
+        texts (list): cleaned texts with N elements, duplicates are encoded once
+        encode_function (callable): function taking a list of texts and returning an array of vectors
+
+        Returns
+        ----------
+        array_vectors (numpy.array): float32 array of shape NxD, in the order of the texts
+
+        Exception
+        ----------
+        If the 'texts' parameter is not list type
+        """
+
+        # Check argument is list type
+        if not isinstance(texts, list):
+            raise TypeError('Argument is not list type')
+
+        dict_vectors = self.get_many(texts)
+
+        # Encode unseen texts
+        list_missing = list(dict.fromkeys(i for i in texts if i not in dict_vectors))
+
+        if list_missing:
+            array_missing = np.asarray(encode_function(list_missing), dtype = np.float32)
+            self.put_many(list_missing, array_missing)
+            dict_vectors.update(zip(list_missing, array_missing))
+
+        print(f'{len(list_missing)} of {len(dict_vectors)} distinct texts encoded, the rest reused from the store')
+
+        if not texts:
+            return np.empty((0, 0), dtype = np.float32);
+
+        return np.stack([dict_vectors[i] for i in texts]).astype(np.float32, copy = False);
@@ -9,20 +9,41 @@ To be used only by dev team to manage the tables and sources for the application
 
 # Import modules
 import os
-import re
+import json
+import shutil
+import zlib
+import struct
+import hashlib
 import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
-
-from sklearn.metrics.pairwise import cosine_similarity
+from sqlalchemy import create_engine, text
+from text_normaliser import PATTERN_SPECIAL_CHARS, PATTERN_DOUBLE_SPACES
 
 from sentence_transformers import SentenceTransformer
-SENTENCE_MODEL = SentenceTransformer('paraphrase-mpnet-base-v2')
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
 
 # Define constants
+SENTENCE_MODEL_NAME = 'paraphrase-mpnet-base-v2'
+SENTENCE_MODEL = None # Loaded on first use, so encoding workers do not load it again when importing this module
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS'] # Read by torch when a worker starts
+
 PATH_CSV = 'csv/'
+DATA_VERSIONS_SQL_TABLE = 'pantry__data_versions'
 CWD = os.getcwd()
 
+VECTOR_HEADER = struct.Struct('<2sH') # dtype code (2 bytes) and dimension (uint16)
+VECTOR_DTYPE_CODES = {'float32': b'f4', 'float16': b'f2'}
+
+SNAPSHOT_POINTER = 'CURRENT'
+SNAPSHOT_MANIFEST = 'manifest.json'
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_ANN_FILENAME = 'index.hnsw'
+ANN_PARAMS = {'M': 16, 'ef_construction': 200}
+
 # Define functions
 def retrieve_gs_link(id_str: str):
 
@@ -80,6 +101,75 @@ def retrieve_sql_table(table_name: str, string_conn: str):
     finally:
         dbConnection.close();
 
+def retrieve_sql_table_delta(table_name: str, string_conn: str, min_id: int, id_column: str = 'id'):
+
+    sqlEngine = create_engine(string_conn)
+    dbConnection = sqlEngine.connect()
+
+    # Only rows added after the watermark
+    sqlQuery = text(f'SELECT * FROM {table_name} WHERE {id_column} > :min_id ORDER BY {id_column}')
+
+    try:
+        df = pd.read_sql(sqlQuery, dbConnection, params = {'min_id': int(min_id)})
+        print(f'Successfully retrieved {df.shape[0]} new rows from table {table_name}')
+        return df;
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
+    finally:
+        dbConnection.close();
+
+def retrieve_sql_table_by_ids(table_name: str, string_conn: str, ids: list, columns: list = None, id_column: str = 'id', chunksize: int = 10000):
+    """
+    Retrieves the rows of a table matching a set of ids, in chunks of ids.
+
+    Parameters
+    ----------
+    table_name (str): name of the table
+    string_conn (str): string to connect to the database
+    ids (list): ids to retrieve, duplicates and nulls are skipped
+    columns (list) OPTIONAL: columns to retrieve, the id column is always included. Default None (all columns)
+    id_column (str) OPTIONAL: column with the ids. Default 'id'
+    chunksize (int) OPTIONAL: ids per query. Default 10000
+
+    Returns
+    ----------
+    df (pandas.DataFrame): rows found, without a particular order
+    """
+
+    sqlEngine = create_engine(string_conn)
+    dbConnection = sqlEngine.connect()
+
+    # Unique integer ids, as python ints for the driver
+    array_ids = pd.unique(pd.Series(ids).dropna())
+    list_ids = [int(i) for i in array_ids]
+    str_columns = '*' if columns is None else ', '.join([id_column] + [i for i in columns if i != id_column])
+
+    try:
+        list_df = []
+
+        for i in range(0, len(list_ids), chunksize):
+            dict_params = {f'id_{j}': k for j, k in enumerate(list_ids[i:i + chunksize])}
+            sqlQuery = text(f'SELECT {str_columns} FROM {table_name} WHERE {id_column} IN ({", ".join(":" + j for j in dict_params)})')
+            list_df.append(pd.read_sql(sqlQuery, dbConnection, params = dict_params))
+
+        # Keep columns when there are no ids
+        if not list_df:
+            list_df.append(pd.read_sql(text(f'SELECT {str_columns} FROM {table_name} WHERE 1 = 0'), dbConnection))
+
+        df = pd.concat(list_df, ignore_index = True)
+        print(f'Successfully retrieved {df.shape[0]} rows from table {table_name}')
+        return df;
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
+    finally:
+        dbConnection.close();
+
 def retrieve_sql_query(query: str, string_conn: str):
 
     sqlEngine = create_engine(string_conn)
@@ -97,7 +187,36 @@ def retrieve_sql_query(query: str, string_conn: str):
     finally:
         dbConnection.close();
 
-def insert_data_sql(df, string_conn: str, table_name: str, append: bool = True):
+def retrieve_sql_query_chunks(query: str, string_conn: str, chunksize: int):
+    """
+    Pages the rows of a query with a server-side cursor, so only one chunk is held in memory at a time.
+
+    Parameters
+    ----------
+    query (str): SQL query
+    string_conn (str): URI to connect to the database
+    chunksize (int): maximum number of rows per chunk
+
+    Yields
+    ----------
+    df (pandas.DataFrame): next chunk of rows
+    """
+
+    sqlEngine = create_engine(string_conn)
+    dbConnection = sqlEngine.connect().execution_options(stream_results = True)
+
+    try:
+        for df in pd.read_sql(query, dbConnection, chunksize = chunksize):
+            yield df
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
+    finally:
+        dbConnection.close();
+
+def insert_data_sql(df, string_conn: str, table_name: str, append: bool = True, dtype: dict = None):
 
     sqlEngine = create_engine(string_conn)
     dbConnection = sqlEngine.connect()
@@ -111,7 +230,8 @@ def insert_data_sql(df, string_conn: str, table_name: str, append: bool = True):
         df.to_sql(table_name,
                   string_conn,
                   index = False,
-                  if_exists = insert_mode)
+                  if_exists = insert_mode,
+                  dtype = dtype)
         print('Append successfully executed')
 
     except Exception as ex:
@@ -122,6 +242,113 @@ def insert_data_sql(df, string_conn: str, table_name: str, append: bool = True):
     finally:
         dbConnection.close();
 
+def update_vectors_sql(df, string_conn: str, table_name: str, column_name: str = 'vector_representation'):
+
+    sqlEngine = create_engine(string_conn)
+
+    # Update row by row in a single transaction, keeping ids and table schema
+    sqlQuery = text(f'UPDATE {table_name} SET {column_name} = :vector WHERE id = :id')
+    list_params = [{'vector': i, 'id': int(j)} for i, j in zip(df[column_name], df['id'])]
+
+    try:
+        with sqlEngine.begin() as dbConnection:
+            dbConnection.execute(sqlQuery, list_params)
+        print(f'Successfully updated {len(list_params)} rows in table {table_name}')
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
+def replace_rows_sql(dict_tables: dict, string_conn: str, key_column: str, keys: list, chunksize: int = 1000):
+    """
+    Replaces the rows of several tables matching a list of keys, in a single transaction.
+
+    Parameters
+    ----------
+    dict_tables (dict): table names as keys and dataframes with the new rows as values
+    string_conn (str): string to connect to the database
+    key_column (str): column identifying the rows to be replaced, in all tables
+    keys (list): values of key_column whose rows are deleted before inserting the new ones
+    chunksize (int) OPTIONAL: keys deleted per statement. Default 1000
+    """
+
+    sqlEngine = create_engine(string_conn)
+    keys = [i.item() if isinstance(i, np.generic) else i for i in keys]
+
+    try:
+        with sqlEngine.begin() as dbConnection:
+            for table_name, df in dict_tables.items():
+
+                # Delete previous rows in chunks, to keep statements short
+                for i in range(0, len(keys), chunksize):
+                    dict_params = {f'key_{j}': k for j, k in enumerate(keys[i:i + chunksize])}
+                    sqlQuery = text(f'DELETE FROM {table_name} WHERE {key_column} IN ({", ".join(":" + j for j in dict_params)})')
+                    dbConnection.execute(sqlQuery, dict_params)
+
+                df.to_sql(table_name, dbConnection, index = False, if_exists = 'append')
+
+        print(f'Successfully replaced rows of {len(keys)} keys in tables {", ".join(dict_tables)}')
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
+def bump_data_version(table_name: str, string_conn: str, versions_table_name: str = DATA_VERSIONS_SQL_TABLE):
+
+    sqlEngine = create_engine(string_conn)
+
+    # Signal the API server that the table changed, so it reloads it
+    sqlQuery = text(f'''INSERT INTO {versions_table_name} (table_name, version) VALUES (:table_name, 1)
+                        ON DUPLICATE KEY UPDATE version = version + 1''')
+
+    try:
+        with sqlEngine.begin() as dbConnection:
+            dbConnection.execute(sqlQuery, {'table_name': table_name})
+        print(f'Successfully increased version of table {table_name}')
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
+def drop_table_sql(table_name: str, string_conn: str):
+
+    sqlEngine = create_engine(string_conn)
+
+    try:
+        with sqlEngine.begin() as dbConnection:
+            dbConnection.execute(text(f'DROP TABLE IF EXISTS {table_name}'))
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
+def swap_table_sql(table_name: str, new_table_name: str, string_conn: str):
+    """
+    Replaces a table with a fully written one. Both names are swapped in a single RENAME TABLE, which is atomic in
+        MySQL, so readers see either the previous table or the new one. The previous table is dropped afterwards.
+
+    Parameters
+    ----------
+    table_name (str): name of the table to be replaced, created empty if it does not exist
+    new_table_name (str): name of the table replacing it, which no longer exists afterwards
+    string_conn (str): string to connect to the database
+    """
+
+    sqlEngine = create_engine(string_conn)
+    old_table_name = f'{table_name}_old'
+
+    try:
+        with sqlEngine.begin() as dbConnection:
+            dbConnection.execute(text(f'DROP TABLE IF EXISTS {old_table_name}'))
+            dbConnection.execute(text(f'CREATE TABLE IF NOT EXISTS {table_name} LIKE {new_table_name}'))
+            dbConnection.execute(text(f'RENAME TABLE {table_name} TO {old_table_name}, {new_table_name} TO {table_name}'))
+            dbConnection.execute(text(f'DROP TABLE {old_table_name}'))
+        print(f'Successfully replaced table {table_name} with {new_table_name}')
+
+    except Exception as ex:
+        print(ex)
+        raise Exception('Execution terminated by exception.')
+
 def identify_new_rows(df_file, df_db, column_name: str):
 
     DF_FILE_COLS = df_file.columns
@@ -178,7 +405,7 @@ def remove_all_special_chars(sentences: list):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
-    processed_sentences = [re.sub('[^A-Za-z ]+', ' ', i) for i in sentences]
+    processed_sentences = [PATTERN_SPECIAL_CHARS.sub(' ', i) for i in sentences]
     processed_sentences = [i.lower() for i in processed_sentences]
 
     return processed_sentences;
@@ -204,7 +431,7 @@ def remove_double_spaces(sentences: list):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
-    processed_sentences = [re.sub(' +', ' ', i) for i in sentences]
+    processed_sentences = [PATTERN_DOUBLE_SPACES.sub(' ', i) for i in sentences]
     processed_sentences = [i.strip() for i in processed_sentences]
 
     return processed_sentences;
@@ -231,6 +458,9 @@ def remove_stopwords(sentences: list, stopwords: list):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
+    # Set lookup instead of scanning the list per word
+    stopwords = frozenset(stopwords)
+
     # Remove stopwords
     list_double_ingredients = [i.split(' ') for i in sentences]
     list_double_ingredients_sliced = [[i for i in sublist if i not in stopwords] for sublist in list_double_ingredients]
@@ -240,14 +470,64 @@ def remove_stopwords(sentences: list, stopwords: list):
 
     return list_ingredients_clean;
 
-def vectorise_ingredients(sentences: list, model = SENTENCE_MODEL):
+def get_sentence_model():
+
+    global SENTENCE_MODEL
+
+    if SENTENCE_MODEL is None:
+        SENTENCE_MODEL = SentenceTransformer(SENTENCE_MODEL_NAME)
+
+    return SENTENCE_MODEL;
+
+def start_encoding_pool(n_workers: int, threads_per_worker: int = None, model = None):
+    """
+    Starts a pool of processes encoding with a copy of the model each, for large batch jobs.
+
+    Parameters
+    ----------
+    n_workers (int): number of processes
+    threads_per_worker (int) OPTIONAL: torch threads per process. Default None (cores divided by workers)
+    model (class sentence_transformer) OPTIONAL: model to encode the sentences. Default None (SENTENCE_MODEL)
+
+    Returns
+    ----------
+    pool (dict): pool to be passed to vectorise_ingredients and stop_encoding_pool
+    """
+
+    model = get_sentence_model() if model is None else model
+    threads_per_worker = threads_per_worker or max((os.cpu_count() or 1) // n_workers, 1)
+
+    # Limit threads so workers do not compete for the same cores. Workers are spawned, so they read the env vars
+    dict_env = {i: os.environ.get(i) for i in THREAD_ENV_VARS}
+    os.environ.update({i: str(threads_per_worker) for i in THREAD_ENV_VARS})
+
+    try:
+        pool = model.start_multi_process_pool(['cpu'] * n_workers)
+
+    finally:
+        for key, value in dict_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    print(f'Encoding pool started with {n_workers} workers and {threads_per_worker} threads each')
+
+    return pool;
+
+def stop_encoding_pool(pool: dict):
+
+    SentenceTransformer.stop_multi_process_pool(pool)
+
+def vectorise_ingredients(sentences: list, model = None, pool: dict = None):
     """
     Uses Huggingface model to vectorise the list of words
 
     Parameters
     ----------
     sentences (list): a list containing text to be processed with N elements
-    model (class sentence_transformer) OPTIONAL: model to encode the sentences. Default SENTENCE_MODEL
+    model (class sentence_transformer) OPTIONAL: model to encode the sentences. Default None (SENTENCE_MODEL)
+    pool (dict) OPTIONAL: pool from start_encoding_pool to encode in several processes. Default None (current process)
 
     Returns
     ----------
@@ -262,35 +542,284 @@ def vectorise_ingredients(sentences: list, model = SENTENCE_MODEL):
     if not isinstance(sentences, list):
         raise TypeError('Argument is not list type')
 
-    # Apply model
-    vectorised_sentences = model.encode(sentences, normalize_embeddings = True)
+    model = get_sentence_model() if model is None else model
+
+    # Apply model, the pool returns vectors without normalisation
+    if pool is not None:
+        vectorised_sentences = normalise_vectors(model.encode_multi_process(sentences, pool))
+    else:
+        vectorised_sentences = model.encode(sentences, normalize_embeddings = True)
 
     return vectorised_sentences;
 
+def serialise_vector(vector, dtype: str = 'float32'):
+    """
+    Converts a vector into a binary blob to be stored in the database. The blob contains a 4-byte header
+        (dtype code and dimension) followed by the raw little-endian values.
+
+    Parameters
+    ----------
+    vector (numpy.array): 1-D array with the vector representation
+    dtype (str) OPTIONAL: storage precision, either 'float32' or 'float16'. Default 'float32'
+
+    Returns
+    ----------
+    blob (bytes): header and raw values of the vector
+
+    Exception
+    ----------
+    If the dtype is not supported
+    """
+
+    # Check dtype is supported
+    if dtype not in VECTOR_DTYPE_CODES:
+        raise ValueError(f'dtype must be one of {list(VECTOR_DTYPE_CODES)}')
+
+    array_vector = np.asarray(vector, dtype = np.dtype(dtype).newbyteorder('<')).ravel()
+    header = VECTOR_HEADER.pack(VECTOR_DTYPE_CODES[dtype], array_vector.shape[0])
+
+    return header + array_vector.tobytes();
+
+def serialise_vectors(array_vectors, dtype: str = 'float32'):
+
+    return [serialise_vector(i, dtype) for i in array_vectors];
+
+def is_legacy_vector(value):
+
+    # Legacy vectors were stored as comma-separated text, e.g. '[0.1,0.2]'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value[:1]) == b'['
+
+    return isinstance(value, str);
+
+def deserialise_vector(value):
+    """
+    Converts a stored vector (binary blob or legacy comma-separated text) into a float32 numpy array.
+
+    Parameters
+    ----------
+    value (bytes or str): vector as stored in the vector_representation column
+
+    Returns
+    ----------
+    vector (numpy.array): 1-D float32 array
+
+    Exception
+    ----------
+    If the binary header does not match the length of the blob
+    """
+
+    # Legacy text format
+    if is_legacy_vector(value):
+        value = value.decode('ascii') if not isinstance(value, str) else value
+        return np.array(value.strip('] [').split(','), dtype = np.float32);
+
+    # Binary format
+    dtype_code, dimension = VECTOR_HEADER.unpack_from(value)
+    dtype = np.dtype('<' + dtype_code.decode('ascii'))
+
+    if len(value) != VECTOR_HEADER.size + dimension * dtype.itemsize:
+        raise ValueError('Vector blob length does not match its header')
+
+    vector = np.frombuffer(value, dtype = dtype, count = dimension, offset = VECTOR_HEADER.size)
+
+    return vector.astype(np.float32);
+
 def extract_taxonomy_from_df(df):
 
     # Extract list and convert to float
-    list_vector = df['vector_representation']
-    list_vector = [i.strip('] [').split(',') for i in list_vector]
+    list_vector = [deserialise_vector(i) for i in df['vector_representation']]
 
-    array_vector = np.array(list_vector)
-    array_vector = array_vector.astype(np.float32)
+    array_vector = np.vstack(list_vector)
 
     return array_vector;
 
-def compute_scores(array_ingredients, array_taxonomy, list_ids):
+def normalise_vectors(array_vectors):
+
+    # L2-normalise rows into a contiguous float32 copy (zero rows stay zero)
+    array_normalised = np.array(array_vectors, dtype = np.float32, order = 'C', ndmin = 2)
+
+    norms = np.linalg.norm(array_normalised, axis = 1, keepdims = True)
+    norms[norms == 0] = 1
+    array_normalised /= norms
+
+    return array_normalised;
+
+def compute_scores(array_ingredients, array_taxonomy, list_ids, normalised: bool = False):
     """
-    
+    Computes the best-matching taxonomy id and its cosine similarity for each ingredient.
+
+    Parameters
+    ----------
+    array_ingredients (numpy.array): vector representation of the ingredients
+    array_taxonomy (numpy.array): vector representation of the taxonomy
+    list_ids (list or numpy.array): taxonomy ids per row of array_taxonomy
+    normalised (bool) OPTIONAL: both arrays are already L2-normalised. Default False
+
+    Returns
+    ----------
+    matched_ingredient (list): list of matched taxonomy's ids
+    matched_score (list): scores of cosine similarity for each match
     """
 
-    # Compute scores
-    array_scores = cosine_similarity(array_ingredients, array_taxonomy)
+    # Normalise vectors if needed
+    if not normalised:
+        array_ingredients = normalise_vectors(array_ingredients)
+        array_taxonomy = normalise_vectors(array_taxonomy)
+
+    # Compute scores with a single matrix product
+    array_scores = np.dot(array_ingredients, array_taxonomy.T)
 
     # Get best match
     best_score_idx = np.argmax(array_scores, axis = 1)
+    best_score = array_scores[np.arange(array_scores.shape[0]), best_score_idx]
+
+    # Gather ids and scores
+    matched_ingredient = np.asarray(list_ids)[best_score_idx].tolist()
+    matched_score = np.round(best_score, 5).tolist()
+
+    return matched_ingredient, matched_score;
+
+def compute_checksum(array):
+
+    return hashlib.sha256(np.ascontiguousarray(array).data).hexdigest();
+
+def compute_vectors_checksum(list_values: list):
+
+    # Same value as SUM(CRC32(vector_representation)) in MySQL, used by the API server to detect updated rows
+    return sum(zlib.crc32(i.encode('utf-8') if isinstance(i, str) else i) for i in list_values if i is not None);
+
+def read_snapshot_version(path_snapshot: str):
+
+    # Return the version the CURRENT pointer refers to, or None if there is no snapshot
+    path_pointer = os.path.join(path_snapshot, SNAPSHOT_POINTER)
+
+    if not os.path.isfile(path_pointer):
+        return None
+
+    with open(path_pointer, 'r') as f:
+        return f.read().strip();
+
+def build_hnsw_index(array_vectors, params: dict = ANN_PARAMS):
+    """
+    Builds an HNSW index (inner product space) over L2-normalised vectors. Labels are the row positions.
+
+    Parameters
+    ----------
+    array_vectors (numpy.array): array of shape Nx768 containing numerical representations
+    params (dict) OPTIONAL: construction parameters M and ef_construction. Default ANN_PARAMS
+
+    Returns
+    ----------
+    index (hnswlib.Index): index containing all vectors
+
+    Exception
+    ----------
+    If hnswlib is not installed
+    """
+
+    if hnswlib is None:
+        raise ImportError('hnswlib is required to build the ANN index')
+
+    n_rows, dimension = array_vectors.shape
+
+    index = hnswlib.Index(space = 'ip', dim = dimension)
+    index.init_index(max_elements = max(n_rows, 1), M = params['M'], ef_construction = params['ef_construction'])
+    index.add_items(array_vectors, np.arange(n_rows))
+
+    return index;
+
+def compute_file_checksum(path: str):
+
+    hash_file = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hash_file.update(chunk)
+
+    return hash_file.hexdigest();
+
+def export_taxonomy_snapshot(df, path_snapshot: str, version: str, keep_versions: int = 2, ann_method: str = None):
+    """
+    Exports the vectorised taxonomy to a versioned on-disk snapshot that the API server can memory-map.
+        Each version is a directory with contiguous .npy arrays (vectors, ids, taxonomy_ids) and a manifest
+        with shapes and sha256 checksums. The CURRENT pointer is swapped atomically once all files are written.
+
+    Parameters
+    ----------
+    df (pandas.DataFrame): vectorised taxonomy table, with id, taxonomy_id and vector_representation columns
+    path_snapshot (str): root directory of the snapshots
+    version (str): name of the new version, e.g. a timestamp
+    keep_versions (int) OPTIONAL: number of versions kept on disk, including the new one. Default 2
+    ann_method (str) OPTIONAL: approximate nearest-neighbour index saved with the snapshot ('hnsw' or None). Default None
+
+    Returns
+    ----------
+    path_version (str): directory containing the new snapshot
+    """
+
+    # Order rows by id so the snapshot matches the table order
+    df_sorted = df.sort_values('id')
+
+    dict_arrays = {'vectors': normalise_vectors(extract_taxonomy_from_df(df_sorted)),
+                   'ids': df_sorted['id'].to_numpy(dtype = np.int64),
+                   'taxonomy_ids': df_sorted['taxonomy_id'].to_numpy(dtype = np.int64)}
+
+    # Write arrays to a temporary directory
+    os.makedirs(path_snapshot, exist_ok = True)
+    path_version = os.path.join(path_snapshot, version)
+    path_tmp = f'{path_version}.tmp'
+
+    shutil.rmtree(path_tmp, ignore_errors = True)
+    os.mkdir(path_tmp)
+
+    for name, array in dict_arrays.items():
+        np.save(os.path.join(path_tmp, f'{name}.npy'), array)
+
+    manifest = {'format_version': SNAPSHOT_FORMAT_VERSION,
+                'version': version,
+                'rows': int(dict_arrays['vectors'].shape[0]),
+                'dimension': int(dict_arrays['vectors'].shape[1]),
+                'dtype': 'float32',
+                'normalised': True,
+                'max_id': int(dict_arrays['ids'].max()) if len(df_sorted) > 0 else 0,
+                'vectors_crc32': compute_vectors_checksum(df_sorted['vector_representation'].tolist()),
+                'checksums': {name: compute_checksum(array) for name, array in dict_arrays.items()}}
+
+    # Build ANN index next to the arrays
+    if ann_method == 'hnsw':
+        path_index = os.path.join(path_tmp, SNAPSHOT_ANN_FILENAME)
+        build_hnsw_index(dict_arrays['vectors']).save_index(path_index)
+
+        manifest['ann_index'] = {'method': ann_method,
+                                 'file': SNAPSHOT_ANN_FILENAME,
+                                 'params': ANN_PARAMS,
+                                 'checksum': compute_file_checksum(path_index)}
+
+    elif ann_method is not None:
+        raise ValueError(f'Unknown ANN method {ann_method}')
+
+    with open(os.path.join(path_tmp, SNAPSHOT_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent = 2)
+
+    # Publish version and swap pointer atomically
+    shutil.rmtree(path_version, ignore_errors = True)
+    os.rename(path_tmp, path_version)
+
+    path_pointer = os.path.join(path_snapshot, SNAPSHOT_POINTER)
+
+    with open(f'{path_pointer}.tmp', 'w') as f:
+        f.write(version)
+
+    os.replace(f'{path_pointer}.tmp', path_pointer)
+
+    # Remove old versions. Workers still mapping them keep their open files
+    list_versions = sorted([i for i in os.listdir(path_snapshot) if os.path.isfile(os.path.join(path_snapshot, i, SNAPSHOT_MANIFEST))])
+
+    for old_version in list_versions[:-keep_versions]:
+        if old_version != version:
+            shutil.rmtree(os.path.join(path_snapshot, old_version), ignore_errors = True)
 
-    # Assign ingredient and score to df
-    matched_ingredient = [list_ids[i] for i in best_score_idx]
-    matched_score = [np.round(array_scores[i][j], 5) for i, j in enumerate(best_score_idx)]
+    print(f'Snapshot {version} exported with {manifest["rows"]} rows')
 
-    return matched_ingredient, matched_score;
\ No newline at end of file
+    return path_version;
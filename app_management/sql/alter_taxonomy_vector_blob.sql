@@ -0,0 +1,4 @@
+-- Query to migrate the vectorised taxonomy from comma-separated TEXT to binary BLOB.
+-- Existing rows keep their text content until vectorise_taxonomy.py re-encodes them.
+
+ALTER TABLE pantry__taxonomy_vector MODIFY vector_representation BLOB;
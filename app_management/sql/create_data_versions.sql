@@ -0,0 +1,11 @@
+-- Query to create an empty table for the versions of tables read by the API server
+
+-- DROP TABLE pantry__data_versions;
+-- TRUNCATE TABLE pantry__data_versions;
+
+CREATE TABLE pantry__data_versions (
+  table_name VARCHAR(255) NOT NULL,
+  version INT NOT NULL DEFAULT 0, -- Increased every time the table is rebuilt
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY(table_name)
+);
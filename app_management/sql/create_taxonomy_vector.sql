@@ -7,6 +7,6 @@ CREATE TABLE pantry__taxonomy_vector (
   id INT NOT NULL AUTO_INCREMENT,
   taxonomy_id INT NOT NULL,
   ingredient_name VARCHAR(255) NOT NULL,
-  vector_representation TEXT,
+  vector_representation BLOB, -- 4-byte header (dtype code, dimension) + raw little-endian values
   PRIMARY KEY(id)
 );
@@ -0,0 +1,102 @@
+-- Previous version of extract_properties.sql, joining ste__nutrition_values once per macro nutrient.
+-- Kept to compare timings with time_extract_properties.py, compute_properties.py does not use it.
+-- It is formatted to input threshold externally. Therefore, this query should not run in a SQL interpreter.
+
+SELECT ingredient_id,
+    taxonomy_id,
+    matched_score,
+    nutrition_id,
+    CASE
+        WHEN T3.id IS NULL THEN 0
+        ELSE 1
+    END AS has_nutrition_data,
+    energy_quantity,
+    energy_unit,
+    fibre_quantity,
+    fibre_unit,
+    protein_quantity,
+    protein_unit,
+    salt_quantity,
+    salt_unit,
+    fat_quantity,
+    fat_unit,
+    saturated_fat_quantity,
+    saturated_fat_unit,
+    carbohydrate_quantity,
+    carbohydrate_unit,
+    sugar_quantity,
+    sugar_unit,
+    allergen_bytes_sequence
+-- SELECT *
+FROM
+    (SELECT ingredient_id,
+        taxonomy_id,
+        matched_score
+    FROM pantry__ingredients_scored
+    WHERE matched_score >= ?) T1
+LEFT JOIN
+    (SELECT id,
+        nutrition_id,
+        allergen_bytes_sequence -- Decoded into allergens by compute_properties.py
+    FROM ste__edibles) T2
+ON T1.ingredient_id = T2.id
+LEFT JOIN
+    (SELECT id,
+        energy_id,
+        fibre_id,
+        protein_id,
+        salt_id,
+        fat_id,
+        saturated_fat_id,
+        carbohydrate_id,
+        sugar_id
+    FROM ste__nutrition) T3
+ON T2.nutrition_id = T3.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS energy_quantity,
+        unit AS energy_unit
+    FROM ste__nutrition_values) T4
+ON T3.energy_id = T4.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS fibre_quantity,
+        unit AS fibre_unit
+    FROM ste__nutrition_values) T5
+ON T3.fibre_id = T5.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS protein_quantity,
+        unit AS protein_unit
+    FROM ste__nutrition_values) T6
+ON T3.protein_id = T6.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS salt_quantity,
+        unit AS salt_unit
+    FROM ste__nutrition_values) T7
+ON T3.salt_id = T7.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS fat_quantity,
+        unit AS fat_unit
+    FROM ste__nutrition_values) T8
+ON T3.fat_id = T8.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS saturated_fat_quantity,
+        unit AS saturated_fat_unit
+    FROM ste__nutrition_values) T9
+ON T3.saturated_fat_id = T9.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS carbohydrate_quantity,
+        unit AS carbohydrate_unit
+    FROM ste__nutrition_values) T10
+ON T3.carbohydrate_id = T10.id
+LEFT JOIN
+    (SELECT id,
+        quantity AS sugar_quantity,
+        unit AS sugar_unit
+    FROM ste__nutrition_values) T11
+ON T3.sugar_id = T11.id;
\ No newline at end of file
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Text normalisation applied to ingredient names before vectorisation: keeps letters only, lowercases,
+collapses spaces and removes stopwords in a single pass per name. Gives the same output as chaining
+remove_all_special_chars, remove_double_spaces and remove_stopwords.
+The same module is in app_ingredient_match/src, so names are cleaned identically when scoring and serving."""
+
+# Import modules
+import re
+
+# Define constants
+PATTERN_SPECIAL_CHARS = re.compile('[^A-Za-z ]+')
+PATTERN_DOUBLE_SPACES = re.compile(' +')
+
+# Define classes
+class TextNormaliser:
+    """
+    Fused normaliser built once per list of stopwords.
+
+    Parameters
+    ----------
+    stopwords (iterable) OPTIONAL: words to be removed. Default () (no stopwords)
+    """
+
+    def __init__(self, stopwords = ()):
+
+        self.stopwords = frozenset(stopwords)
+
+    def normalise_sentence(self, sentence: str):
+        """
+        Normalises a single name.
+
+        Parameters
+        ----------
+        sentence (str): text to be processed
+
+        Returns
+        ----------
+        sentence_out (str): lowercase letters separated by single spaces, without stopwords
+        """
+
+        # Letters are replaced before lowercasing, as non-ASCII characters may lowercase to ASCII
+        words = PATTERN_SPECIAL_CHARS.sub(' ', sentence).lower().split()
+
+        return ' '.join([i for i in words if i not in self.stopwords]);
+
+    def normalise(self, sentences: list):
+        """
+        Normalises a list of names.
+
+        Parameters
+        ----------
+        sentences (list): a list containing text to be processed
+
+        Returns
+        ----------
+        sentences_out (list): list with lowercase letters separated by single spaces, without stopwords
+
+        Exception
+        ----------
+        If the 'sentences' parameter is not list type
+        """
+
+        # Check argument is list type
+        if not isinstance(sentences, list):
+            raise TypeError('Argument is not list type')
+
+        # Local names avoid attribute lookups in the loop
+        substitute = PATTERN_SPECIAL_CHARS.sub
+        stopwords = self.stopwords
+
+        return [' '.join([j for j in substitute(' ', i).lower().split() if j not in stopwords]) for i in sentences];
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script to compare the timing of extract_properties.sql plus the keyed fetch of ste__nutrition_values (used by
+compute_properties.py) against the previous query joining ste__nutrition_values once per macro nutrient.
+Both must return the same rows. To execute, type in the command line: python time_extract_properties.py
+"""
+
+# Import modules
+import os
+import time
+import pandas as pd
+import config_env
+import kafoodle_pantry as kp
+import compute_properties as cp
+
+# Define constants
+PATH_SQL = 'sql/'
+JOINED_QUERY_FILENAME = 'extract_properties_joined'
+REPEAT = 3
+
+STRING_CONN = config_env.get_mysql_uri()
+PROPERTIES_FILENAME = config_env.INGREDIENT_PROPERTIES_QUERY_FILENAME
+
+# Define functions
+def load_query(filename: str, threshold: float = cp.THRESHOLD):
+
+    with open(os.path.join(PATH_SQL, f'{filename}.sql'), 'r') as F:
+        query = F.read()
+
+    return query.replace('?', str(threshold));
+
+def extract_joined(query: str):
+
+    return kp.retrieve_sql_query(query, STRING_CONN);
+
+def extract_keyed(query: str):
+
+    df = kp.retrieve_sql_query(query, STRING_CONN)
+    df_values = kp.retrieve_sql_table_by_ids(cp.NUTRITION_VALUES_SQL_TABLE, STRING_CONN, df[cp.COL_GROUPS['prop_id']].to_numpy().ravel(), ['quantity', 'unit'])
+
+    return cp.assemble_nutrition_values(df, df_values);
+
+def time_function(function, query: str, repeat: int = REPEAT):
+
+    # Best of several runs, to reduce the effect of the database cache
+    list_times = []
+
+    for _ in range(repeat):
+        init_time = time.perf_counter()
+        df = function(query)
+        list_times.append(time.perf_counter() - init_time)
+
+    return df, min(list_times);
+
+#############################################################
+###################### Execute script #######################
+#############################################################
+
+if __name__ == '__main__':
+
+    df_joined, time_joined = time_function(extract_joined, load_query(JOINED_QUERY_FILENAME))
+    df_keyed, time_keyed = time_function(extract_keyed, load_query(PROPERTIES_FILENAME))
+
+    # Check both return the same rows
+    df_joined = df_joined.sort_values('ingredient_id').reset_index(drop = True)
+    df_keyed = df_keyed.sort_values('ingredient_id').reset_index(drop = True)
+    pd.testing.assert_frame_equal(df_joined.astype(object).where(df_joined.notna(), None),
+                                  df_keyed.astype(object).where(df_keyed.notna(), None))
+
+    print(f'\n{"Method":>8} {"Rows":>10} {"Time (s)":>9}')
+    print(f'{"Joined":>8} {df_joined.shape[0]:>10} {time_joined:>9.2f}')
+    print(f'{"Keyed":>8} {df_keyed.shape[0]:>10} {time_keyed:>9.2f}')
+    print(f'Speed-up: {time_joined / time_keyed:.1f}x')
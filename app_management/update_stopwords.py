@@ -10,6 +10,7 @@ import os
 import pandas as pd
 import config_env
 import kafoodle_pantry as kp
+from text_normaliser import TextNormaliser
 
 # Define constants
 PATH_CSV = 'csv/'
@@ -28,8 +29,7 @@ def preprocess_stopwords(df, column_name: str = 'stopword'):
     list_words = df[column_name].tolist()
 
     # Process lists
-    list_processed = kp.remove_all_special_chars(list_words)
-    list_processed = kp.remove_double_spaces(list_processed)
+    list_processed = TextNormaliser().normalise(list_words)
 
     # Flatten list
     list_split = [i.split(' ') for i in list_processed]
@@ -71,6 +71,9 @@ if new_words:
     # Insert to database
     kp.insert_data_sql(df_new_words, STRING_CONN, STOPWORDS_SQL_TABLE)
 
+    # Signal the API server to reload the stopwords
+    kp.bump_data_version(STOPWORDS_SQL_TABLE, STRING_CONN)
+
     # Delete file
     kp.delete_file(FILENAME)
 
@@ -6,10 +6,9 @@ Only manual step requires downloading the Google Sheets file with the provided l
 """
 
 # Import modules
-import numpy as np
-np.set_printoptions(suppress = True, linewidth = None)
-
 import pandas as pd
+from datetime import datetime, timezone
+from sqlalchemy.types import LargeBinary
 import config_env
 import kafoodle_pantry as kp
 
@@ -26,6 +25,14 @@ TAXONOMY_SQL_TABLE = 'pantry__taxonomy'
 TAXONOMY_VECTOR_SQL_TABLE = 'pantry__taxonomy_vector'
 
 STRING_CONN = config_env.get_mysql_uri()
+VECTOR_DTYPE = config_env.VECTOR_DTYPE
+SNAPSHOT_PATH = config_env.TAXONOMY_SNAPSHOT_PATH
+ANN_METHOD = config_env.ANN_METHOD if config_env.ANN_METHOD != 'exact' else None
+
+# Export the snapshot without index if hnswlib is not installed, the API server can build it in memory
+if ANN_METHOD == 'hnsw' and kp.hnswlib is None:
+    print('hnswlib is not installed. Snapshot exported without ANN index.')
+    ANN_METHOD = None
 
 # Define functions
 def get_singulars(df):
@@ -57,6 +64,17 @@ print('\nBeginning script execution...')
 df_taxonomy = kp.retrieve_sql_table(TAXONOMY_SQL_TABLE, STRING_CONN)
 df_vector_taxonomy_ref = kp.retrieve_sql_table(TAXONOMY_VECTOR_SQL_TABLE, STRING_CONN)
 
+# Convert rows stored as comma-separated text to the binary format (one-off migration)
+df_legacy_vectors = df_vector_taxonomy_ref[df_vector_taxonomy_ref['vector_representation'].map(kp.is_legacy_vector)].copy()
+migrated_vectors = kp.check_new_records(df_legacy_vectors)
+
+if migrated_vectors:
+    df_legacy_vectors['vector_representation'] = kp.serialise_vectors(kp.extract_taxonomy_from_df(df_legacy_vectors), VECTOR_DTYPE)
+    kp.update_vectors_sql(df_legacy_vectors, STRING_CONN, TAXONOMY_VECTOR_SQL_TABLE)
+
+    # Keep the stored values in sync, so the snapshot checksum matches the table
+    df_vector_taxonomy_ref.loc[df_legacy_vectors.index, 'vector_representation'] = df_legacy_vectors['vector_representation']
+
 # Compute singular forms
 df_taxonomy_names = df_taxonomy[['id', 'ingredient_name']]
 df_taxonomy_singular = get_singulars(df_taxonomy_names)
@@ -74,11 +92,7 @@ list_names = df_new_ingredients['ingredient_name'].tolist()
 array_vectorised_names = kp.vectorise_ingredients(list_names)
 
 # Create table
-list_vectorised_names = [np.array2string(i.round(5), precision = 5, separator = ',', floatmode = 'fixed') for i in array_vectorised_names]
-list_vectorised_names = [i.replace('\n', '') for i in list_vectorised_names] # Remove line breaks
-list_vectorised_names = [i.replace(' ', '') for i in list_vectorised_names] # Remove whitespace
-
-df_new_ingredients['vector_representation'] = list_vectorised_names
+df_new_ingredients['vector_representation'] = kp.serialise_vectors(array_vectorised_names, VECTOR_DTYPE)
 df_new_ingredients.rename(columns = {'id': 'taxonomy_id'}, inplace = True)
 
 # Check if new ingredients are added
@@ -87,9 +101,28 @@ new_ingredients = kp.check_new_records(df_new_ingredients)
 # Append to database if new records are found
 if new_ingredients:
     # Insert to database
-    kp.insert_data_sql(df_new_ingredients, STRING_CONN, TAXONOMY_VECTOR_SQL_TABLE)
+    kp.insert_data_sql(df_new_ingredients, STRING_CONN, TAXONOMY_VECTOR_SQL_TABLE, dtype = {'vector_representation': LargeBinary})
 
     print('\nEverything went well. See you around next time!')
 
 else:
-    print('\nLooks like there are not any new words. Append was not executed.')
\ No newline at end of file
+    print('\nLooks like there are not any new words. Append was not executed.')
+
+# Export on-disk snapshot for the API server if the table changed or no snapshot exists
+try:
+    if new_ingredients or migrated_vectors or kp.read_snapshot_version(SNAPSHOT_PATH) is None:
+        # Only the inserted rows are read again, to obtain their ids
+        max_id = int(df_vector_taxonomy_ref['id'].max()) if kp.check_new_records(df_vector_taxonomy_ref) else 0
+        df_vector_added = kp.retrieve_sql_table_delta(TAXONOMY_VECTOR_SQL_TABLE, STRING_CONN, max_id)
+        df_vector_taxonomy = pd.concat([df_vector_taxonomy_ref, df_vector_added], ignore_index = True)
+        snapshot_version = datetime.now(tz = timezone.utc).strftime('%Y-%m-%d-%H-%M-%S')
+
+        kp.export_taxonomy_snapshot(df_vector_taxonomy, SNAPSHOT_PATH, snapshot_version, ann_method = ANN_METHOD)
+
+# Signal the API server to reload the taxonomy, once the snapshot is in place. Updated rows change the
+# checksum below the watermark, so the server loads the whole taxonomy instead of appending new rows.
+# Also done if the export failed, as the rows are already committed and the next run finds no new ones:
+# the server checks the previous snapshot against the table and loads the missing rows from MySQL
+finally:
+    if new_ingredients or migrated_vectors:
+        kp.bump_data_version(TAXONOMY_VECTOR_SQL_TABLE, STRING_CONN)
@@ -23,7 +23,6 @@ from datetime import datetime, timezone
 from sklearn.metrics.pairwise import cosine_similarity
 
 from sentence_transformers import SentenceTransformer
-SENTENCE_MODEL = SentenceTransformer('paraphrase-mpnet-base-v2')
 
 # Define constants
 RANDOM_SEED = 888
@@ -44,6 +43,10 @@ COMPUTE_SAMPLE = False
 
 TARGET_TABLE_NAME = 'kp_ingredients_matched'
 
+SENTENCE_MODEL_NAME = 'paraphrase-mpnet-base-v2'
+N_WORKERS = int(os.environ.get('N_WORKERS', '1')) # Processes encoding sentences, 1 encodes in the script process
+THREADS_PER_WORKER = max((os.cpu_count() or 1) // N_WORKERS, 1) # Workers do not compete for the same cores
+
 # Define functions
 def get_datetime_str():
 
@@ -86,12 +89,23 @@ def load_df_from_sql(tableName, string_conn):
     finally:
         dbConnection.close();
         
-def vectorise_sentence(sentence_list, MODEL = SENTENCE_MODEL):
+def start_pool(MODEL, n_workers = N_WORKERS, n_threads = THREADS_PER_WORKER):
+    
+    # Workers are spawned and read the thread limits from the environment when torch is imported
+    for i in ['OMP_NUM_THREADS', 'MKL_NUM_THREADS']:
+        os.environ[i] = str(n_threads)
+    
+    return MODEL.start_multi_process_pool(['cpu'] * n_workers);
+
+def vectorise_sentence(sentence_list, MODEL, POOL = None):
     
     INIT_TIME = time.time()
     
     dict_return = {}
-    array_vectors = MODEL.encode(sentence_list)
+    if POOL is not None:
+        array_vectors = MODEL.encode_multi_process(sentence_list, POOL)
+    else:
+        array_vectors = MODEL.encode(sentence_list)
     
     dict_return['sentence'] = sentence_list
     dict_return['vector'] = array_vectors
@@ -140,81 +154,92 @@ def insert_data_sql(df, string_conn, table_name):
 
 ########################## Execute script ##########################
 
-# Generate string connection
-STRING_CONNECTION = generate_string_connection()
+# Guarded, as encoding workers are spawned and import this module again
+if __name__ == '__main__':
+
+    # Generate string connection
+    STRING_CONNECTION = generate_string_connection()
 
-# Import stopwords file
-with open(os.path.join(JSON_PATH, f'{FILENAME_STOPWORDS_JSON}.json'), 'r') as F:
-    dict_stopwords = json.load(F)
+    # Import stopwords file
+    with open(os.path.join(JSON_PATH, f'{FILENAME_STOPWORDS_JSON}.json'), 'r') as F:
+        dict_stopwords = json.load(F)
 
-# Import SQL tables
-df_raw_taxonomy = load_df_from_sql('kp_ingredient_taxonomy', STRING_CONNECTION)
-df_raw_ingredients = load_df_from_sql('kp_ingredients_base_pantry', STRING_CONNECTION)
+    # Import SQL tables
+    df_raw_taxonomy = load_df_from_sql('kp_ingredient_taxonomy', STRING_CONNECTION)
+    df_raw_ingredients = load_df_from_sql('kp_ingredients_base_pantry', STRING_CONNECTION)
 
-# Save back ups of training
-NOW_STR = get_datetime_str()
-if SAVE_BACKUP:
-    df_raw_taxonomy.to_parquet(os.path.join(PARQUET_PATH, f'{NOW_STR}_{FILENAME_RAW_TAXONOMY}.parquet'),
-                               index = False)
-    df_raw_ingredients.to_parquet(os.path.join(PARQUET_PATH, f'{NOW_STR}_{FILENAME_RAW_INGREDIENTS}.parquet'),
-                               index = False) #File format reduces from 4.4 MB (csv) to 1.3 MB (parquet)
+    # Save back ups of training
+    NOW_STR = get_datetime_str()
+    if SAVE_BACKUP:
+        df_raw_taxonomy.to_parquet(os.path.join(PARQUET_PATH, f'{NOW_STR}_{FILENAME_RAW_TAXONOMY}.parquet'),
+                                   index = False)
+        df_raw_ingredients.to_parquet(os.path.join(PARQUET_PATH, f'{NOW_STR}_{FILENAME_RAW_INGREDIENTS}.parquet'),
+                                   index = False) #File format reduces from 4.4 MB (csv) to 1.3 MB (parquet)
 
     
-# Generate sample of ingredients if argument is set
-if COMPUTE_SAMPLE:
-    df_raw_ingredients = df_raw_ingredients.sample(SAMPLE_SIZE, random_state = RANDOM_SEED)
+    # Generate sample of ingredients if argument is set
+    if COMPUTE_SAMPLE:
+        df_raw_ingredients = df_raw_ingredients.sample(SAMPLE_SIZE, random_state = RANDOM_SEED)
     
-    df_raw_ingredients.to_parquet(os.path.join(PARQUET_PATH, f'{NOW_STR}_{FILENAME_RAW_INGREDIENTS_SAMPLE}.parquet'),
-                               index = False) #File format reduces from 4.4 MB (csv) to 1.3 MB (parquet)
+        df_raw_ingredients.to_parquet(os.path.join(PARQUET_PATH, f'{NOW_STR}_{FILENAME_RAW_INGREDIENTS_SAMPLE}.parquet'),
+                                   index = False) #File format reduces from 4.4 MB (csv) to 1.3 MB (parquet)
 
-# Create lists
-list_taxonomy = df_raw_taxonomy['ingredient_name'].tolist()
-list_ingredient = df_raw_ingredients['ingredient_name'].tolist()
+    # Create lists
+    list_taxonomy = df_raw_taxonomy['ingredient_name'].tolist()
+    list_ingredient = df_raw_ingredients['ingredient_name'].tolist()
 
-# Pre-process ingredients
-LIST_REMOVED_CHARS_INGREDIENTS = [re.sub(r'[^A-Za-z ]+', ' ', i) for i in list_ingredient] # Remove all but letters and spaces
-LIST_REMOVED_CHARS_INGREDIENTS = [re.sub(r' +', ' ', i) for i in LIST_REMOVED_CHARS_INGREDIENTS] # Remove double spaces
-LIST_REMOVED_CHARS_INGREDIENTS = [i.lower() for i in LIST_REMOVED_CHARS_INGREDIENTS] # lower caps
+    # Pre-process ingredients
+    LIST_REMOVED_CHARS_INGREDIENTS = [re.sub(r'[^A-Za-z ]+', ' ', i) for i in list_ingredient] # Remove all but letters and spaces
+    LIST_REMOVED_CHARS_INGREDIENTS = [re.sub(r' +', ' ', i) for i in LIST_REMOVED_CHARS_INGREDIENTS] # Remove double spaces
+    LIST_REMOVED_CHARS_INGREDIENTS = [i.lower() for i in LIST_REMOVED_CHARS_INGREDIENTS] # lower caps
 
-# Remove stopwords
-LIST_DOUBLE_INGREDIENTS = [i.split(' ') for i in LIST_REMOVED_CHARS_INGREDIENTS]
-LIST_DOUBLE_INGREDIENTS_SLICED = [[i for i in sublist if i not in dict_stopwords['stopwords']] for sublist in LIST_DOUBLE_INGREDIENTS]
+    # Remove stopwords
+    LIST_DOUBLE_INGREDIENTS = [i.split(' ') for i in LIST_REMOVED_CHARS_INGREDIENTS]
+    LIST_DOUBLE_INGREDIENTS_SLICED = [[i for i in sublist if i not in dict_stopwords['stopwords']] for sublist in LIST_DOUBLE_INGREDIENTS]
 
-# Reconstruct cleaned list
-list_ingredients_clean = [' '.join(i).strip() for i in LIST_DOUBLE_INGREDIENTS_SLICED]
+    # Reconstruct cleaned list
+    list_ingredients_clean = [' '.join(i).strip() for i in LIST_DOUBLE_INGREDIENTS_SLICED]
 
-# Encode lists
-dict_taxonomy = vectorise_sentence(list_taxonomy)
-dict_ingredients_clean = vectorise_sentence(list_ingredients_clean)
+    # Encode lists
+    SENTENCE_MODEL = SentenceTransformer(SENTENCE_MODEL_NAME)
+    POOL = start_pool(SENTENCE_MODEL) if N_WORKERS > 1 else None
+
+    try:
+        dict_taxonomy = vectorise_sentence(list_taxonomy, SENTENCE_MODEL, POOL)
+        dict_ingredients_clean = vectorise_sentence(list_ingredients_clean, SENTENCE_MODEL, POOL)
+
+    finally:
+        if POOL is not None:
+            SentenceTransformer.stop_multi_process_pool(POOL)
 
-dict_similarity = calculate_similarity(dict_taxonomy, dict_ingredients_clean)
+    dict_similarity = calculate_similarity(dict_taxonomy, dict_ingredients_clean)
 
-# Consolidate dataframe with results
-df_results = pd.DataFrame(dict_similarity)
-df_results['ingredient_id'] = df_raw_ingredients['ingredient_id'].tolist()
-df_results.rename(columns = {'ingredient': 'adapted_ingredient'}, inplace = True)
+    # Consolidate dataframe with results
+    df_results = pd.DataFrame(dict_similarity)
+    df_results['ingredient_id'] = df_raw_ingredients['ingredient_id'].tolist()
+    df_results.rename(columns = {'ingredient': 'adapted_ingredient'}, inplace = True)
 
-# Merge with remaining datasets
-df_results = pd.merge(df_results,
-                      df_raw_ingredients[['ingredient_id', 'category_id', 'ingredient_name']],
-                      how = 'left',
-                      on = 'ingredient_id')
+    # Merge with remaining datasets
+    df_results = pd.merge(df_results,
+                          df_raw_ingredients[['ingredient_id', 'category_id', 'ingredient_name']],
+                          how = 'left',
+                          on = 'ingredient_id')
 
-df_results.rename(columns = {'category_id': 'ingredient_category_id',
-                             'ingredient_name': 'original_ingredient_name'}, inplace = True)
+    df_results.rename(columns = {'category_id': 'ingredient_category_id',
+                                 'ingredient_name': 'original_ingredient_name'}, inplace = True)
 
-df_results = pd.merge(df_results,
-                      df_raw_taxonomy[['id', 'ingredient_name', 'category_id']],
-                      how = 'left',
-                      left_on = 'matched_ingredient',
-                      right_on = 'ingredient_name')
+    df_results = pd.merge(df_results,
+                          df_raw_taxonomy[['id', 'ingredient_name', 'category_id']],
+                          how = 'left',
+                          left_on = 'matched_ingredient',
+                          right_on = 'ingredient_name')
 
-df_results.rename(columns = {'id': 'taxonomy_ingredient_id',
-                             'category_id': 'taxonomy_category_id'}, inplace = True)
-df_results.drop(columns = 'ingredient_name', inplace = True)
+    df_results.rename(columns = {'id': 'taxonomy_ingredient_id',
+                                 'category_id': 'taxonomy_category_id'}, inplace = True)
+    df_results.drop(columns = 'ingredient_name', inplace = True)
 
-# Export table to SQL
-insert_data_sql(df_results, STRING_CONNECTION, TARGET_TABLE_NAME)
+    # Export table to SQL
+    insert_data_sql(df_results, STRING_CONNECTION, TARGET_TABLE_NAME)
 
 
 